@@ -5,6 +5,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -47,7 +48,7 @@ def create_access_token(subject: str) -> str:
 
 
 async def get_current_user(
-    request: Request,
+    request: HTTPConnection,  # a Request or a WebSocket; both carry the auth cookie
     db: AsyncSession = Depends(get_db)
 ):
     token = request.cookies.get("access_token")
@@ -0,0 +1,117 @@
+# availability_windows/router.py
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+
+from database import get_db
+from cache import invalidate
+from locations.effective_menu import served_at
+from models import AvailabilityWindow, Category, Location, MenuItem, User
+from schemas import AvailabilityWindowCreate, AvailabilityWindowResponse, AvailabilityWindowUpdate
+from auth.auth_handler import get_current_active_user
+
+router = APIRouter(prefix="/availability-windows", tags=["Availability Windows"])
+
+
+async def invalidate_windows(db: AsyncSession, location_id: UUID):
+    # The compiled time index and the menu responses bucketed by it both change.
+    await invalidate(db, "menu_windows", location_id)
+    await invalidate(db, "menu", location_id)
+
+
+@router.get("/by-location/{location_id}", response_model=List[AvailabilityWindowResponse])
+async def get_windows_by_location(
+    location_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retrieves all category and menu item windows for a specific location.
+    """
+    result = await db.execute(
+        select(AvailabilityWindow).where(AvailabilityWindow.location_id == location_id)
+    )
+    return result.scalars().all()
+
+
+@router.post("/", response_model=AvailabilityWindowResponse, status_code=status.HTTP_201_CREATED)
+async def create_window(
+    payload: AvailabilityWindowCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Creates a window for either a category or a menu item at a location.
+    """
+    if (payload.category_id is None) == (payload.menu_item_id is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of category_id or menu_item_id")
+
+    loc_res = await db.execute(select(Location).where(Location.location_id == payload.location_id))
+    if not loc_res.scalars().first():
+        raise HTTPException(status_code=404, detail=f"Location with id {payload.location_id} not found")
+    if payload.category_id is not None:
+        cat_res = await db.execute(select(Category).where(Category.id == payload.category_id))
+        if not cat_res.scalars().first():
+            raise HTTPException(status_code=404, detail=f"Category with id {payload.category_id} not found")
+    else:
+        item_res = await db.execute(
+            select(MenuItem).where(MenuItem.item_id == payload.menu_item_id, served_at(MenuItem, payload.location_id))
+        )
+        if not item_res.scalars().first():
+            raise HTTPException(status_code=404, detail=f"Menu item with id {payload.menu_item_id} not found at this location")
+
+    new_window = AvailabilityWindow(**payload.model_dump())
+    db.add(new_window)
+    await invalidate_windows(db, new_window.location_id)
+    await db.commit()
+    await db.refresh(new_window)
+    return new_window
+
+
+@router.put("/{window_id}", response_model=AvailabilityWindowResponse)
+async def update_window(
+    window_id: UUID,
+    payload: AvailabilityWindowUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Updates a window's day or times.
+    """
+    result = await db.execute(select(AvailabilityWindow).where(AvailabilityWindow.window_id == window_id))
+    db_window = result.scalars().first()
+
+    if not db_window:
+        raise HTTPException(status_code=404, detail="Availability window not found")
+
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        setattr(db_window, field, value)
+
+    await invalidate_windows(db, db_window.location_id)
+    await db.commit()
+    await db.refresh(db_window)
+    return db_window
+
+
+@router.delete("/{window_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_window(
+    window_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Deletes a window; with no windows left, its category or item is always available.
+    """
+    result = await db.execute(select(AvailabilityWindow).where(AvailabilityWindow.window_id == window_id))
+    db_window = result.scalars().first()
+
+    if not db_window:
+        raise HTTPException(status_code=404, detail="Availability window not found")
+
+    await invalidate_windows(db, db_window.location_id)
+    await db.delete(db_window)
+    await db.commit()
+    return None
@@ -0,0 +1,120 @@
+# cache.py
+#
+# Per-worker read caches that stay correct with any number of workers.
+# Write paths call `invalidate()` inside their transaction; it publishes a
+# typed event ({"ns": ..., "keys": [...]}) over pubsub, and every worker,
+# including the writer's, evicts those keys once the transaction commits.
+# While the listener is disconnected the caches are bypassed, and since
+# events may have been missed in the meantime, every cache is flushed on
+# reconnect.
+
+import json
+import logging
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pubsub import listener, notify
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+
+_caches = {}
+
+
+class LocalCache:
+    """
+    A small LRU keyed by strings. Variants of an entry can be stored as
+    "key@variant"; evicting "key" drops them too. `get_or_load` (and `put`, given the
+    generation read before loading) won't store a value if the cache was
+    invalidated while it was being loaded, so a read that raced a
+    write can't put the old value back after the eviction.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 1024):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    def get(self, key):
+        if not listener.connected:
+            return None
+        value = self._entries.get(str(key))
+        if value is not None:
+            self._entries.move_to_end(str(key))
+        return value
+
+    @property
+    def generation(self) -> int:
+        """Changes on every eviction; read it before loading and pass it to `put`."""
+        return self._generation
+
+    def put(self, key, value, generation: int) -> None:
+        """Stores `value` unless the cache was invalidated since `generation` was read."""
+        if value is None or generation != self._generation or not listener.connected:
+            return
+        self._entries[str(key)] = value
+        self._entries.move_to_end(str(key))
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key, loader):
+        """Returns the cached value for `key`, awaiting `loader()` on a miss. None is never cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = await loader()
+        self.put(key, value, generation)
+        return value
+
+    def evict(self, *keys) -> None:
+        self._generation += 1
+        keys = {str(key) for key in keys}
+        for entry in [entry for entry in self._entries if entry.partition("@")[0] in keys]:
+            del self._entries[entry]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+def local_cache(namespace: str, maxsize: int = 1024, cache_class=LocalCache) -> LocalCache:
+    """Creates (or returns) the worker's cache for a namespace."""
+    if namespace not in _caches:
+        _caches[namespace] = cache_class(namespace, maxsize)
+    return _caches[namespace]
+
+
+async def invalidate(db: AsyncSession, namespace: str, *keys) -> None:
+    """
+    Evicts `keys` from `namespace` on every worker once the current
+    transaction commits. With no keys, the whole namespace is flushed.
+    Does nothing to caches if the transaction rolls back.
+    """
+    names = sorted({str(key) for key in keys if key is not None})
+    if keys and not names:
+        return
+    await notify(db, CHANNEL, {"ns": namespace, "keys": names})
+
+
+def flush_all() -> None:
+    for cache in _caches.values():
+        cache.clear()
+
+
+def _handle_event(payload: str) -> None:
+    event = json.loads(payload)
+    cache = _caches.get(event["ns"])
+    if cache is None:
+        return  # Nothing cached in that namespace on this worker.
+    if event["keys"]:
+        cache.evict(*event["keys"])
+    else:
+        cache.clear()
+
+
+listener.subscribe(CHANNEL, _handle_event)
+listener.on_reconnect(flush_all)
@@ -1,6 +1,6 @@
 # config.py
 import asyncio
-from decouple import config
+from decouple import config, Choices
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 
@@ -9,9 +9,20 @@ DATABASE_URL = config("DATABASE_URL")
 SECRET_KEY = config("SECRET_KEY")
 ALGORITHM = config("ALGORITHM", default="HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, default=30)
+# Log every SQL statement (SQLAlchemy echo); noisy, for debugging only.
+SQL_ECHO = config("SQL_ECHO", cast=bool, default=False)
+# Per-route latency/SQL metrics at /internal/metrics (see metrics.py); off costs nothing.
+METRICS_ENABLED = config("METRICS_ENABLED", cast=bool, default=False)
+# If set, /internal/metrics requires "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_TOKEN = config("METRICS_TOKEN", default=None)
+# Development/test: "log" or "raise" on ORM lazy loads and repeated per-request queries (see query_debug.py).
+QUERY_DEBUG = config("QUERY_DEBUG", cast=Choices(["off", "log", "raise"]), default="off")
+REPEATED_QUERY_THRESHOLD = config("REPEATED_QUERY_THRESHOLD", cast=int, default=5)
+# Development/test only: let webhook URLs point at loopback/private addresses (see webhooks/dispatcher.py).
+WEBHOOK_ALLOW_PRIVATE_HOSTS = config("WEBHOOK_ALLOW_PRIVATE_HOSTS", cast=bool, default=False)
 
 # create the engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO)
 
 async def test():
     # open a connection
@@ -0,0 +1,161 @@
+# credits/gate.py
+#
+# Spend gating for metered calls, with no query on the hot path. Each worker
+# caches tenants' credit balances, loaded on first use and then kept current
+# by the ledger's balance notifications and its own usage flushes. A call
+# reserves its estimated cost first, which fails once the balance minus
+# this worker's open holds and unflushed usage can't cover it:
+#
+#     with await credit_gate.reserve(restaurant_id, estimate) as hold:
+#         ...make the call...
+#         hold.settle({"prompt_tokens": 812, "completion_tokens": 240})
+#
+# Settling records the actual usage with the metering aggregator, which
+# debits it in its next batched flush; leaving the block without settling
+# releases the hold. Holds are per worker, so concurrent calls on other
+# workers can overspend by at most what they have in flight.
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import exists
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from metering.aggregator import unbilled_usage_cost, usage_meter
+from models import CreditTransaction, RestaurantOwner
+from pubsub import listener
+from .ledger import CHANNEL, open_ledger
+
+logger = logging.getLogger(__name__)
+
+HOLD_TTL_SECONDS = 300  # holds a caller never settled or released lapse after this
+
+
+class Hold:
+    def __init__(self, gate, restaurant_id, amount: Decimal):
+        self.hold_id = uuid4()
+        self.restaurant_id = restaurant_id
+        self.amount = amount
+        self.expires_at = time.monotonic() + HOLD_TTL_SECONDS
+        self._gate = gate
+
+    def settle(self, usage: dict) -> None:
+        """Closes the hold and records the actual usage (meter -> quantity) for billing."""
+        self._gate.settle(self, usage)
+
+    def release(self) -> None:
+        self._gate.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class CreditGate:
+    def __init__(self):
+        self._balances = {}                 # restaurant_id -> last known committed balance
+        self._holds = defaultdict(dict)     # restaurant_id -> {hold_id: Hold}
+        self._loading = {}                  # restaurant_id -> Task loading its balance
+
+    def available(self, restaurant_id):
+        """What the tenant can still reserve on this worker; None if its balance isn't cached yet."""
+        balance = self._balances.get(restaurant_id)
+        if balance is None:
+            return None
+        self._expire(restaurant_id)
+        held = sum((hold.amount for hold in self._holds.get(restaurant_id, {}).values()), Decimal(0))
+        return balance - held - usage_meter.pending_cost(restaurant_id)
+
+    async def reserve(self, restaurant_id, amount) -> Hold:
+        """Holds `amount` dollars of the tenant's credit; 402s if it doesn't have them."""
+        amount = Decimal(amount)
+        available = self.available(restaurant_id)
+        if available is None:
+            await self._load(restaurant_id)
+            available = self.available(restaurant_id)
+        if amount > available:
+            raise HTTPException(status_code=402, detail="Insufficient credit")
+        hold = Hold(self, restaurant_id, amount)
+        self._holds[restaurant_id][hold.hold_id] = hold
+        return hold
+
+    def settle(self, hold: Hold, usage: dict) -> None:
+        if self._drop(hold):
+            for meter, quantity in usage.items():
+                usage_meter.record(hold.restaurant_id, meter, quantity)
+
+    def release(self, hold: Hold) -> None:
+        self._drop(hold)
+
+    def _drop(self, hold: Hold) -> bool:
+        holds = self._holds.get(hold.restaurant_id)
+        if holds is None or holds.pop(hold.hold_id, None) is None:
+            return False
+        if not holds:
+            del self._holds[hold.restaurant_id]
+        return True
+
+    def _expire(self, restaurant_id) -> None:
+        holds = self._holds.get(restaurant_id)
+        if holds:
+            now = time.monotonic()
+            for hold in [hold for hold in holds.values() if hold.expires_at <= now]:
+                logger.warning("credit hold %s for %s lapsed unsettled", hold.hold_id, restaurant_id)
+                self._drop(hold)
+
+    async def _load(self, restaurant_id) -> None:
+        # Concurrent first calls for a tenant share one query.
+        task = self._loading.get(restaurant_id)
+        if task is None:
+            task = self._loading[restaurant_id] = asyncio.create_task(self._fetch_balance(restaurant_id))
+            task.add_done_callback(lambda _task: self._loading.pop(restaurant_id, None))
+        balance = await task
+        if balance is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        # A notification may have brought a newer balance while we waited.
+        self._balances.setdefault(restaurant_id, balance)
+
+    async def _fetch_balance(self, restaurant_id):
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(RestaurantOwner.credit_balance).where(RestaurantOwner.restaurant_id == restaurant_id))
+
+    def observe(self, balances: dict) -> None:
+        """Takes new committed balances (restaurant_id -> balance) for tenants this worker has cached."""
+        for restaurant_id, balance in balances.items():
+            if restaurant_id in self._balances or restaurant_id in self._loading:
+                self._balances[restaurant_id] = balance
+
+    def handle_notification(self, payload: str) -> None:
+        self.observe({UUID(restaurant_id): Decimal(balance) for restaurant_id, balance in json.loads(payload)["balances"].items()})
+
+    def reset(self) -> None:
+        # Balances may have changed unannounced while we weren't listening.
+        self._balances.clear()
+
+    async def start(self) -> None:
+        """Opens the credit ledger of every tenant that doesn't have one yet."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(RestaurantOwner).where(~exists().where(
+                    CreditTransaction.restaurant_id == RestaurantOwner.restaurant_id,
+                    CreditTransaction.kind == "opening",
+                ))
+            )
+            for owner in result.scalars().all():
+                await open_ledger(db, owner.restaurant_id, await unbilled_usage_cost(db, owner))
+            await db.commit()
+
+
+credit_gate = CreditGate()
+usage_meter.on_flush(credit_gate.observe)
+listener.subscribe(CHANNEL, credit_gate.handle_notification)
+listener.on_reconnect(credit_gate.reset)
@@ -0,0 +1,127 @@
+# credits/ledger.py
+#
+# Double-entry credit ledger. Every change to a tenant's credit_balance is a
+# CreditTransaction whose entries sum to zero: a "wallet" entry carrying the
+# change, and a counter entry naming where it came from or went. The balance
+# is moved in SQL (UPDATE ... SET credit_balance = credit_balance + x
+# RETURNING), in the same transaction as the entries, so concurrent top-ups
+# and debits queue on the owner row instead of overwriting each other.
+# New balances are announced on CHANNEL when the transaction commits, for
+# the workers' spend gates (see gate.py).
+
+from uuid import uuid4
+
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import CreditLedgerEntry, CreditTransaction, RestaurantOwner
+from pubsub import notify
+
+WALLET = "wallet"
+CHANNEL = "credit_balances"
+# Keeps each notification well under pubsub.MAX_PAYLOAD_BYTES.
+_BALANCES_PER_NOTIFICATION = 80
+
+
+async def post_transactions(db: AsyncSession, kind: str, counter_account: str, amounts: dict, external_ref: str = None) -> dict:
+    """
+    Posts one transaction per tenant adding amounts[restaurant_id] to its
+    wallet (negative to spend) against `counter_account`, in three statements
+    however many tenants there are. Returns restaurant_id -> (transaction id,
+    new balance); empty if `external_ref` was posted before.
+    """
+    amounts = {restaurant_id: amount for restaurant_id, amount in amounts.items() if amount}
+    if not amounts:
+        return {}
+    transaction_ids = {restaurant_id: uuid4() for restaurant_id in amounts}
+
+    stmt = pg_insert(CreditTransaction).values([
+        {"transaction_id": transaction_id, "restaurant_id": restaurant_id, "kind": kind, "external_ref": external_ref}
+        for restaurant_id, transaction_id in transaction_ids.items()
+    ])
+    if external_ref is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[CreditTransaction.external_ref]).returning(CreditTransaction.transaction_id)
+        if (await db.execute(stmt)).first() is None:
+            return {}
+    else:
+        await db.execute(stmt)
+
+    if len(amounts) > 1:
+        # Lock owner rows in one order so concurrent batches can't deadlock.
+        await db.execute(
+            select(RestaurantOwner.restaurant_id)
+            .where(RestaurantOwner.restaurant_id.in_(amounts))
+            .order_by(RestaurantOwner.restaurant_id)
+            .with_for_update()
+        )
+    result = await db.execute(
+        update(RestaurantOwner)
+        .where(RestaurantOwner.restaurant_id.in_(amounts))
+        # Keep updated_at: it tracks edits to the owner profile, not its balance.
+        .values(
+            credit_balance=RestaurantOwner.credit_balance + case(amounts, value=RestaurantOwner.restaurant_id),
+            updated_at=RestaurantOwner.updated_at,
+        )
+        .returning(RestaurantOwner.restaurant_id, RestaurantOwner.credit_balance)
+        .execution_options(synchronize_session=False)
+    )
+    balances = dict(result.all())
+
+    entries = []
+    for restaurant_id, balance in balances.items():
+        transaction_id, amount = transaction_ids[restaurant_id], amounts[restaurant_id]
+        entries.append({"transaction_id": transaction_id, "restaurant_id": restaurant_id, "account": WALLET,
+                        "amount": amount, "balance_after": balance})
+        entries.append({"transaction_id": transaction_id, "restaurant_id": restaurant_id, "account": counter_account,
+                        "amount": -amount, "balance_after": None})
+    if entries:
+        await db.execute(insert(CreditLedgerEntry), entries)
+    await _announce(db, balances)
+    return {restaurant_id: (transaction_ids[restaurant_id], balance) for restaurant_id, balance in balances.items()}
+
+
+async def open_ledger(db: AsyncSession, restaurant_id, unbilled) -> bool:
+    """
+    Starts a tenant's ledger: takes `unbilled` (usage from before the ledger)
+    off the balance and books whatever of the balance no wallet entry
+    accounts for as the opening entry, so the tenant's wallet entries sum to
+    its balance. False if already opened.
+    """
+    stmt = (
+        pg_insert(CreditTransaction)
+        .values(restaurant_id=restaurant_id, kind="opening", external_ref=f"opening:{restaurant_id}")
+        .on_conflict_do_nothing(index_elements=[CreditTransaction.external_ref])
+        .returning(CreditTransaction.transaction_id)
+    )
+    transaction_id = await db.scalar(stmt)
+    if transaction_id is None:
+        return False
+
+    balance = await db.scalar(
+        update(RestaurantOwner)
+        .where(RestaurantOwner.restaurant_id == restaurant_id)
+        .values(credit_balance=RestaurantOwner.credit_balance - unbilled, updated_at=RestaurantOwner.updated_at)
+        .returning(RestaurantOwner.credit_balance)
+        .execution_options(synchronize_session=False)
+    )
+    booked = await db.scalar(
+        select(func.coalesce(func.sum(CreditLedgerEntry.amount), 0))
+        .where(CreditLedgerEntry.restaurant_id == restaurant_id, CreditLedgerEntry.account == WALLET)
+    )
+    await db.execute(insert(CreditLedgerEntry), [
+        {"transaction_id": transaction_id, "restaurant_id": restaurant_id, "account": WALLET,
+         "amount": balance - booked, "balance_after": balance},
+        {"transaction_id": transaction_id, "restaurant_id": restaurant_id, "account": "opening",
+         "amount": booked - balance, "balance_after": None},
+    ])
+    await _announce(db, {restaurant_id: balance})
+    return True
+
+
+async def _announce(db: AsyncSession, balances: dict) -> None:
+    items = list(balances.items())
+    for start in range(0, len(items), _BALANCES_PER_NOTIFICATION):
+        chunk = items[start:start + _BALANCES_PER_NOTIFICATION]
+        await notify(db, CHANNEL, {"balances": {str(restaurant_id): str(balance) for restaurant_id, balance in chunk}})
@@ -0,0 +1,62 @@
+# credits/router.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List, Optional
+
+from database import get_db
+from models import CreditLedgerEntry, CreditTransaction, RestaurantOwner, User
+from schemas import CreditBalanceResponse, CreditLedgerEntryResponse
+from auth.auth_handler import get_current_active_user
+from .gate import credit_gate
+from .ledger import WALLET
+
+router = APIRouter(prefix="/credits", tags=["Credits"])
+
+
+async def _my_owner(db: AsyncSession, current_user: User) -> RestaurantOwner:
+    owner = await db.scalar(select(RestaurantOwner).where(RestaurantOwner.user_id == current_user.id))
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Restaurant owner profile not found.")
+    return owner
+
+
+@router.get("/balance", response_model=CreditBalanceResponse)
+async def get_balance(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    The current user's credit balance, and what is left of it after open
+    holds and usage waiting to be debited.
+    """
+    owner = await _my_owner(db, current_user)
+    available = credit_gate.available(owner.restaurant_id)
+    if available is None:
+        available = owner.credit_balance
+    return {"restaurant_id": owner.restaurant_id, "balance": owner.credit_balance, "available": available}
+
+
+@router.get("/ledger", response_model=List[CreditLedgerEntryResponse])
+async def get_ledger(
+    before: Optional[int] = Query(None, description="entry_id of the last entry of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    The current user's credit history, newest first: every top-up, usage
+    debit and the opening balance, with the balance after each.
+    """
+    owner = await _my_owner(db, current_user)
+    query = (
+        select(CreditLedgerEntry.entry_id, CreditLedgerEntry.transaction_id, CreditTransaction.kind,
+               CreditLedgerEntry.amount, CreditLedgerEntry.balance_after, CreditLedgerEntry.created_at)
+        .join(CreditTransaction, CreditTransaction.transaction_id == CreditLedgerEntry.transaction_id)
+        .where(CreditLedgerEntry.restaurant_id == owner.restaurant_id, CreditLedgerEntry.account == WALLET)
+    )
+    if before is not None:
+        query = query.where(CreditLedgerEntry.entry_id < before)
+    result = await db.execute(query.order_by(CreditLedgerEntry.entry_id.desc()).limit(limit))
+    return result.mappings().all()
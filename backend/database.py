@@ -1,11 +1,23 @@
 # database.py
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from config import DATABASE_URL
+from config import DATABASE_URL, SQL_ECHO, METRICS_ENABLED, QUERY_DEBUG
+from metrics import TimedAsyncQueuePool, instrument_engine
+import query_debug
 
 # 1) engine & session factory
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=SQL_ECHO,
+    future=True,
+    **({"poolclass": TimedAsyncQueuePool} if METRICS_ENABLED else {}),
+)
+if METRICS_ENABLED:
+    instrument_engine(engine)
+if QUERY_DEBUG != "off":
+    query_debug.install(engine)
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -23,6 +35,8 @@ async def get_db():
 # 4) call at startup to create tables
 async def init_db():
     async with engine.begin() as conn:
+        # Trigram operator classes used by the search indexes.
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
 
 
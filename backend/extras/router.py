@@ -7,7 +7,8 @@ from sqlalchemy.future import select
 from typing import List
 
 from database import get_db
-from models import Extra, Location, User # Make sure to import your models
+from locations.effective_menu import check_owner, drop_overrides, effective_select, menu_changed
+from models import Extra, User # Make sure to import your models
 from schemas import ExtraCreate, ExtraResponse, ExtraUpdate # Import your new schemas
 from auth.auth_handler import get_current_active_user
 
@@ -23,15 +24,26 @@ async def get_all_extras_by_location(
     # current_user: User = Depends(get_current_active_user),
 ):
     """
-    Retrieves all extras associated with a specific location ID.
+    Retrieves all extras served at a specific location ID: its own and its
+    brand's, with the location's overrides applied.
     """
-    result = await db.execute(
-        select(Extra).where(Extra.location_id == location_id)
-    )
-    extras = result.scalars().all()
+    result = await db.execute(effective_select("extra", location_id))
+    extras = result.mappings().all()
     return extras
 
 
+@router.get("/by-brand/{brand_id}", response_model=List[ExtraResponse])
+async def get_all_extras_by_brand(
+    brand_id: UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retrieves the brand-level extras shared by all of a brand's locations.
+    """
+    result = await db.execute(select(Extra).where(Extra.brand_id == brand_id))
+    return result.scalars().all()
+
+
 @router.post("/", response_model=ExtraResponse, status_code=status.HTTP_201_CREATED)
 async def create_extra(
     payload: ExtraCreate,
@@ -39,15 +51,14 @@ async def create_extra(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Creates a new extra for a given location.
+    Creates a new extra for a given location, or for every location of a brand.
     """
-    # Optional: Check if location exists
-    loc_res = await db.execute(select(Location).where(Location.location_id == payload.location_id))
-    if not loc_res.scalars().first():
-        raise HTTPException(status_code=404, detail=f"Location with id {payload.location_id} not found")
+    await check_owner(db, payload)
 
     new_extra = Extra(**payload.model_dump())
     db.add(new_extra)
+    await db.flush()
+    await menu_changed(db, new_extra, record=("extra", new_extra.extra_id))
     await db.commit()
     await db.refresh(new_extra)
     return new_extra
@@ -71,9 +82,16 @@ async def update_extra(
 
     # Optional: Add security check to ensure the user owns the location this extra belongs to.
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
         setattr(db_extra, field, value)
 
+    live_fields = {k: v for k, v in update_data.items() if k in ("is_active", "price")}
+    await menu_changed(
+        db, db_extra,
+        changes=[{"kind": "extra", "id": str(extra_id), **live_fields}] if live_fields else None,
+        record=("extra", extra_id),
+    )
     await db.commit()
     await db.refresh(db_extra)
     return db_extra
@@ -96,6 +114,8 @@ async def delete_extra(
 
     # Optional: Add security check here as well.
 
+    await menu_changed(db, db_extra, changes=[{"kind": "extra", "id": str(extra_id), "removed": True}], record=("extra", extra_id))
+    await drop_overrides(db, "extra", extra_id)
     await db.delete(db_extra)
     await db.commit()
     return None
\ No newline at end of file
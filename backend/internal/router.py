@@ -0,0 +1,21 @@
+# internal/router.py
+
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+import metrics
+from config import METRICS_TOKEN
+
+router = APIRouter(prefix="/internal", tags=["Internal"], include_in_schema=False)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: str = Header(None)):
+    """
+    This worker's request and database metrics for Prometheus to scrape.
+    """
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,62 @@
+# locations/change_log.py
+#
+# The write side of the menu change feed (see changes.py). Every location
+# has a change_seq counter; each write bumps it with UPDATE ... RETURNING, so
+# concurrent writers to one location queue on its row and sequence numbers
+# follow commit order, and stamps the entities it touched with the new
+# numbers in menu_changes, one row per (location, entity). The locations
+# that changed are announced on CHANNEL when the transaction commits, for
+# the webhook dispatcher.
+
+from collections import defaultdict
+
+from sqlalchemy import case, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Location, MenuChange
+from pubsub import notify
+
+# A change that says "refetch the whole menu", e.g. after a menu was cloned in.
+RESYNC = "menu"
+
+CHANNEL = "menu_change_feed"
+# Keeps each notification well under pubsub.MAX_PAYLOAD_BYTES.
+_IDS_PER_NOTIFICATION = 150
+
+
+async def record_changes(db: AsyncSession, changes) -> None:
+    """Stamps (location_id, entity kind, entity id) changes with each location's next sequence numbers."""
+    per_location = defaultdict(dict)
+    for location_id, kind, entity_id in changes:
+        per_location[location_id][(kind, entity_id)] = None
+    if not per_location:
+        return
+
+    counts = {location_id: len(entities) for location_id, entities in per_location.items()}
+    result = await db.execute(
+        update(Location)
+        .where(Location.location_id.in_(counts))
+        # Keep updated_at: it tracks edits to the location itself, not its menu.
+        .values(change_seq=Location.change_seq + case(counts, value=Location.location_id), updated_at=Location.updated_at)
+        .returning(Location.location_id, Location.change_seq)
+        .execution_options(synchronize_session=False)
+    )
+    rows = []
+    for location_id, last_seq in result:
+        entities = per_location[location_id]
+        first_seq = last_seq - len(entities) + 1
+        rows.extend(
+            {"location_id": location_id, "entity_kind": kind, "entity_id": entity_id, "seq": first_seq + offset}
+            for offset, (kind, entity_id) in enumerate(entities)
+        )
+    if rows:
+        stmt = insert(MenuChange).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            constraint="uq_menu_changes_location_entity",
+            set_={"seq": stmt.excluded.seq, "changed_at": func.now()},
+        ))
+
+    location_ids = list(per_location)
+    for start in range(0, len(location_ids), _IDS_PER_NOTIFICATION):
+        await notify(db, CHANNEL, {"location_ids": location_ids[start:start + _IDS_PER_NOTIFICATION]})
@@ -0,0 +1,94 @@
+# locations/changes.py
+#
+# Delta sync for POS/kiosk integrations: the read side of the change log
+# written by change_log.py. menu_changes keeps one row per (location, entity),
+# moved forward on every change, so a client asking for `since=<cursor>` gets
+# each changed entity once, with its current state, however often it was
+# edited. Rows outlive deleted entities: an entity that is gone (or hidden at
+# the location) comes back as a "delete" tombstone.
+
+from collections import defaultdict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import Location, MenuChange, MenuItemExtra, MenuItemOption, MenuItemTag, Schedule, Tag
+from schemas import (
+    ExtraResponse, LocationResponse, MenuItemExtraResponse, MenuItemOptionResponse, MenuItemResponse,
+    OptionChoiceResponse, OptionGroupResponse, ScheduleResponse,
+)
+from .change_log import RESYNC
+from .effective_menu import OVERRIDE_KINDS, effective_select
+
+
+async def _menu_entities(db: AsyncSession, kind: str, location_id, ids) -> dict:
+    schema = {"menu_item": MenuItemResponse, "extra": ExtraResponse,
+              "option_group": OptionGroupResponse, "option_choice": OptionChoiceResponse}[kind]
+    _, primary_key, _, _ = OVERRIDE_KINDS[kind]
+    result = await db.execute(effective_select(kind, location_id).where(primary_key.in_(ids)))
+    entities = {row[primary_key.key]: schema.model_validate(dict(row)).model_dump() for row in result.mappings()}
+    if kind == "menu_item" and entities:
+        tags = await db.execute(
+            select(MenuItemTag.menu_item_id, Tag.slug)
+            .join(Tag, Tag.tag_id == MenuItemTag.tag_id)
+            .where(MenuItemTag.menu_item_id.in_(entities))
+        )
+        for item_id, slug in tags:
+            entities[item_id]["tags"].append(slug)
+    return entities
+
+
+async def _rows(db: AsyncSession, schema, primary_key, ids, *criteria) -> dict:
+    result = await db.execute(select(primary_key.class_).where(primary_key.in_(ids), *criteria))
+    return {getattr(row, primary_key.key): schema.model_validate(row).model_dump() for row in result.scalars()}
+
+
+async def _load_current(db: AsyncSession, location_id, kind: str, ids) -> dict:
+    """entity id -> current state as the location sees it; absent means deleted."""
+    if kind in OVERRIDE_KINDS:
+        return await _menu_entities(db, kind, location_id, ids)
+    if kind == "menu_item_extra":
+        return await _rows(db, MenuItemExtraResponse, MenuItemExtra.menu_item_extra_id, ids)
+    if kind == "menu_item_option":
+        return await _rows(db, MenuItemOptionResponse, MenuItemOption.menu_item_option_id, ids)
+    if kind == "schedule":
+        return await _rows(db, ScheduleResponse, Schedule.schedule_id, ids, Schedule.location_id == location_id)
+    if kind == "location":
+        return await _rows(db, LocationResponse, Location.location_id, ids)
+    return {}
+
+
+async def load_changes(db: AsyncSession, location_id, since: int, limit: int):
+    """Changes after `since`, oldest first, as returned by /locations/{id}/changes; None if no such location."""
+    head = await db.scalar(select(Location.change_seq).where(Location.location_id == location_id))
+    if head is None:
+        return None
+    result = await db.execute(
+        select(MenuChange.seq, MenuChange.entity_kind, MenuChange.entity_id)
+        .where(MenuChange.location_id == location_id, MenuChange.seq > since)
+        .order_by(MenuChange.seq)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids_by_kind = defaultdict(list)
+    for _, kind, entity_id in rows:
+        ids_by_kind[kind].append(entity_id)
+    current = {kind: await _load_current(db, location_id, kind, ids) for kind, ids in ids_by_kind.items()}
+
+    changes = []
+    for seq, kind, entity_id in rows:
+        if kind == RESYNC:
+            changes.append({"seq": seq, "kind": kind, "id": entity_id, "op": "resync", "data": None})
+            continue
+        data = current[kind].get(entity_id)
+        changes.append({"seq": seq, "kind": kind, "id": entity_id, "op": "upsert" if data else "delete", "data": data})
+
+    return {
+        "changes": changes,
+        "cursor": rows[-1].seq if rows else since,
+        "has_more": has_more,
+        "head": head,
+    }
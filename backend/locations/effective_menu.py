@@ -0,0 +1,187 @@
+# locations/effective_menu.py
+#
+# Brand master menus. Menu items, extras, option groups and option choices
+# are owned either by one location or by a brand, in which case every
+# location of the brand serves them. A location's MenuOverride rows say how
+# it differs from the brand (price, availability, hidden), and only exist
+# where it does.
+#
+# `effective_select()` resolves all of that in one query per entity type:
+# the location's own rows plus its brand's, with overrides coalesced in and
+# hidden rows dropped. Rows come back shaped like the base table, with
+# location_id set to the location being read, so readers (menu, facet index,
+# pricing) don't care who owns what.
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, literal, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from cache import invalidate
+from models import Extra, Location, MenuItem, MenuOverride, OptionChoice, OptionGroup, RestaurantBrand
+from .change_log import record_changes
+from .stream import publish_menu_changes
+
+# entity kind -> (model, primary key, overridable price column, overridable availability column)
+OVERRIDE_KINDS = {
+    "menu_item": (MenuItem, MenuItem.item_id, MenuItem.base_price, MenuItem.is_available),
+    "extra": (Extra, Extra.extra_id, Extra.price, Extra.is_active),
+    "option_group": (OptionGroup, OptionGroup.group_id, None, None),
+    "option_choice": (OptionChoice, OptionChoice.choice_id, OptionChoice.price_adjustment, OptionChoice.is_active),
+}
+
+
+def _brand_of(location_id):
+    return select(Location.brand_id).where(Location.location_id == location_id).scalar_subquery()
+
+
+def served_at(model, location_id):
+    """Rows of `model` the location serves: its own and its brand's."""
+    return or_(model.location_id == location_id, model.brand_id == _brand_of(location_id))
+
+
+def effective_select(kind: str, location_id):
+    """The location's effective rows of one entity kind, overrides applied."""
+    model, primary_key, price_column, available_column = OVERRIDE_KINDS[kind]
+    override = aliased(MenuOverride)
+    resolved = {"location_id": literal(location_id, model.location_id.type)}
+    if price_column is not None:
+        resolved[price_column.key] = func.coalesce(override.price, price_column)
+    if available_column is not None:
+        resolved[available_column.key] = func.coalesce(override.is_available, available_column)
+
+    columns = [
+        resolved.get(column.key, column).label(column.key)
+        for column in model.__table__.columns
+        if column.key != "search_vector"
+    ]
+    return (
+        select(*columns)
+        .select_from(model)
+        .outerjoin(override, and_(
+            override.location_id == location_id,
+            override.entity_kind == kind,
+            override.entity_id == primary_key,
+        ))
+        .where(served_at(model, location_id), override.is_hidden.is_not(True))
+    )
+
+
+async def brand_entities(db: AsyncSession, kind: str, location_id, ids) -> dict:
+    """id -> (price, availability) of the `ids` owned by the location's brand."""
+    model, primary_key, price_column, available_column = OVERRIDE_KINDS[kind]
+    result = await db.execute(
+        select(primary_key, price_column if price_column is not None else literal(None), available_column if available_column is not None else literal(None))
+        .where(model.brand_id == _brand_of(location_id), primary_key.in_(ids))
+    )
+    return {entity_id: (price, available) for entity_id, price, available in result}
+
+
+async def upsert_overrides(db: AsyncSession, location_id, rows: list, fields=("price", "is_available", "is_hidden")) -> None:
+    """
+    Writes a location's overrides ({"entity_kind", "entity_id", field: value})
+    with one INSERT ... ON CONFLICT, setting only `fields` on existing rows,
+    then deletes any of its rows left with no difference from the brand.
+    """
+    stmt = insert(MenuOverride).values([{**row, "location_id": location_id} for row in rows])
+    await db.execute(stmt.on_conflict_do_update(
+        constraint="uq_menu_overrides_location_entity",
+        set_={**{field: stmt.excluded[field] for field in fields}, "updated_at": func.now()},
+    ))
+    await db.execute(
+        delete(MenuOverride).where(
+            MenuOverride.location_id == location_id,
+            MenuOverride.price.is_(None),
+            MenuOverride.is_available.is_(None),
+            MenuOverride.is_hidden.is_(False),
+        )
+    )
+
+
+async def check_owner(db: AsyncSession, payload) -> None:
+    """400/404s unless the payload names exactly one existing owner: a location or a brand."""
+    if (payload.location_id is None) == (payload.brand_id is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of location_id or brand_id")
+    if payload.location_id is not None:
+        if not await db.scalar(select(Location.location_id).where(Location.location_id == payload.location_id)):
+            raise HTTPException(status_code=404, detail=f"Location with id {payload.location_id} not found")
+    elif not await db.scalar(select(RestaurantBrand.brand_id).where(RestaurantBrand.brand_id == payload.brand_id)):
+        raise HTTPException(status_code=404, detail=f"Brand with id {payload.brand_id} not found")
+
+
+async def location_ids_for(db: AsyncSession, owner) -> list:
+    """Locations serving a menu entity (anything with location_id/brand_id)."""
+    if owner.location_id is not None:
+        return [owner.location_id]
+    if owner.brand_id is None:
+        return []
+    result = await db.execute(select(Location.location_id).where(Location.brand_id == owner.brand_id))
+    return result.scalars().all()
+
+
+async def menu_changed(db: AsyncSession, owner, item_id=None, changes=None, record=None) -> None:
+    """
+    Invalidates the menus of every location serving `owner` (and the facet
+    index entry of `item_id`), queues storefront `changes` for each, minus
+    the fields a location overrides, and adds the `record` (entity kind, id)
+    to each location's change feed.
+    """
+    location_ids = await location_ids_for(db, owner)
+    if not location_ids:
+        return
+    await invalidate(db, "menu", *location_ids)
+    if item_id is not None:
+        await invalidate(db, "menu_index", *(f"{location_id}@{item_id}" for location_id in location_ids))
+    if record is not None:
+        await record_changes(db, [(location_id, *record) for location_id in location_ids])
+    if not changes:
+        return
+
+    overridden = {}
+    if owner.location_id is None:
+        overridden = await _overridden_fields(db, changes[0]["kind"], changes[0]["id"])
+    for location_id in location_ids:
+        masked = overridden.get(location_id)
+        if masked is None:
+            await publish_menu_changes(db, location_id, changes)
+            continue
+        if "*" in masked:
+            continue
+        visible = [{key: value for key, value in change.items() if key not in masked} for change in changes]
+        if any(len(change) > 2 for change in visible):
+            await publish_menu_changes(db, location_id, visible)
+
+
+async def item_menu_changed(db: AsyncSession, menu_item_id, record=None) -> None:
+    """`menu_changed()` for whoever serves a menu item, by id (links)."""
+    owner = (await db.execute(
+        select(MenuItem.location_id, MenuItem.brand_id).where(MenuItem.item_id == menu_item_id)
+    )).first()
+    if owner is not None:
+        await menu_changed(db, owner, record=record)
+
+
+async def _overridden_fields(db: AsyncSession, kind: str, entity_id) -> dict:
+    """location_id -> entity fields the location overrides ("*" when hidden)."""
+    _, _, price_column, available_column = OVERRIDE_KINDS[kind]
+    result = await db.execute(
+        select(MenuOverride.location_id, MenuOverride.price, MenuOverride.is_available, MenuOverride.is_hidden)
+        .where(MenuOverride.entity_kind == kind, MenuOverride.entity_id == entity_id)
+    )
+    fields = {}
+    for location_id, price, is_available, is_hidden in result:
+        masked = fields.setdefault(location_id, set())
+        if is_hidden:
+            masked.add("*")
+        if price is not None and price_column is not None:
+            masked.add(price_column.key)
+        if is_available is not None and available_column is not None:
+            masked.add(available_column.key)
+    return fields
+
+
+async def drop_overrides(db: AsyncSession, kind: str, entity_id) -> None:
+    """Deletes every location's overrides of an entity that's being deleted."""
+    await db.execute(delete(MenuOverride).where(MenuOverride.entity_kind == kind, MenuOverride.entity_id == entity_id))
@@ -0,0 +1,113 @@
+# locations/menu_clone.py
+#
+# Copies a location's own menu graph (items, extras, option groups, choices,
+# both link tables and tags) to one or many other locations in a single
+# statement. Each *_map CTE assigns every (source row, target location) pair
+# a fresh id; the data-modifying CTEs then INSERT ... SELECT through those
+# maps, so links are remapped in SQL and nothing round-trips to the client.
+# Foreign keys are checked at the end of the statement, after every insert.
+#
+# Links to the source's brand-level extras/groups are kept only for targets
+# of the same brand, since other targets don't serve them.
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CLONE_MENU = text("""
+WITH targets AS MATERIALIZED (
+    SELECT location_id, brand_id FROM locations WHERE location_id = ANY(CAST(:target_ids AS uuid[]))
+),
+item_map AS MATERIALIZED (
+    SELECT s.item_id AS old_id, t.location_id, gen_random_uuid() AS new_id
+    FROM menu_items s CROSS JOIN targets t
+    WHERE s.location_id = :source_id
+),
+extra_map AS MATERIALIZED (
+    SELECT s.extra_id AS old_id, t.location_id, gen_random_uuid() AS new_id
+    FROM extras s CROSS JOIN targets t
+    WHERE s.location_id = :source_id
+),
+group_map AS MATERIALIZED (
+    SELECT s.group_id AS old_id, t.location_id, gen_random_uuid() AS new_id
+    FROM option_groups s CROSS JOIN targets t
+    WHERE s.location_id = :source_id
+),
+new_items AS (
+    INSERT INTO menu_items (item_id, location_id, item_name, description, base_price, is_available, image_url, category_id)
+    SELECT m.new_id, m.location_id, s.item_name, s.description, s.base_price, s.is_available, s.image_url, s.category_id
+    FROM item_map m JOIN menu_items s ON s.item_id = m.old_id
+    RETURNING 1
+),
+new_extras AS (
+    INSERT INTO extras (extra_id, location_id, name, price, description, is_active)
+    SELECT m.new_id, m.location_id, s.name, s.price, s.description, s.is_active
+    FROM extra_map m JOIN extras s ON s.extra_id = m.old_id
+    RETURNING 1
+),
+new_groups AS (
+    INSERT INTO option_groups (group_id, location_id, group_name, min_choices, max_choices, is_required)
+    SELECT m.new_id, m.location_id, s.group_name, s.min_choices, s.max_choices, s.is_required
+    FROM group_map m JOIN option_groups s ON s.group_id = m.old_id
+    RETURNING 1
+),
+new_choices AS (
+    INSERT INTO option_choices (location_id, group_id, name, price_adjustment, is_active)
+    SELECT t.location_id, coalesce(g.new_id, s.group_id), s.name, s.price_adjustment, s.is_active
+    FROM option_choices s
+    CROSS JOIN targets t
+    LEFT JOIN group_map g ON g.old_id = s.group_id AND g.location_id = t.location_id
+    WHERE s.location_id = :source_id
+      AND (g.new_id IS NOT NULL OR EXISTS (
+          SELECT 1 FROM option_groups b WHERE b.group_id = s.group_id AND b.brand_id = t.brand_id
+      ))
+    RETURNING 1
+),
+new_item_extras AS (
+    INSERT INTO menu_item_extras (menu_item_id, extra_id)
+    SELECT m.new_id, coalesce(e.new_id, l.extra_id)
+    FROM menu_item_extras l
+    JOIN item_map m ON m.old_id = l.menu_item_id
+    JOIN targets t ON t.location_id = m.location_id
+    LEFT JOIN extra_map e ON e.old_id = l.extra_id AND e.location_id = m.location_id
+    WHERE e.new_id IS NOT NULL OR EXISTS (
+        SELECT 1 FROM extras b WHERE b.extra_id = l.extra_id AND b.brand_id = t.brand_id
+    )
+    RETURNING 1
+),
+new_item_options AS (
+    INSERT INTO menu_item_options (menu_item_id, group_id)
+    SELECT m.new_id, coalesce(g.new_id, l.group_id)
+    FROM menu_item_options l
+    JOIN item_map m ON m.old_id = l.menu_item_id
+    JOIN targets t ON t.location_id = m.location_id
+    LEFT JOIN group_map g ON g.old_id = l.group_id AND g.location_id = m.location_id
+    WHERE g.new_id IS NOT NULL OR EXISTS (
+        SELECT 1 FROM option_groups b WHERE b.group_id = l.group_id AND b.brand_id = t.brand_id
+    )
+    RETURNING 1
+),
+new_item_tags AS (
+    INSERT INTO menu_item_tags (menu_item_id, tag_id)
+    SELECT m.new_id, l.tag_id FROM menu_item_tags l JOIN item_map m ON m.old_id = l.menu_item_id
+    RETURNING 1
+),
+new_extra_tags AS (
+    INSERT INTO extra_tags (extra_id, tag_id)
+    SELECT m.new_id, l.tag_id FROM extra_tags l JOIN extra_map m ON m.old_id = l.extra_id
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM new_items) AS menu_items,
+    (SELECT count(*) FROM new_extras) AS extras,
+    (SELECT count(*) FROM new_groups) AS option_groups,
+    (SELECT count(*) FROM new_choices) AS option_choices,
+    (SELECT count(*) FROM new_item_extras) AS menu_item_extras,
+    (SELECT count(*) FROM new_item_options) AS menu_item_options,
+    (SELECT count(*) FROM new_item_tags) + (SELECT count(*) FROM new_extra_tags) AS tags
+""")
+
+
+async def clone_menu(db: AsyncSession, source_id, target_ids: list) -> dict:
+    """Copies the source location's menu to every target; returns rows created per table."""
+    result = await db.execute(CLONE_MENU, {"source_id": source_id, "target_ids": list(target_ids)})
+    return dict(result.mappings().one())
@@ -0,0 +1,190 @@
+# locations/menu_index.py
+#
+# In-memory facet index over a location's menu items. Every item gets a slot
+# (a bit position); each tag, category and the "available" flag is an int
+# used as a bitset over those slots, and prices are kept in a sorted array.
+# Tag AND/OR filters, price ranges and facet counts are then bitwise
+# operations and popcounts instead of SQL joins.
+#
+# Writes don't drop the index: they invalidate "location_id@item_id" in the
+# "menu_index" namespace, which marks just that item dirty on every worker.
+# The next read reloads the dirty items with one query and patches them in.
+
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from cache import LocalCache, local_cache
+from models import MenuItem, MenuItemTag, Tag
+from schemas import MenuItemResponse
+from .effective_menu import effective_select, served_at
+
+
+def to_cents(price) -> int:
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+def _bits(mask: int):
+    """Slot numbers set in `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class MenuIndex:
+    def __init__(self):
+        self.items = []          # slot -> serialized item, or None for a free slot
+        self.slots = {}          # item_id -> slot
+        self.free = []           # reusable slots
+        self.all = 0             # every occupied slot
+        self.available = 0
+        self.tags = {}           # tag slug -> bitset
+        self.categories = {}     # category_id -> bitset
+        self.prices = []         # sorted (price in cents, slot)
+        self.dirty = set()       # item ids to reload before the next read
+
+    # --- maintenance ---
+
+    def _clear_bit(self, mapping: dict, key, bit: int) -> None:
+        mapping[key] &= ~bit
+        if not mapping[key]:
+            del mapping[key]
+
+    def remove(self, item_id) -> None:
+        slot = self.slots.pop(item_id, None)
+        if slot is None:
+            return
+        item, bit = self.items[slot], 1 << slot
+        for slug in item["tags"]:
+            self._clear_bit(self.tags, slug, bit)
+        self._clear_bit(self.categories, item["category_id"], bit)
+        self.prices.pop(bisect_left(self.prices, (item["price_cents"], slot)))
+        self.all &= ~bit
+        self.available &= ~bit
+        self.items[slot] = None
+        self.free.append(slot)
+
+    def add(self, item: dict, tag_slugs: Iterable[str]) -> None:
+        """Adds (or replaces) one serialized MenuItemResponse with its tag slugs."""
+        self.remove(item["item_id"])
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.items)
+            self.items.append(None)
+        bit = 1 << slot
+        item = {**item, "tags": sorted(set(tag_slugs)), "price_cents": to_cents(item["base_price"])}
+        self.items[slot] = item
+        self.slots[item["item_id"]] = slot
+
+        self.all |= bit
+        if item["is_available"]:
+            self.available |= bit
+        for slug in item["tags"]:
+            self.tags[slug] = self.tags.get(slug, 0) | bit
+        self.categories[item["category_id"]] = self.categories.get(item["category_id"], 0) | bit
+        insort(self.prices, (item["price_cents"], slot))
+
+    # --- queries ---
+
+    def price_mask(self, min_cents: Optional[int] = None, max_cents: Optional[int] = None) -> int:
+        if min_cents is None and max_cents is None:
+            return self.all
+        start = 0 if min_cents is None else bisect_left(self.prices, (min_cents, -1))
+        end = len(self.prices) if max_cents is None else bisect_right(self.prices, (max_cents, len(self.items)))
+        mask = 0
+        for _, slot in self.prices[start:end]:
+            mask |= 1 << slot
+        return mask
+
+    def mask(self, all_tags=(), any_tags=(), min_cents=None, max_cents=None, category_id=None, available_only=False) -> int:
+        mask = self.price_mask(min_cents, max_cents)
+        for slug in all_tags:
+            mask &= self.tags.get(slug, 0)
+        if any_tags:
+            either = 0
+            for slug in any_tags:
+                either |= self.tags.get(slug, 0)
+            mask &= either
+        if category_id is not None:
+            mask &= self.categories.get(category_id, 0)
+        if available_only:
+            mask &= self.available
+        return mask
+
+    def select(self, mask: int) -> list:
+        """Items in `mask` without the index-only fields."""
+        return [
+            {key: value for key, value in self.items[slot].items() if key != "price_cents"}
+            for slot in _bits(mask)
+        ]
+
+    def item_ids(self, mask: int) -> set:
+        return {self.items[slot]["item_id"] for slot in _bits(mask)}
+
+    def facets(self, mask: int) -> dict:
+        return {slug: (bits & mask).bit_count() for slug, bits in self.tags.items() if bits & mask}
+
+
+class _MenuIndexCache(LocalCache):
+    """Evicting "location_id@item_id" marks the item dirty instead of dropping the index."""
+
+    def evict(self, *keys) -> None:
+        self._generation += 1
+        for key in map(str, keys):
+            location_id, _, item_id = key.partition("@")
+            if not item_id:
+                self._entries.pop(location_id, None)
+            elif location_id in self._entries:
+                self._entries[location_id].dirty.add(UUID(item_id))
+
+
+menu_index_cache = local_cache("menu_index", maxsize=256, cache_class=_MenuIndexCache)
+
+
+async def load_menu_items(db: AsyncSession, location_id, item_ids=None):
+    """[(serialized item, tag slugs)] the location serves, or for just `item_ids`."""
+    query = effective_select("menu_item", location_id)
+    tag_query = (
+        select(MenuItemTag.menu_item_id, Tag.slug)
+        .join(Tag, Tag.tag_id == MenuItemTag.tag_id)
+        .join(MenuItem, MenuItem.item_id == MenuItemTag.menu_item_id)
+        .where(served_at(MenuItem, location_id))
+    )
+    if item_ids is not None:
+        query = query.where(MenuItem.item_id.in_(item_ids))
+        tag_query = tag_query.where(MenuItemTag.menu_item_id.in_(item_ids))
+
+    tags = {}
+    for item_id, slug in await db.execute(tag_query):
+        tags.setdefault(item_id, []).append(slug)
+    items = (await db.execute(query)).mappings().all()
+    return [(MenuItemResponse.model_validate(dict(item)).model_dump(), sorted(tags.get(item["item_id"], ()))) for item in items]
+
+
+async def load_menu_index(db: AsyncSession, location_id: UUID) -> MenuIndex:
+    """The location's index, built once per worker and patched with dirty items on later reads."""
+    async def build():
+        index = MenuIndex()
+        for item, tag_slugs in await load_menu_items(db, location_id):
+            index.add(item, tag_slugs)
+        return index
+
+    index = await menu_index_cache.get_or_load(location_id, build)
+    if index.dirty:
+        dirty, index.dirty = index.dirty, set()
+        try:
+            reloaded = await load_menu_items(db, location_id, dirty)
+        except Exception:
+            index.dirty |= dirty
+            raise
+        for item_id in dirty:
+            index.remove(item_id)
+        for item, tag_slugs in reloaded:
+            index.add(item, tag_slugs)
+    return index
@@ -0,0 +1,130 @@
+# locations/pricing.py
+#
+# Server-side cart pricing. A location's menu is compiled once into plain
+# dicts of integer cents (item -> allowed extras and option groups -> choice
+# prices), so validating and pricing a cart is a handful of dict lookups and
+# integer additions, with no queries and no float rounding.
+#
+# The compiled table is a variant of the location's "menu" cache entry
+# ("location_id@pricing"), so every menu write that evicts the location's
+# menu rebuilds it too.
+
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from cache import local_cache
+from models import MenuItem, MenuItemExtra, MenuItemOption
+from .effective_menu import effective_select, served_at
+from .menu_index import to_cents
+
+menu_cache = local_cache("menu")
+
+
+@dataclass
+class PricedGroup:
+    name: str
+    min_choices: int
+    max_choices: int
+    is_required: bool
+    choices: dict = field(default_factory=dict)  # choice_id -> cents, active choices only
+
+
+@dataclass
+class PricedItem:
+    base_cents: int
+    is_available: bool
+    extras: dict = field(default_factory=dict)  # extra_id -> cents, active extras only
+    group_ids: list = field(default_factory=list)
+
+
+class PricingTable:
+    def __init__(self, items: dict, groups: dict):
+        self.items = items
+        self.groups = groups
+        # choice_id -> group_id, for choices of any linked group.
+        self.choice_groups = {choice_id: group_id for group_id, group in groups.items() for choice_id in group.choices}
+
+    def price_line(self, menu_item_id, extra_ids, choice_ids):
+        """(unit price in cents, errors) for one configured item."""
+        item = self.items.get(menu_item_id)
+        if item is None:
+            return 0, ["Menu item not found at this location"]
+
+        errors = []
+        if not item.is_available:
+            errors.append("Menu item is unavailable")
+        unit = item.base_cents
+
+        if len(set(extra_ids)) != len(extra_ids):
+            errors.append("An extra was selected more than once")
+        for extra_id in set(extra_ids):
+            cents = item.extras.get(extra_id)
+            if cents is None:
+                errors.append(f"Extra {extra_id} is not available for this item")
+            else:
+                unit += cents
+
+        chosen = {group_id: 0 for group_id in item.group_ids}
+        if len(set(choice_ids)) != len(choice_ids):
+            errors.append("An option was selected more than once")
+        for choice_id in set(choice_ids):
+            group_id = self.choice_groups.get(choice_id)
+            if group_id not in chosen:
+                errors.append(f"Option {choice_id} is not available for this item")
+                continue
+            chosen[group_id] += 1
+            unit += self.groups[group_id].choices[choice_id]
+
+        for group_id, count in chosen.items():
+            group = self.groups[group_id]
+            minimum = max(group.min_choices, 1 if group.is_required else 0)
+            if count < minimum:
+                errors.append(f"Choose at least {minimum} for '{group.name}'")
+            elif group.max_choices and count > group.max_choices:
+                errors.append(f"Choose at most {group.max_choices} for '{group.name}'")
+        return unit, errors
+
+
+async def _compile(db: AsyncSession, location_id) -> PricingTable:
+    # Brand entities come with the location's overrides applied; hidden ones are
+    # absent, so links to them are dropped below.
+    items = {
+        row.item_id: PricedItem(to_cents(row.base_price), row.is_available)
+        for row in await db.execute(effective_select("menu_item", location_id))
+    }
+    extras = {
+        row.extra_id: to_cents(row.price)
+        for row in await db.execute(effective_select("extra", location_id))
+        if row.is_active
+    }
+    groups = {
+        row.group_id: PricedGroup(row.group_name, row.min_choices or 0, row.max_choices or 0, row.is_required)
+        for row in await db.execute(effective_select("option_group", location_id))
+    }
+    for row in await db.execute(effective_select("option_choice", location_id)):
+        if row.is_active and row.group_id in groups:
+            groups[row.group_id].choices[row.choice_id] = to_cents(row.price_adjustment or 0)
+
+    for menu_item_id, extra_id in await db.execute(
+        select(MenuItemExtra.menu_item_id, MenuItemExtra.extra_id)
+        .join(MenuItem, MenuItem.item_id == MenuItemExtra.menu_item_id)
+        .where(served_at(MenuItem, location_id))
+    ):
+        if menu_item_id in items and extra_id in extras:
+            items[menu_item_id].extras[extra_id] = extras[extra_id]
+    for menu_item_id, group_id in await db.execute(
+        select(MenuItemOption.menu_item_id, MenuItemOption.group_id)
+        .join(MenuItem, MenuItem.item_id == MenuItemOption.menu_item_id)
+        .where(served_at(MenuItem, location_id))
+    ):
+        if menu_item_id in items and group_id in groups:
+            items[menu_item_id].group_ids.append(group_id)
+
+    return PricingTable(items, groups)
+
+
+async def load_pricing_table(db: AsyncSession, location_id: UUID) -> PricingTable:
+    return await menu_cache.get_or_load(f"{location_id}@pricing", lambda: _compile(db, location_id))
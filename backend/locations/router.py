@@ -1,15 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status,Query
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status,Query, Request, Response, Header
+from fastapi.responses import StreamingResponse
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, update
 from sqlalchemy.future import select
 from database import get_db
-from models import Location, RestaurantOwner, RestaurantBrand, User,MenuItem
+from cache import local_cache, invalidate
+from .stream import MENU_EVENT_ID_HEADER, broadcaster, publish_menu_changes
+from .effective_menu import brand_entities, upsert_overrides
+from schedules.hours import load_menu_windows
+from .menu_index import load_menu_index, load_menu_items, to_cents
+from .pricing import load_pricing_table
+from .menu_clone import clone_menu
+from .change_log import RESYNC, record_changes
+from .changes import load_changes
+from models import Location, RestaurantOwner, RestaurantBrand, User,MenuItem, Extra, OptionChoice
 from auth.auth_handler import get_current_active_user
-from schemas import LocationCreate, LocationResponse,MenuItemResponse,LocationUpdate
+from schemas import LocationCreate, LocationResponse,MenuItemResponse,LocationUpdate, BulkAvailabilityUpdate, BulkAvailabilityResponse, MenuFacetsResponse, CartPriceRequest, CartPriceResponse, MenuCloneRequest, MenuCloneResponse, ChangeFeedResponse
 from typing import List, Optional
 
 router = APIRouter(prefix="/locations", tags=["locations"])
 
+# Serialized menu items per location; evicted by every menu write path via the "menu" namespace.
+menu_cache = local_cache("menu")
+location_cache = local_cache("location")
+
 @router.get("/has-location", response_model=List[LocationResponse])
 async def has_location(
     current_user: User = Depends(get_current_active_user),
@@ -67,6 +84,7 @@ async def create_location(
         end_date=payload.end_date,
         delivery_available=payload.delivery_available,
         dine_in=payload.dine_in,
+        timezone=payload.timezone,
     )
 
     db.add(new_location)
@@ -80,11 +98,14 @@ async def get_location_by_id(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(Location).where(Location.location_id == location_id)
-    )
-    location = result.scalars().first()
+    async def load_location():
+        result = await db.execute(
+            select(Location).where(Location.location_id == location_id)
+        )
+        location = result.scalars().first()
+        return LocationResponse.model_validate(location).model_dump() if location else None
 
+    location = await location_cache.get_or_load(location_id, load_location)
     if not location:
         raise HTTPException(
             status_code=404, detail="Location not found"
@@ -112,6 +133,12 @@ async def update_location(
     for field, value in updated_data.model_dump(exclude_unset=True).items():
         setattr(location, field, value)
 
+    await invalidate(db, "location", location_id)
+    await record_changes(db, [(location_id, "location", location_id)])
+    if updated_data.timezone is not None:
+        await invalidate(db, "hours", location_id)
+        await invalidate(db, "menu_windows", location_id)
+        await invalidate(db, "menu", location_id)
     await db.commit()
     await db.refresh(location)
 
@@ -121,25 +148,270 @@ async def update_location(
 @router.get("/{location_id}/menu", response_model=List[MenuItemResponse])
 async def get_menu_by_location_id(
     location_id: UUID,
+    response: Response,
     category_id: Optional[int] = Query(None), # <-- ADDED THIS
+    at: Optional[datetime.datetime] = Query(None, description="Only items orderable at this time; naive times are UTC"),
+    tags: Optional[str] = Query(None, description="Comma-separated tag slugs; items must have all of them"),
+    any_tags: Optional[str] = Query(None, description="Comma-separated tag slugs; items must have at least one"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieves all menu items for a specific location.
     Can be optionally filtered by category_id.
+    With `at`, only available items whose category and item windows are open then.
+    Tag and price filters are answered from the location's in-memory facet index.
+    X-Menu-Event-Id, when present, is where `/{location_id}/menu/stream` should resume.
     """
-    # Start the base query
-    query = select(MenuItem).where(MenuItem.location_id == location_id)
+    # Taken before reading: every event heard so far is already in what is read below.
+    event_id = broadcaster.position(location_id)
+    if event_id is not None:
+        response.headers[MENU_EVENT_ID_HEADER] = str(event_id)
 
-    # If a category_id is provided, add another filter to the query
-    if category_id is not None:
-        query = query.where(MenuItem.category_id == category_id)
+    async def load_menu():
+        return [{**item, "tags": tag_slugs} for item, tag_slugs in await load_menu_items(db, location_id)]
+
+    filtered = tags or any_tags or min_price is not None or max_price is not None
+    if at is not None:
+        at = at if at.tzinfo else at.replace(tzinfo=datetime.timezone.utc)
+        windows = await load_menu_windows(db, location_id)
+        if windows is None:
+            raise HTTPException(status_code=404, detail="Location not found")
 
-    # Execute the final query
-    result = await db.execute(query)
-    menu_items = result.scalars().all()
+        async def load_orderable():
+            # Read the full menu in here, so an eviction during either read keeps this entry out of the cache.
+            menu = await menu_cache.get_or_load(location_id, load_menu)
+            return [
+                item for item in menu
+                if item["is_available"] and windows.orderable(item["category_id"], item["item_id"], at)
+            ]
+
+        # The orderable set only changes at window boundaries, so every `at` in the
+        # same bucket shares one cache entry until the next transition.
+        menu_items = await menu_cache.get_or_load(f"{location_id}@{windows.bucket(at)}", load_orderable)
+        if filtered:
+            index = await load_menu_index(db, location_id)
+            selected = index.item_ids(_facet_mask(index, category_id, tags, any_tags, min_price, max_price))
+            menu_items = [item for item in menu_items if item["item_id"] in selected]
+    elif filtered:
+        index = await load_menu_index(db, location_id)
+        menu_items = index.select(_facet_mask(index, category_id, tags, any_tags, min_price, max_price))
+    else:
+        # The whole location's menu is cached; the category filter is applied on the cached list.
+        menu_items = await menu_cache.get_or_load(location_id, load_menu)
+    if category_id is not None:
+        menu_items = [item for item in menu_items if item["category_id"] == category_id]
     return menu_items
 
 
+def _split_slugs(value: Optional[str]) -> list:
+    return [slug.strip() for slug in value.split(",") if slug.strip()] if value else []
+
+
+def _facet_mask(index, category_id, tags, any_tags, min_price, max_price) -> int:
+    return index.mask(
+        all_tags=_split_slugs(tags),
+        any_tags=_split_slugs(any_tags),
+        min_cents=to_cents(min_price) if min_price is not None else None,
+        max_cents=to_cents(max_price) if max_price is not None else None,
+        category_id=category_id,
+    )
+
+
+@router.get("/{location_id}/menu/facets", response_model=MenuFacetsResponse)
+async def get_menu_facets(
+    location_id: UUID,
+    category_id: Optional[int] = Query(None),
+    tags: Optional[str] = Query(None),
+    any_tags: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    How many items match the same filters as `/{location_id}/menu`, and how
+    many of those carry each tag, for rendering filter chips with counts.
+    """
+    index = await load_menu_index(db, location_id)
+    mask = _facet_mask(index, category_id, tags, any_tags, min_price, max_price)
+    return {"total": mask.bit_count(), "tags": index.facets(mask)}
+
+
+@router.get("/{location_id}/menu/stream")
+async def stream_menu_changes(
+    location_id: UUID,
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    since: Optional[int] = Query(None, description="The menu response's X-Menu-Event-Id, for the first connection"),
+):
+    """
+    Server-Sent Events with availability and price changes for the location's menu.
+    Clients load `/{location_id}/menu` once, then connect with `since` set to
+    its X-Menu-Event-Id and apply "menu" events; on a "reset" event they
+    refetch the menu. Reconnects resume from Last-Event-ID.
+    """
+    if last_event_id is None:
+        last_event_id = since
+    return StreamingResponse(
+        broadcaster.stream(location_id, last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{location_id}/menu/clone", response_model=MenuCloneResponse)
+async def clone_location_menu(
+    location_id: UUID,
+    payload: MenuCloneRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Copies the location's whole menu (items, extras, option groups and
+    choices, their links and tags) to other locations of the same restaurant
+    in one statement, with new ids. Targets keep their existing menu.
+    """
+    target_ids = set(payload.location_ids)
+    if location_id in target_ids:
+        raise HTTPException(status_code=400, detail="Cannot clone a menu onto its own location")
+    source = await db.scalar(select(Location.restaurant_id).where(Location.location_id == location_id))
+    if not source:
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    result = await db.execute(
+        select(Location.location_id, Location.restaurant_id).where(Location.location_id.in_(target_ids))
+    )
+    targets = dict(result.all())
+    missing = target_ids - targets.keys()
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Locations not found: {', '.join(sorted(map(str, missing)))}")
+    # Menu items point at the restaurant's categories, so menus only move within it.
+    if any(restaurant_id != source for restaurant_id in targets.values()):
+        raise HTTPException(status_code=400, detail="Target locations must belong to the same restaurant")
+
+    counts = await clone_menu(db, location_id, target_ids)
+    await invalidate(db, "menu", *target_ids)
+    await invalidate(db, "menu_index", *target_ids)
+    # Too many new rows to list one by one; feed clients refetch the menu instead.
+    await record_changes(db, [(target_id, RESYNC, target_id) for target_id in target_ids])
+    await db.commit()
+    return counts
+
+
+@router.get("/{location_id}/changes", response_model=ChangeFeedResponse)
+async def get_menu_changes(
+    location_id: UUID,
+    since: int = Query(0, ge=0, description="The `cursor` of the previous page, or a `head` value"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Menu items, extras, option groups and choices, their links, schedules and
+    location details changed after `since`, each once with its current state,
+    or as a "delete" tombstone. A "resync" change means refetch everything.
+    To start syncing, note `head`, load the full menu, then poll from `head`.
+    """
+    feed = await load_changes(db, location_id, since, limit)
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Location not found")
+    return feed
+
+
+# (payload field, model, primary key, availability column, menu event kind)
+AVAILABILITY_TARGETS = (
+    ("menu_items", MenuItem, MenuItem.item_id, MenuItem.is_available, "menu_item"),
+    ("extras", Extra, Extra.extra_id, Extra.is_active, "extra"),
+    ("option_choices", OptionChoice, OptionChoice.choice_id, OptionChoice.is_active, "option_choice"),
+)
 
+@router.put("/{location_id}/availability", response_model=BulkAvailabilityResponse)
+async def bulk_update_availability(
+    location_id: UUID,
+    payload: BulkAvailabilityUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Marks many menu items, extras and option choices of a location available
+    or unavailable at once: one UPDATE per entity type, one transaction, and
+    one invalidation/storefront event for the whole batch. Brand-level ids
+    are changed at this location only, through its overrides.
+    """
+    response = {}
+    changes = []
+    records = []
+    for field, model, primary_key, column, kind in AVAILABILITY_TARGETS:
+        available = set(getattr(payload.available, field))
+        unavailable = set(getattr(payload.unavailable, field))
+        if available & unavailable:
+            raise HTTPException(status_code=400, detail=f"{field} ids cannot be both available and unavailable")
+        ids = available | unavailable
+        if not ids:
+            continue
+
+        result = await db.execute(
+            update(model)
+            .where(model.location_id == location_id, primary_key.in_(ids))
+            .values({column.key: case((primary_key.in_(available), True), else_=False)})
+            .returning(primary_key, column)
+            .execution_options(synchronize_session=False)
+        )
+        updated = dict(result.all())
+        missing = ids - updated.keys()
+        if missing:
+            # The brand's entities change for this location only, as overrides
+            # (cleared where the location would match the brand again).
+            brand_owned = await brand_entities(db, kind, location_id, missing)
+            if brand_owned:
+                wanted = {entity_id: entity_id in available for entity_id in brand_owned}
+                await upsert_overrides(db, location_id, [
+                    {"entity_kind": kind, "entity_id": entity_id, "is_available": None if brand_owned[entity_id][1] == value else value}
+                    for entity_id, value in wanted.items()
+                ], fields=("is_available",))
+                updated.update(wanted)
+                missing -= brand_owned.keys()
+        if missing:
+            # Nothing has been committed; the session rolls back on exit.
+            raise HTTPException(status_code=404, detail=f"{field} not found at this location: {', '.join(sorted(map(str, missing)))}")
 
+        response[field] = updated
+        changes.extend({"kind": kind, "id": str(node_id), column.key: value} for node_id, value in updated.items())
+        records.extend((location_id, kind, node_id) for node_id in updated)
+
+    if changes:
+        await invalidate(db, "menu", location_id)
+        if response.get("menu_items"):
+            await invalidate(db, "menu_index", *(f"{location_id}@{item_id}" for item_id in response["menu_items"]))
+        await publish_menu_changes(db, location_id, changes)
+        await record_changes(db, records)
+        await db.commit()
+    return response
+
+
+@router.post("/{location_id}/price", response_model=CartPriceResponse)
+async def price_cart(
+    location_id: UUID,
+    payload: CartPriceRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Validates and prices a whole cart against the location's current menu:
+    base price + selected extras + option choice adjustments, times quantity,
+    with option group min/max/required rules enforced. Amounts are in cents.
+    """
+    table = await load_pricing_table(db, location_id)
+    lines = []
+    total = 0
+    for line in payload.items:
+        unit, errors = table.price_line(line.menu_item_id, line.extra_ids, line.choice_ids)
+        line_cents = unit * line.quantity
+        total += line_cents
+        lines.append({
+            "menu_item_id": line.menu_item_id,
+            "quantity": line.quantity,
+            "unit_cents": unit,
+            "line_cents": line_cents,
+            "errors": errors,
+        })
+    return {"valid": not any(line["errors"] for line in lines), "total_cents": total, "lines": lines}
@@ -0,0 +1,175 @@
+# locations/stream.py
+#
+# Server-Sent Events for storefronts: availability and price changes to a
+# location's menu are pushed as they commit, instead of being polled for.
+# Writers call `publish_menu_changes()` inside their transaction; each worker
+# hears it once on the shared pubsub connection and fans it out to all of
+# its open streams for that location, so a connected client costs a queue,
+# not a database connection or a poll.
+#
+# Event ids come from a database sequence, so they increase across workers,
+# but they are taken before commit: concurrent writers can commit, and so be
+# heard, out of id order. Each worker keeps the last RING_SIZE events per
+# location in the order heard and replays them to a client reconnecting
+# with Last-Event-ID; if it can't prove the client missed nothing, the
+# client gets a "reset" event and refetches the menu. A first connection
+# resumes from the position the menu response carried (see `position()`),
+# so changes committed between reading the menu and subscribing aren't lost.
+
+import asyncio
+import json
+from collections import defaultdict, deque
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import menu_event_seq
+from pubsub import listener, notify, MAX_PAYLOAD_BYTES
+
+CHANNEL = "menu_deltas"
+RING_SIZE = 256
+CLIENT_QUEUE_SIZE = 64
+HEARTBEAT_SECONDS = 15
+# Sent with the menu: the stream position its contents are current to.
+MENU_EVENT_ID_HEADER = "X-Menu-Event-Id"
+
+RESET = "event: reset\ndata: {}\n\n"
+
+
+async def publish_menu_changes(db: AsyncSession, location_id, changes: list) -> None:
+    """
+    Queues availability/price changes for the location's storefront streams,
+    e.g. [{"kind": "menu_item", "id": ..., "is_available": False}].
+    Sent on commit; large batches are split across several events.
+    """
+    batch = []
+    for change in changes:
+        candidate = batch + [change]
+        if batch and len(json.dumps(candidate, default=str)) > MAX_PAYLOAD_BYTES - 200:
+            await _notify_batch(db, location_id, batch)
+            candidate = [change]
+        batch = candidate
+    if batch:
+        await _notify_batch(db, location_id, batch)
+
+
+async def _notify_batch(db: AsyncSession, location_id, changes: list) -> None:
+    event_id = await db.scalar(menu_event_seq.next_value())
+    await notify(db, CHANNEL, {"id": event_id, "location_id": str(location_id), "changes": changes})
+
+
+def _format(event_id: int, changes) -> str:
+    return f"id: {event_id}\nevent: menu\ndata: {json.dumps(changes, default=str, separators=(',', ':'))}\n\n"
+
+
+def _late(ring: list, last_event_id: int) -> bool:
+    """Whether an event with a lower id than `last_event_id` was heard after it, so replay by id can't cover it."""
+    heard = next((index for index, (event_id, _) in enumerate(ring) if event_id == last_event_id), -1)
+    return any(event_id < last_event_id for event_id, _ in ring[heard + 1:])
+
+
+class MenuBroadcaster:
+    """Per-worker fan-out of menu events to SSE client queues, keyed by location id."""
+
+    def __init__(self):
+        self._clients = defaultdict(set)
+        self._rings = defaultdict(lambda: deque(maxlen=RING_SIZE))
+        # Events with ids at or below the floor may have been missed by this
+        # worker: the global floor is set by the first event heard since the
+        # listener (re)connected, per-location floors by ring evictions.
+        self._global_floor = None
+        self._floors = {}
+        self._last_heard = None  # highest id heard since the listener (re)connected
+
+    def subscribe(self, location_id, last_event_id=None) -> asyncio.Queue:
+        location_id = str(location_id)
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        if last_event_id is not None:
+            floor = self._global_floor
+            if floor is not None:
+                floor = max(floor, self._floors.get(location_id, floor))
+            ring = list(self._rings.get(location_id, ()))
+            missed = [message for event_id, message in ring if event_id > last_event_id]
+            if floor is None or last_event_id < floor or len(missed) >= CLIENT_QUEUE_SIZE or _late(ring, last_event_id):
+                queue.put_nowait(RESET)
+            else:
+                for message in missed:
+                    queue.put_nowait(message)
+        self._clients[location_id].add(queue)
+        return queue
+
+    def position(self, location_id):
+        """
+        An event id to resume the location's stream from, for a client about
+        to read its menu: everything heard up to now is already committed and
+        so in what it reads. None until this worker has heard an event since
+        its listener (re)connected.
+        """
+        if self._global_floor is None:
+            return None
+        ring = self._rings.get(str(location_id))
+        if ring:
+            return max(event_id for event_id, _ in ring)
+        return self._last_heard
+
+    def unsubscribe(self, location_id, queue: asyncio.Queue) -> None:
+        clients = self._clients.get(str(location_id))
+        if clients is not None:
+            clients.discard(queue)
+            if not clients:
+                del self._clients[str(location_id)]
+
+    def handle_notification(self, payload: str) -> None:
+        event = json.loads(payload)
+        location_id, event_id = event["location_id"], event["id"]
+        message = _format(event_id, event["changes"])
+
+        if self._global_floor is None:
+            self._global_floor = event_id - 1
+        self._last_heard = max(event_id, self._last_heard or event_id)
+        ring = self._rings[location_id]
+        if len(ring) == ring.maxlen:
+            self._floors[location_id] = max(ring[0][0], self._floors.get(location_id, ring[0][0]))
+        ring.append((event_id, message))
+
+        for queue in self._clients.get(location_id, ()):
+            self._push(queue, message)
+
+    def reset_all(self) -> None:
+        # Events may have been lost while the listener was reconnecting.
+        self._global_floor = None
+        self._last_heard = None
+        self._rings.clear()
+        self._floors.clear()
+        for clients in self._clients.values():
+            for queue in clients:
+                self._push(queue, RESET)
+
+    @staticmethod
+    def _push(queue: asyncio.Queue, message: str) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind is better off refetching the menu.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESET)
+
+    async def stream(self, location_id, last_event_id=None, is_disconnected=None):
+        """Async generator of SSE frames for one client, with periodic heartbeats."""
+        queue = self.subscribe(location_id, last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(location_id, queue)
+
+
+broadcaster = MenuBroadcaster()
+listener.subscribe(CHANNEL, broadcaster.handle_notification)
+listener.on_reconnect(broadcaster.reset_all)
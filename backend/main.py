@@ -5,10 +5,14 @@ load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from config import METRICS_ENABLED, QUERY_DEBUG
 from database import init_db
+from metrics import MetricsMiddleware
+from pubsub import listener
 from auth.router import router as auth_router
 from restaurants.router import router as restaurants_router
 from locations.router import router as locations_router
+from locations.stream import MENU_EVENT_ID_HEADER
 from menu_items.router import router as menus_router
 from extras.router import router as extras_router
 from menu_item_extras.router import router as menu_item_extrasRouter
@@ -16,8 +20,19 @@ from option_groups.router import router  as options_grounpRouter
 from option_choices.router import router as optionschoices
 from menu_item_options.router import router as menuitemoptions
 from schedules.router import router as schedulesrouter
+from availability_windows.router import router as availability_windows_router
+from menu_overrides.router import router as menu_overrides_router
 from payments.router import router as paymentRouter
 from website_builder.router import router as websiteBuilderRouter
+from search.router import router as search_router
+from tags.router import router as tags_router
+from webhooks.router import router as webhooks_router
+from webhooks.dispatcher import dispatcher as webhook_dispatcher
+from metering.router import router as metering_router
+from metering.aggregator import usage_meter
+from credits.router import router as credits_router
+from credits.gate import credit_gate
+from internal.router import router as internal_router
 from uploads.router import router as uploads_router # Import the new router
 from fastapi.staticfiles import StaticFiles # Import StaticFiles
 
@@ -33,6 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[MENU_EVENT_ID_HEADER],
 )
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -46,9 +62,31 @@ app.include_router(options_grounpRouter)
 app.include_router(optionschoices)
 app.include_router(menuitemoptions)
 app.include_router(schedulesrouter)
+app.include_router(availability_windows_router)
+app.include_router(menu_overrides_router)
 app.include_router(paymentRouter)
 app.include_router(websiteBuilderRouter)
+app.include_router(search_router)
+app.include_router(tags_router)
+app.include_router(webhooks_router)
+app.include_router(metering_router)
+app.include_router(credits_router)
 app.include_router(uploads_router)
+if METRICS_ENABLED or QUERY_DEBUG != "off":
+    # Also gives query_debug.py the request each statement belongs to.
+    app.add_middleware(MetricsMiddleware)
+if METRICS_ENABLED:
+    app.include_router(internal_router)
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await listener.start()
+    await webhook_dispatcher.start()
+    await usage_meter.start()
+    await credit_gate.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await usage_meter.stop()
+    await webhook_dispatcher.stop()
+    await listener.stop()
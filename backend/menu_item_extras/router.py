@@ -8,6 +8,7 @@ from sqlalchemy.orm import selectinload
 from typing import List
 
 from database import get_db
+from locations.effective_menu import item_menu_changed, served_at
 from models import MenuItemExtra, MenuItem, Extra, User
 from schemas import MenuItemExtraCreate, MenuItemExtraResponse, ExtraResponse
 from auth.auth_handler import get_current_active_user
@@ -28,7 +29,7 @@ async def get_all_menu_item_extras_by_location(
     result = await db.execute(
         select(MenuItemExtra)
         .join(MenuItem, MenuItemExtra.menu_item_id == MenuItem.item_id)
-        .where(MenuItem.location_id == location_id)
+        .where(served_at(MenuItem, location_id))
     )
     
     links = result.scalars().all()
@@ -55,6 +56,8 @@ async def link_extra_to_menu_item(
 
     new_link = MenuItemExtra(**payload.model_dump())
     db.add(new_link)
+    await db.flush()
+    await item_menu_changed(db, payload.menu_item_id, record=("menu_item_extra", new_link.menu_item_extra_id))
     await db.commit()
     await db.refresh(new_link)
     return new_link
@@ -96,6 +99,7 @@ async def unlink_extra_from_menu_item(
     if not link_to_delete:
         raise HTTPException(status_code=404, detail="Link not found")
 
+    await item_menu_changed(db, link_to_delete.menu_item_id, record=("menu_item_extra", link_to_delete.menu_item_extra_id))
     await db.delete(link_to_delete)
     await db.commit()
     return None
\ No newline at end of file
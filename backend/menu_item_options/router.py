@@ -7,6 +7,7 @@ from sqlalchemy.future import select
 from typing import List
 
 from database import get_db
+from locations.effective_menu import item_menu_changed, served_at
 from models import MenuItemOption, MenuItem, OptionGroup, User
 from schemas import MenuItemOptionCreate, MenuItemOptionResponse
 from auth.auth_handler import get_current_active_user
@@ -26,7 +27,7 @@ async def get_menu_item_options_by_location(
     result = await db.execute(
         select(MenuItemOption)
         .join(MenuItem, MenuItemOption.menu_item_id == MenuItem.item_id)
-        .where(MenuItem.location_id == location_id)
+        .where(served_at(MenuItem, location_id))
     )
     return result.scalars().all()
 
@@ -52,6 +53,8 @@ async def link_menu_item_to_option_group(
 
     new_link = MenuItemOption(**payload.model_dump())
     db.add(new_link)
+    await db.flush()
+    await item_menu_changed(db, payload.menu_item_id, record=("menu_item_option", new_link.menu_item_option_id))
     await db.commit()
     await db.refresh(new_link)
     return new_link
@@ -74,6 +77,7 @@ async def unlink_menu_item_from_option_group(
     if not link_to_delete:
         raise HTTPException(status_code=404, detail="Link not found")
 
+    await item_menu_changed(db, link_to_delete.menu_item_id, record=("menu_item_option", link_to_delete.menu_item_option_id))
     await db.delete(link_to_delete)
     await db.commit()
     return None
\ No newline at end of file
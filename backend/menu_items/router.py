@@ -5,7 +5,8 @@ from sqlalchemy.future import select
 from typing import List
 
 from database import get_db
-from models import MenuItem, Category, Location
+from locations.effective_menu import check_owner, drop_overrides, menu_changed
+from models import MenuItem, MenuItemTag, Category, Tag
 from schemas import MenuItemCreate, MenuItemResponse, MenuItemUpdate
 from auth.auth_handler import get_current_active_user
 from models import User
@@ -14,6 +15,36 @@ from models import User
 router = APIRouter(prefix="/menu-items", tags=["Menu Items"])
 
 
+async def _with_tags(db: AsyncSession, items) -> List[MenuItemResponse]:
+    """The items as responses carrying their tag slugs, loaded in one query."""
+    tags = {}
+    if items:
+        result = await db.execute(
+            select(MenuItemTag.menu_item_id, Tag.slug)
+            .join(Tag, Tag.tag_id == MenuItemTag.tag_id)
+            .where(MenuItemTag.menu_item_id.in_([item.item_id for item in items]))
+        )
+        for item_id, slug in result:
+            tags.setdefault(item_id, []).append(slug)
+    return [
+        MenuItemResponse.model_validate(item).model_copy(update={"tags": sorted(tags.get(item.item_id, ()))})
+        for item in items
+    ]
+
+
+@router.get("/by-brand/{brand_id}", response_model=List[MenuItemResponse])
+async def get_menu_items_by_brand(
+    brand_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retrieves the brand-level menu items shared by all of a brand's locations.
+    """
+    result = await db.execute(select(MenuItem).where(MenuItem.brand_id == brand_id))
+    return await _with_tags(db, result.scalars().all())
+
+
 @router.post("/", response_model=MenuItemResponse, status_code=status.HTTP_201_CREATED)
 async def create_menu_item(
     payload: MenuItemCreate,
@@ -21,21 +52,23 @@ async def create_menu_item(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Creates a new menu item for a given location and category.
+    Creates a new menu item in a category, for one location or for every
+    location of a brand.
     """
     # Optional: Check if category and location exist
     cat_res = await db.execute(select(Category).where(Category.id == payload.category_id))
     if not cat_res.scalars().first():
         raise HTTPException(status_code=404, detail=f"Category with id {payload.category_id} not found")
 
-    loc_res = await db.execute(select(Location).where(Location.location_id == payload.location_id))
-    if not loc_res.scalars().first():
-        raise HTTPException(status_code=404, detail=f"Location with id {payload.location_id} not found")
+    await check_owner(db, payload)
 
     new_item = MenuItem(**payload.model_dump())
     db.add(new_item)
+    await db.flush()
+    await menu_changed(db, new_item, new_item.item_id, record=("menu_item", new_item.item_id))
     await db.commit()
     await db.refresh(new_item)
+    # Tags are set separately (PUT /tags/menu-items/{item_id}), so a new item has none.
     return new_item
 
 
@@ -55,12 +88,16 @@ async def update_menu_item(
     if not db_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
         setattr(db_item, field, value)
 
+    live_fields = {k: v for k, v in update_data.items() if k in ("is_available", "base_price")}
+    changes = [{"kind": "menu_item", "id": str(item_id), **live_fields}] if live_fields else None
+    await menu_changed(db, db_item, item_id, changes, record=("menu_item", item_id))
     await db.commit()
     await db.refresh(db_item)
-    return db_item
+    return (await _with_tags(db, [db_item]))[0]
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -78,6 +115,8 @@ async def delete_menu_item(
     if not db_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
 
+    await menu_changed(db, db_item, item_id, [{"kind": "menu_item", "id": str(item_id), "removed": True}], record=("menu_item", item_id))
+    await drop_overrides(db, "menu_item", item_id)
     await db.delete(db_item)
     await db.commit()
 
@@ -0,0 +1,141 @@
+# menu_overrides/router.py
+
+from collections import defaultdict
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+
+from database import get_db
+from cache import invalidate
+from locations.effective_menu import OVERRIDE_KINDS, brand_entities, effective_select, upsert_overrides
+from locations.menu_index import to_cents
+from locations.change_log import record_changes
+from locations.stream import publish_menu_changes
+from models import Location, MenuOverride, User
+from schemas import MenuOverrideResponse, MenuOverrideUpsert
+from auth.auth_handler import get_current_active_user
+
+router = APIRouter(prefix="/menu-overrides", tags=["Menu Overrides"])
+
+
+async def _overrides_changed(db: AsyncSession, location_id: UUID, entity_ids: dict):
+    """
+    Invalidates the location's menu, adds the entities to its change feed and
+    pushes their new effective price/availability to its storefronts; hidden
+    ones are sent as removed.
+    `entity_ids` maps entity kind -> ids.
+    """
+    await db.flush()
+    await invalidate(db, "menu", location_id)
+    if entity_ids.get("menu_item"):
+        await invalidate(db, "menu_index", *(f"{location_id}@{item_id}" for item_id in entity_ids["menu_item"]))
+    await record_changes(db, [(location_id, kind, entity_id) for kind, ids in entity_ids.items() for entity_id in ids])
+
+    changes = []
+    for kind, ids in entity_ids.items():
+        _, primary_key, price_column, available_column = OVERRIDE_KINDS[kind]
+        fields = [column.key for column in (price_column, available_column) if column is not None]
+        result = await db.execute(effective_select(kind, location_id).where(primary_key.in_(ids)))
+        shown = {row[primary_key.key]: row for row in result.mappings()}
+        for entity_id in ids:
+            row = shown.get(entity_id)
+            if row is None:
+                changes.append({"kind": kind, "id": str(entity_id), "removed": True})
+            elif fields:
+                changes.append({"kind": kind, "id": str(entity_id), **{field: row[field] for field in fields}})
+    if changes:
+        await publish_menu_changes(db, location_id, changes)
+
+
+@router.get("/by-location/{location_id}", response_model=List[MenuOverrideResponse])
+async def get_overrides_by_location(
+    location_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retrieves everything a location does differently from its brand's menu.
+    """
+    result = await db.execute(select(MenuOverride).where(MenuOverride.location_id == location_id))
+    return result.scalars().all()
+
+
+@router.put("/by-location/{location_id}", response_model=List[MenuOverrideResponse])
+async def set_overrides(
+    location_id: UUID,
+    payload: List[MenuOverrideUpsert],
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Sets a location's overrides of brand-level entities with one upsert;
+    entities left out keep their current overrides. Values equal to the
+    brand's are stored as "no override", and rows with no difference left
+    are removed, so only real differences are kept.
+    """
+    keys = [(entry.entity_kind.value, entry.entity_id) for entry in payload]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Each entity may only appear once")
+    if not await db.scalar(select(Location.location_id).where(Location.location_id == location_id)):
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    by_kind = defaultdict(list)
+    for entry in payload:
+        by_kind[entry.entity_kind.value].append(entry)
+
+    rows = []
+    for kind, entries in by_kind.items():
+        brand = await brand_entities(db, kind, location_id, [entry.entity_id for entry in entries])
+        missing = [str(entry.entity_id) for entry in entries if entry.entity_id not in brand]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Not on this location's brand menu ({kind}): {', '.join(missing)}")
+        for entry in entries:
+            brand_price, brand_available = brand[entry.entity_id]
+            same_price = brand_price is None or entry.price is None or to_cents(entry.price) == to_cents(brand_price)
+            same_availability = brand_available is None or entry.is_available in (None, brand_available)
+            rows.append({
+                "entity_kind": kind,
+                "entity_id": entry.entity_id,
+                "price": None if same_price else entry.price,
+                "is_available": None if same_availability else entry.is_available,
+                "is_hidden": entry.is_hidden,
+            })
+
+    if rows:
+        await upsert_overrides(db, location_id, rows)
+        await _overrides_changed(db, location_id, {
+            kind: [entry.entity_id for entry in entries] for kind, entries in by_kind.items()
+        })
+    await db.commit()
+
+    result = await db.execute(
+        select(MenuOverride).where(
+            MenuOverride.location_id == location_id,
+            MenuOverride.entity_id.in_([entry.entity_id for entry in payload]),
+        )
+    )
+    return result.scalars().all()
+
+
+@router.delete("/{override_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_override(
+    override_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Deletes an override; the location serves the brand's entity as-is again.
+    """
+    result = await db.execute(select(MenuOverride).where(MenuOverride.override_id == override_id))
+    db_override = result.scalars().first()
+
+    if not db_override:
+        raise HTTPException(status_code=404, detail="Menu override not found")
+
+    await db.delete(db_override)
+    await _overrides_changed(db, db_override.location_id, {db_override.entity_kind: [db_override.entity_id]})
+    await db.commit()
+    return None
@@ -0,0 +1,262 @@
+# metering/aggregator.py
+#
+# Usage metering. `usage_meter.record()` only adds to an in-memory total per
+# (tenant, meter, rate, day), so metering an AI call costs no database work.
+# Every FLUSH_SECONDS each worker swaps its totals out and writes them in one
+# transaction: a multi-row INSERT into the append-only usage_ledger and one
+# upsert adding them onto usage_rollups, which is what reads use. Workers
+# flush independently; the ledger only appends and the rollup rows are
+# upserted in key order, so concurrent flushes don't deadlock. The same
+# transaction debits each tenant's credit wallet for the flushed usage (see
+# credits/ledger.py), so settlements are batched too.
+#
+# Prices are data: price_rates holds one row per (meter, effective_from),
+# and usage is priced at the rate in effect when it happened. Rates are
+# reloaded on every flush, so a new rate applies within one interval.
+#
+# A flush that fails on a lost connection or timeout is kept whole for the
+# next one. Any other failure is taken to be about the rows, so the batch is
+# rewritten one tenant at a time and whatever still can't be written is
+# logged and dropped rather than retried forever.
+
+import asyncio
+import logging
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from credits.ledger import post_transactions
+from models import PriceRate, RestaurantOwner, UsageLedgerEntry, UsageRollup
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 5
+
+# Seeded once so a fresh database can price usage; later prices are new price_rates rows.
+RATES_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+DEFAULT_RATES = {
+    "prompt_tokens": Decimal("0.00000015"),      # $0.15 per million
+    "completion_tokens": Decimal("0.0000006"),   # $0.60 per million
+}
+
+
+class UsageAggregator:
+    def __init__(self):
+        self._totals = defaultdict(lambda: [0, 0])  # (restaurant_id, meter, rate_id, day) -> [quantity, events]
+        self._rates = {}                            # meter -> [(effective_from, rate_id)], oldest first
+        self._unit_prices = {}                      # rate_id -> dollars per unit
+        self._pending_cost = defaultdict(Decimal)   # restaurant_id -> dollars recorded but not yet flushed
+        self._flushing_cost = {}                    # the same, for the flush in progress
+        self._flush_hooks = []
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def meters(self) -> set:
+        return set(self._rates)
+
+    def record(self, restaurant_id, meter: str, quantity: int, occurred_at: datetime = None) -> None:
+        """Adds usage to this worker's totals; raises ValueError for a meter with no rate at `occurred_at`."""
+        if occurred_at is None:
+            occurred_at = datetime.now(timezone.utc)
+        elif occurred_at.tzinfo is None:
+            occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+        rate_id = self.rate_at(meter, occurred_at)
+        totals = self._totals[(restaurant_id, meter, rate_id, occurred_at.astimezone(timezone.utc).date())]
+        totals[0] += quantity
+        totals[1] += 1
+        self._pending_cost[restaurant_id] += quantity * self._unit_prices[rate_id]
+
+    def pending_cost(self, restaurant_id) -> Decimal:
+        """Dollars of this worker's usage for the tenant not yet debited from its credit."""
+        return self._pending_cost.get(restaurant_id, Decimal(0)) + self._flushing_cost.get(restaurant_id, Decimal(0))
+
+    def on_flush(self, hook) -> None:
+        """`hook(balances)` runs after each committed flush with the debited tenants' new credit balances."""
+        self._flush_hooks.append(hook)
+
+    def rate_at(self, meter: str, at: datetime) -> int:
+        versions = self._rates.get(meter)
+        if not versions:
+            raise ValueError(f"Unknown meter: {meter}")
+        index = bisect_right(versions, at, key=lambda version: version[0]) - 1
+        if index < 0:
+            raise ValueError(f"No {meter} rate in effect at {at.isoformat()}")
+        return versions[index][1]
+
+    def unit_price(self, meter: str, at: datetime) -> Decimal:
+        return self._unit_prices[self.rate_at(meter, at)]
+
+    async def start(self) -> None:
+        if self._task is None:
+            async with AsyncSessionLocal() as db:
+                await _seed_default_rates(db)
+                await db.commit()
+                await self._load_rates(db)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Writes and clears this worker's totals; what failed transiently is kept for the next flush."""
+        async with self._flush_lock:
+            totals, self._totals = self._totals, defaultdict(lambda: [0, 0])
+            self._flushing_cost, self._pending_cost = self._pending_cost, defaultdict(Decimal)
+            balances = None
+            if totals:
+                balances, kept = await self._write_all(totals)
+                for key, (quantity, events) in kept.items():
+                    pending = self._totals[key]
+                    pending[0] += quantity
+                    pending[1] += events
+                for restaurant_id in {key[0] for key in kept}:
+                    self._pending_cost[restaurant_id] += self._flushing_cost[restaurant_id]
+            self._flushing_cost = {}
+            if balances:
+                for hook in self._flush_hooks:
+                    try:
+                        hook(balances)
+                    except Exception:
+                        logger.exception("usage flush hook failed")
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self._load_rates(db)
+            except Exception:
+                logger.exception("reloading price rates failed")
+
+    async def _write_all(self, totals: dict):
+        """Writes `totals`; returns (the debited tenants' new balances, totals to keep for the next flush)."""
+        try:
+            return await self._commit(totals), {}
+        except Exception as exc:
+            if _is_transient(exc):
+                logger.warning("usage flush failed (%s), keeping %s totals for the next one", exc, len(totals))
+                return {}, totals
+            logger.exception("usage flush failed, writing its %s totals tenant by tenant", len(totals))
+
+        by_tenant = defaultdict(dict)
+        for key, value in totals.items():
+            by_tenant[key[0]][key] = value
+        balances, kept = {}, {}
+        for restaurant_id, tenant_totals in by_tenant.items():
+            try:
+                balances.update(await self._commit(tenant_totals))
+            except Exception as exc:
+                if _is_transient(exc):
+                    kept.update(tenant_totals)
+                else:
+                    logger.error("dropping usage for %s that can't be written (%s): %s", restaurant_id, exc, tenant_totals)
+        return balances, kept
+
+    async def _commit(self, totals: dict) -> dict:
+        async with AsyncSessionLocal() as db:
+            balances = await self._write(db, totals)
+            await db.commit()
+        return balances
+
+    async def _write(self, db: AsyncSession, totals: dict) -> dict:
+        """Writes the ledger, rollup and credit debits; returns the debited tenants' new balances."""
+        ledger_rows = []
+        rollups = defaultdict(lambda: [0, Decimal(0), 0])
+        spent = defaultdict(Decimal)
+        for (restaurant_id, meter, rate_id, day), (quantity, events) in sorted(totals.items()):
+            amount = quantity * self._unit_prices[rate_id]
+            ledger_rows.append({
+                "restaurant_id": restaurant_id, "meter": meter, "rate_id": rate_id, "usage_date": day,
+                "quantity": quantity, "amount": amount, "event_count": events,
+            })
+            rollup = rollups[(restaurant_id, meter, day)]
+            rollup[0] += quantity
+            rollup[1] += amount
+            rollup[2] += events
+            spent[restaurant_id] += amount
+
+        debits = await post_transactions(db, "usage", "usage", {restaurant_id: -amount for restaurant_id, amount in spent.items()})
+        for row in ledger_rows:
+            debit = debits.get(row["restaurant_id"])
+            row["credit_transaction_id"] = debit[0] if debit else None
+        await db.execute(insert(UsageLedgerEntry), ledger_rows)
+        stmt = pg_insert(UsageRollup).values([
+            {"restaurant_id": restaurant_id, "meter": meter, "usage_date": day,
+             "quantity": quantity, "amount": amount, "event_count": events}
+            for (restaurant_id, meter, day), (quantity, amount, events) in rollups.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UsageRollup.restaurant_id, UsageRollup.meter, UsageRollup.usage_date],
+            set_={
+                "quantity": UsageRollup.quantity + stmt.excluded.quantity,
+                "amount": UsageRollup.amount + stmt.excluded.amount,
+                "event_count": UsageRollup.event_count + stmt.excluded.event_count,
+                "updated_at": func.now(),
+            },
+        ))
+        return {restaurant_id: balance for restaurant_id, (_, balance) in debits.items()}
+
+    async def _load_rates(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(PriceRate.rate_id, PriceRate.meter, PriceRate.unit_price, PriceRate.effective_from)
+            .order_by(PriceRate.meter, PriceRate.effective_from)
+        )
+        rates, unit_prices = defaultdict(list), {}
+        for rate_id, meter, unit_price, effective_from in result:
+            rates[meter].append((effective_from, rate_id))
+            unit_prices[rate_id] = unit_price
+        # Swap both at once; record() may run between any two awaits.
+        self._rates, self._unit_prices = dict(rates), unit_prices
+
+
+def _is_transient(exc: Exception) -> bool:
+    """Whether the write may well succeed as it is on the next flush."""
+    if isinstance(exc, DBAPIError):
+        return isinstance(exc, (OperationalError, InterfaceError)) or exc.connection_invalidated
+    return isinstance(exc, (OSError, asyncio.TimeoutError))
+
+
+async def _seed_default_rates(db: AsyncSession) -> None:
+    stmt = pg_insert(PriceRate).values([
+        {"meter": meter, "unit_price": unit_price, "effective_from": RATES_EPOCH}
+        for meter, unit_price in DEFAULT_RATES.items()
+    ])
+    await db.execute(stmt.on_conflict_do_nothing(constraint="uq_price_rates_meter_effective_from"))
+
+
+async def unbilled_usage_cost(db: AsyncSession, owner: RestaurantOwner) -> Decimal:
+    """
+    Dollars of a tenant's usage that was never debited from its credit: the
+    owner-row token counters from before metering, priced at the first
+    rates, and usage metered before the credit ledger.
+    """
+    metered = await db.scalar(
+        select(func.coalesce(func.sum(UsageLedgerEntry.amount), 0)).where(
+            UsageLedgerEntry.restaurant_id == owner.restaurant_id, UsageLedgerEntry.credit_transaction_id.is_(None),
+        )
+    )
+    legacy = (
+        owner.total_prompt_tokens_consumed * usage_meter.unit_price("prompt_tokens", RATES_EPOCH)
+        + owner.total_completion_tokens_consumed * usage_meter.unit_price("completion_tokens", RATES_EPOCH)
+    )
+    return Decimal(metered) + legacy
+
+
+usage_meter = UsageAggregator()
@@ -0,0 +1,71 @@
+# metering/router.py
+
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List, Optional
+
+from database import get_db
+from models import RestaurantOwner, UsageRollup, User
+from schemas import UsageEventBatch, UsageRollupResponse
+from auth.auth_handler import get_current_active_user
+from .aggregator import usage_meter
+
+router = APIRouter(prefix="/metering", tags=["Metering"])
+
+
+async def _my_restaurant_id(db: AsyncSession, current_user: User):
+    restaurant_id = await db.scalar(select(RestaurantOwner.restaurant_id).where(RestaurantOwner.user_id == current_user.id))
+    if restaurant_id is None:
+        raise HTTPException(status_code=404, detail="Restaurant owner profile not found.")
+    return restaurant_id
+
+
+@router.post("/events", status_code=status.HTTP_202_ACCEPTED)
+async def record_usage(
+    batch: UsageEventBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Records usage events for the current user's restaurant. They are
+    aggregated in memory and written within a few seconds, so they show up
+    in /metering/usage after the next flush. A batch with any unpriced
+    event is rejected as a whole.
+    """
+    restaurant_id = await _my_restaurant_id(db, current_user)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for event in batch.events:
+        occurred_at = event.occurred_at or now
+        if occurred_at.tzinfo is None:
+            occurred_at = occurred_at.replace(tzinfo=datetime.timezone.utc)
+        try:
+            usage_meter.rate_at(event.meter, occurred_at)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    for event in batch.events:
+        usage_meter.record(restaurant_id, event.meter, event.quantity, event.occurred_at or now)
+    return {"accepted": len(batch.events)}
+
+
+@router.get("/usage", response_model=List[UsageRollupResponse])
+async def get_usage(
+    start: Optional[datetime.date] = Query(None, description="First UTC day, inclusive"),
+    end: Optional[datetime.date] = Query(None, description="Last UTC day, inclusive"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    The current user's restaurant's usage per meter and day, from the rollup.
+    """
+    restaurant_id = await _my_restaurant_id(db, current_user)
+    query = select(UsageRollup).where(UsageRollup.restaurant_id == restaurant_id)
+    if start is not None:
+        query = query.where(UsageRollup.usage_date >= start)
+    if end is not None:
+        query = query.where(UsageRollup.usage_date <= end)
+    result = await db.execute(query.order_by(UsageRollup.usage_date, UsageRollup.meter))
+    return result.scalars().all()
@@ -0,0 +1,252 @@
+# metrics.py
+#
+# Per-route request metrics in Prometheus text format. `MetricsMiddleware`
+# gives each HTTP request a RequestStats in a context variable; SQLAlchemy
+# cursor events on the shared engine and the pool's connection checkout add
+# to it (statement count, DB time, rows fetched, pool wait), and when the
+# response is done it is folded into the totals for its route template,
+# e.g. "/builder/public/{subdomain}". SQL run outside any request (startup,
+# background tasks) is counted under the "(background)" route.
+#
+# Nothing here is installed unless METRICS_ENABLED is set (see database.py
+# and main.py), so it costs nothing when off. QUERY_DEBUG installs the
+# middleware too, for query_debug.py to know which request it is in. Totals are per worker process;
+# scrape each worker.
+
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+UNMATCHED_ROUTE = "(unmatched)"
+BACKGROUND_ROUTE = "(background)"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)  # per bucket, not cumulative; +Inf is `count`
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+
+
+class RequestStats:
+    """What one request (or the background) has done so far."""
+
+    __slots__ = ("method", "scope", "statements", "db_seconds", "rows", "pool_wait_seconds", "statement_counts")
+
+    def __init__(self, method: str, scope=None):
+        self.method = method
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+        self.statement_counts = None  # SQL text -> executions, kept by query_debug.py
+
+    @property
+    def route(self) -> str:
+        """The matched route template, once routing has run."""
+        if self.scope is None:
+            return BACKGROUND_ROUTE
+        return getattr(self.scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+class RouteStats:
+    """Totals for one (method, route template)."""
+
+    def __init__(self):
+        self.responses = Counter()  # status code -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements_per_request = Histogram(STATEMENT_BUCKETS)
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+
+    def add(self, stats: RequestStats) -> None:
+        self.statements += stats.statements
+        self.db_seconds += stats.db_seconds
+        self.rows += stats.rows
+        self.pool_wait_seconds += stats.pool_wait_seconds
+
+
+_routes = defaultdict(RouteStats)  # (method, route template) -> RouteStats
+_pool_wait = Histogram(POOL_WAIT_BUCKETS)
+_current = ContextVar("request_stats", default=None)
+
+
+def current_request():
+    """The running request's RequestStats, or None outside a request."""
+    return _current.get()
+
+
+def _flush_background(stats: RequestStats) -> None:
+    _routes[("", BACKGROUND_ROUTE)].add(stats)
+
+
+# --- HTTP ---
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            # Routing stores the matched route in the scope; templates keep label cardinality bounded.
+            totals = _routes[(stats.method, stats.route)]
+            totals.responses[status_code] += 1
+            totals.latency.observe(elapsed)
+            totals.statements_per_request.observe(stats.statements)
+            totals.add(stats)
+
+
+# --- Database ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    stats = _current.get()
+    background = stats is None
+    if background:
+        stats = RequestStats("")
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    if background:
+        _flush_background(stats)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("metrics_query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            _pool_wait.observe(waited)
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait_seconds += waited
+
+
+def instrument_engine(engine) -> None:
+    """Hooks an (async) engine's cursor events; give it poolclass=TimedAsyncQueuePool for pool waits."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# --- Exposition ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _le(bound) -> str:
+    return repr(float(bound))
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> list:
+    lines, cumulative = [], 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=_le(bound))} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format (0.0.4)."""
+    routes = sorted(_routes.items())
+    requests = [(key, totals) for key, totals in routes if key[1] != BACKGROUND_ROUTE]
+    out = []
+
+    def header(name, kind, help_text):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+
+    header("http_requests_total", "counter", "HTTP responses by route template and status.")
+    for (method, route), totals in requests:
+        for status_code, count in sorted(totals.responses.items()):
+            out.append(f"http_requests_total{_labels(method=method, route=route, status=status_code)} {count}")
+
+    header("http_request_duration_seconds", "histogram", "Time from request start to the end of the response.")
+    for (method, route), totals in requests:
+        out.extend(_histogram_lines("http_request_duration_seconds", totals.latency, method=method, route=route))
+
+    header("db_statements_per_request", "histogram", "SQL statements issued by one request.")
+    for (method, route), totals in requests:
+        out.extend(_histogram_lines("db_statements_per_request", totals.statements_per_request, method=method, route=route))
+
+    for name, attribute, help_text in (
+        ("db_statements_total", "statements", "SQL statements executed."),
+        ("db_query_seconds_total", "db_seconds", "Time spent executing SQL statements."),
+        ("db_rows_fetched_total", "rows", "Rows returned by SQL statements."),
+        ("db_pool_wait_seconds_total", "pool_wait_seconds", "Time spent waiting to check out a pooled connection."),
+    ):
+        header(name, "counter", help_text)
+        for (method, route), totals in routes:
+            out.append(f"{name}{_labels(method=method, route=route)} {getattr(totals, attribute)}")
+
+    header("db_pool_wait_seconds", "histogram", "Wait per connection checkout, across all routes.")
+    out.extend(_histogram_lines("db_pool_wait_seconds", _pool_wait))
+    return "\n".join(out) + "\n"
@@ -1,13 +1,38 @@
 #models.py
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, BigInteger,Boolean,text,Numeric,Time
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, BigInteger,Boolean,text,Numeric,Time,Sequence,UniqueConstraint,CheckConstraint,Computed,Index,JSON,Date
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from database import Base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import sqlalchemy
 import uuid
 from website_builder.models import Website 
 
+def generated_search_vector(*weighted_columns):
+    """
+    A stored tsvector generated from (column name, weight) pairs. The 'simple'
+    config keeps names searchable in any language. Deferred, so normal loads skip it.
+    """
+    document = " || ".join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight in weighted_columns
+    )
+    return deferred(Column(TSVECTOR, Computed(document, persisted=True)))
+
+
+def search_indexes(table: str, name_column: str):
+    """GIN indexes for full-text matches on search_vector and trigram (typo) matches on the name."""
+    return (
+        Index(f"ix_{table}_search_vector", "search_vector", postgresql_using="gin"),
+        Index(f"ix_{table}_{name_column}_trgm", name_column, postgresql_using="gin", postgresql_ops={name_column: "gin_trgm_ops"}),
+    )
+
+
+def menu_owner_check(table: str):
+    """Menu entities belong to exactly one location or to a brand (every location of it)."""
+    return CheckConstraint("(location_id IS NULL) <> (brand_id IS NULL)", name=f"ck_{table}_one_owner")
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -40,7 +65,9 @@ class RestaurantOwner(Base):
 
     # --- NEW WALLET COLUMN ---
     # Use Numeric for precision with currency. Stores the balance in dollars.
-    credit_balance = Column(Numeric(10, 4), nullable=False, default=0.0)
+    # Only ever changed by credits/ledger.py, with the matching ledger entries;
+    # the scale fits per-token prices.
+    credit_balance = Column(Numeric(20, 10), nullable=False, default=0.0)
     website = relationship("Website", back_populates="restaurant", uselist=False, cascade="all, delete-orphan")
     
 
@@ -82,6 +109,10 @@ class Location(Base):
     end_date = Column(DateTime(timezone=True), nullable=True)
     delivery_available = Column(Boolean, nullable=False, default=False)
     dine_in = Column(Boolean, nullable=False, default=False)    
+    # IANA name; schedules are in this zone's local time.
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
+    # Last sequence number handed out to this location's change feed (locations/change_log.py).
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
     menu_items = relationship("MenuItem", back_populates="location")
     extras = relationship("Extra", back_populates="location")
     option_groups = relationship("OptionGroup", back_populates="location")
@@ -91,12 +122,14 @@ class Location(Base):
     
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = search_indexes("categories", "name")
 
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     name = Column(String, nullable=False)
     restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id"))
     image_url = Column(String, nullable=True)
+    search_vector = generated_search_vector(("name", "A"))
     # Add relationship to MenuItem
     menu_items = relationship("MenuItem", back_populates="category")
     
@@ -104,6 +137,7 @@ class Category(Base):
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
+    __table_args__ = search_indexes("menu_items", "item_name") + (menu_owner_check("menu_items"),)
 
     item_id = Column(
         UUID(as_uuid=True),
@@ -117,9 +151,11 @@ class MenuItem(Base):
     image_url = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    search_vector = generated_search_vector(("item_name", "A"), ("description", "B"))
     
     # Foreign Keys
-    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=False)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=True)
+    brand_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_brands.brand_id"), nullable=True, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
 
     # Relationships
@@ -133,8 +169,13 @@ class MenuItem(Base):
     option_groups = relationship("OptionGroup", secondary="menu_item_options", back_populates="menu_items")
 
 
+# Ids for storefront menu events (locations/stream.py), shared by all workers.
+menu_event_seq = Sequence("menu_event_seq", metadata=Base.metadata)
+
+
 class Extra(Base):
     __tablename__ = "extras"
+    __table_args__ = search_indexes("extras", "name") + (menu_owner_check("extras"),)
 
     extra_id = Column(
         UUID(as_uuid=True),
@@ -147,9 +188,11 @@ class Extra(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    search_vector = generated_search_vector(("name", "A"), ("description", "B"))
 
-    # Foreign Key to locations table
-    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=False)
+    # Owner: one location, or a brand
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=True)
+    brand_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_brands.brand_id"), nullable=True, index=True)
 
     # Relationship to the Location model
     location = relationship("Location")
@@ -174,6 +217,7 @@ class MenuItemExtra(Base):
 
 class OptionGroup(Base):
     __tablename__ = "option_groups"
+    __table_args__ = (menu_owner_check("option_groups"),)
 
     group_id = Column(
         UUID(as_uuid=True),
@@ -188,7 +232,8 @@ class OptionGroup(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Foreign Key
-    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=False)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=True)
+    brand_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_brands.brand_id"), nullable=True, index=True)
 
     # Relationship
     location = relationship("Location", back_populates="option_groups")
@@ -198,6 +243,7 @@ class OptionGroup(Base):
 
 class OptionChoice(Base):
     __tablename__ = "option_choices"
+    __table_args__ = (menu_owner_check("option_choices"),)
 
     choice_id = Column(
         UUID(as_uuid=True),
@@ -212,7 +258,8 @@ class OptionChoice(Base):
 
     # Foreign Keys
     group_id = Column(UUID(as_uuid=True), ForeignKey("option_groups.group_id"), nullable=False)
-    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=False)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=True)
+    brand_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_brands.brand_id"), nullable=True, index=True)
 
     # Relationships
     group = relationship("OptionGroup", back_populates="choices")
@@ -235,6 +282,8 @@ class MenuItemOption(Base):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    # One row per day; also the conflict target for the weekly upsert.
+    __table_args__ = (UniqueConstraint("location_id", "day_of_week", name="uq_schedules_location_id_day_of_week"),)
 
     schedule_id = Column(
         UUID(as_uuid=True),
@@ -253,4 +302,216 @@ class Schedule(Base):
     location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id"), nullable=False)
 
     # Relationship
-    location = relationship("Location", back_populates="schedules")
\ No newline at end of file
+    location = relationship("Location", back_populates="schedules")
+
+
+class AvailabilityWindow(Base):
+    """
+    Limits when a category or a single menu item can be ordered at a location,
+    using the same day/open/close model as Schedule. Something with no windows
+    is always available; with windows, only inside one of them.
+    """
+    __tablename__ = "availability_windows"
+    __table_args__ = (
+        CheckConstraint("(category_id IS NULL) <> (menu_item_id IS NULL)", name="ck_availability_windows_one_target"),
+    )
+
+    window_id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()"),
+    )
+    day_of_week = Column(String, nullable=False)
+    open_time = Column(Time, nullable=False)
+    close_time = Column(Time, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Foreign Keys
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=True)
+    menu_item_id = Column(UUID(as_uuid=True), ForeignKey("menu_items.item_id", ondelete="CASCADE"), nullable=True)
+
+
+class Tag(Base):
+    """A dietary or allergen label ("vegan", "contains-nuts") shared by all restaurants."""
+    __tablename__ = "tags"
+
+    tag_id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, nullable=False, unique=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="dietary")  # "dietary" or "allergen"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MenuItemTag(Base):
+    __tablename__ = "menu_item_tags"
+
+    menu_item_id = Column(UUID(as_uuid=True), ForeignKey("menu_items.item_id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.tag_id", ondelete="CASCADE"), primary_key=True)
+
+
+class ExtraTag(Base):
+    __tablename__ = "extra_tags"
+
+    extra_id = Column(UUID(as_uuid=True), ForeignKey("extras.extra_id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.tag_id", ondelete="CASCADE"), primary_key=True)
+
+
+class MenuOverride(Base):
+    """
+    How one location differs from a brand-level menu item, extra, option group
+    or option choice. NULL columns mean "as the brand has it", and there's only
+    a row where a location actually differs, so storage and writes grow with the
+    differences rather than with locations x menu size.
+    """
+    __tablename__ = "menu_overrides"
+    __table_args__ = (
+        UniqueConstraint("location_id", "entity_kind", "entity_id", name="uq_menu_overrides_location_entity"),
+    )
+
+    override_id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()"),
+    )
+    entity_kind = Column(String, nullable=False)  # "menu_item", "extra", "option_group" or "option_choice"
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    price = Column(Numeric(10, 2), nullable=True)  # base_price / price / price_adjustment
+    is_available = Column(Boolean, nullable=True)  # is_available / is_active
+    is_hidden = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
+
+
+class MenuChange(Base):
+    """
+    Latest change to one entity as seen by one location, for delta sync. The
+    row is moved to the location's next sequence number on every change and
+    stays after the entity is deleted, as its tombstone.
+    """
+    __tablename__ = "menu_changes"
+    __table_args__ = (
+        UniqueConstraint("location_id", "entity_kind", "entity_id", name="uq_menu_changes_location_entity"),
+        Index("ix_menu_changes_location_id_seq", "location_id", "seq"),
+    )
+
+    change_id = Column(BigInteger, primary_key=True)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
+    entity_kind = Column(String, nullable=False)  # a menu entity kind, "menu_item_extra", "menu_item_option", "schedule", "location" or "menu"
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class WebhookEndpoint(Base):
+    """A partner URL that gets the restaurant's menu/schedule changes pushed to it (see webhooks/)."""
+    __tablename__ = "webhook_endpoints"
+
+    endpoint_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), nullable=False, index=True)
+    url = Column(String, nullable=False)
+    secret = Column(String, nullable=False)  # HMAC key for the X-Webhook-Signature header
+    is_active = Column(Boolean, nullable=False, default=True)
+    max_concurrency = Column(Integer, nullable=False, default=4)  # deliveries in flight to this endpoint at once
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class WebhookCursor(Base):
+    """How far into a location's change feed an endpoint has been sent; no row means from the start."""
+    __tablename__ = "webhook_cursors"
+
+    endpoint_id = Column(UUID(as_uuid=True), ForeignKey("webhook_endpoints.endpoint_id", ondelete="CASCADE"), primary_key=True)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class WebhookDeadLetter(Base):
+    """A batch an endpoint still refused after every retry, kept for inspection and replay."""
+    __tablename__ = "webhook_dead_letters"
+
+    dead_letter_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    endpoint_id = Column(UUID(as_uuid=True), ForeignKey("webhook_endpoints.endpoint_id", ondelete="CASCADE"), nullable=False, index=True)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
+    payload = Column(JSON, nullable=False)  # the request body as it was sent
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PriceRate(Base):
+    """What one unit of a meter costs from `effective_from` on. Prices are never edited; a new price is a new row."""
+    __tablename__ = "price_rates"
+    __table_args__ = (UniqueConstraint("meter", "effective_from", name="uq_price_rates_meter_effective_from"),)
+
+    rate_id = Column(Integer, primary_key=True)
+    meter = Column(String, nullable=False)  # e.g. "prompt_tokens", "completion_tokens"
+    unit_price = Column(Numeric(18, 12), nullable=False)  # dollars per unit
+    effective_from = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UsageLedgerEntry(Base):
+    """
+    Append-only record of metered usage: one row per (tenant, meter, rate, day)
+    per flush of a worker's aggregator (see metering/aggregator.py).
+    """
+    __tablename__ = "usage_ledger"
+    __table_args__ = (Index("ix_usage_ledger_restaurant_id_recorded_at", "restaurant_id", "recorded_at"),)
+
+    entry_id = Column(BigInteger, primary_key=True)
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), nullable=False)
+    meter = Column(String, nullable=False)
+    rate_id = Column(Integer, ForeignKey("price_rates.rate_id"), nullable=False)
+    usage_date = Column(Date, nullable=False)  # UTC day the usage happened
+    quantity = Column(BigInteger, nullable=False)
+    amount = Column(Numeric(20, 10), nullable=False)  # dollars, quantity * the rate's unit_price
+    event_count = Column(Integer, nullable=False)
+    # The credit debit that billed this row; NULL for usage metered before the credit ledger.
+    credit_transaction_id = Column(UUID(as_uuid=True), ForeignKey("credit_transactions.transaction_id"), nullable=True)
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class UsageRollup(Base):
+    """Running totals of the usage ledger per tenant, meter and day; what usage reads use."""
+    __tablename__ = "usage_rollups"
+
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), primary_key=True)
+    meter = Column(String, primary_key=True)
+    usage_date = Column(Date, primary_key=True)
+    quantity = Column(BigInteger, nullable=False, default=0)
+    amount = Column(Numeric(20, 10), nullable=False, default=0)
+    event_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CreditTransaction(Base):
+    """One posting to a tenant's credit ledger; its CreditLedgerEntry rows sum to zero."""
+    __tablename__ = "credit_transactions"
+
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False)  # "top_up", "usage" or "opening"
+    external_ref = Column(String, nullable=True, unique=True)  # e.g. the Stripe checkout session; makes posting idempotent
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class CreditLedgerEntry(Base):
+    """
+    One side of a credit transaction. "wallet" entries move the tenant's
+    credit_balance and sum to it; the other side names where the money came
+    from or went ("stripe", "usage", "opening").
+    """
+    __tablename__ = "credit_ledger_entries"
+    __table_args__ = (Index("ix_credit_ledger_entries_restaurant_id_entry_id", "restaurant_id", "entry_id"),)
+
+    entry_id = Column(BigInteger, primary_key=True)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("credit_transactions.transaction_id", ondelete="CASCADE"), nullable=False, index=True)
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), nullable=False)
+    account = Column(String, nullable=False)
+    amount = Column(Numeric(20, 10), nullable=False)  # dollars, positive into the account
+    balance_after = Column(Numeric(20, 10), nullable=True)  # the tenant's credit_balance after a wallet entry
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -7,7 +7,8 @@ from sqlalchemy.future import select
 from typing import List
 
 from database import get_db
-from models import OptionChoice, OptionGroup, Location, User
+from locations.effective_menu import check_owner, drop_overrides, effective_select, menu_changed
+from models import OptionChoice, OptionGroup, User
 from schemas import OptionChoiceCreate, OptionChoiceResponse, OptionChoiceUpdate
 from auth.auth_handler import get_current_active_user
 
@@ -21,11 +22,23 @@ async def get_option_choices_by_location(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Retrieves all option choices for a specific location.
+    Retrieves all option choices served at a specific location, its own and
+    its brand's, with the location's overrides applied.
     """
-    result = await db.execute(
-        select(OptionChoice).where(OptionChoice.location_id == location_id)
-    )
+    result = await db.execute(effective_select("option_choice", location_id))
+    return result.mappings().all()
+
+
+@router.get("/by-brand/{brand_id}", response_model=List[OptionChoiceResponse])
+async def get_option_choices_by_brand(
+    brand_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retrieves the brand-level option choices shared by all of a brand's locations.
+    """
+    result = await db.execute(select(OptionChoice).where(OptionChoice.brand_id == brand_id))
     return result.scalars().all()
 
 
@@ -42,9 +55,12 @@ async def create_option_choice(
     group_res = await db.execute(select(OptionGroup).where(OptionGroup.group_id == payload.group_id))
     if not group_res.scalars().first():
         raise HTTPException(status_code=404, detail=f"Option Group with id {payload.group_id} not found")
+    await check_owner(db, payload)
 
     new_choice = OptionChoice(**payload.model_dump())
     db.add(new_choice)
+    await db.flush()
+    await menu_changed(db, new_choice, record=("option_choice", new_choice.choice_id))
     await db.commit()
     await db.refresh(new_choice)
     return new_choice
@@ -66,9 +82,16 @@ async def update_option_choice(
     if not db_choice:
         raise HTTPException(status_code=404, detail="Option choice not found")
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
         setattr(db_choice, field, value)
 
+    live_fields = {k: v for k, v in update_data.items() if k in ("is_active", "price_adjustment")}
+    await menu_changed(
+        db, db_choice,
+        changes=[{"kind": "option_choice", "id": str(choice_id), **live_fields}] if live_fields else None,
+        record=("option_choice", choice_id),
+    )
     await db.commit()
     await db.refresh(db_choice)
     return db_choice
@@ -89,6 +112,8 @@ async def delete_option_choice(
     if not db_choice:
         raise HTTPException(status_code=404, detail="Option choice not found")
 
+    await menu_changed(db, db_choice, changes=[{"kind": "option_choice", "id": str(choice_id), "removed": True}], record=("option_choice", choice_id))
+    await drop_overrides(db, "option_choice", choice_id)
     await db.delete(db_choice)
     await db.commit()
     return None
\ No newline at end of file
@@ -7,7 +7,8 @@ from sqlalchemy.future import select
 from typing import List
 
 from database import get_db
-from models import OptionGroup, Location, User
+from locations.effective_menu import check_owner, drop_overrides, effective_select, menu_changed
+from models import OptionGroup, User
 from schemas import OptionGroupCreate, OptionGroupResponse, OptionGroupUpdate
 from auth.auth_handler import get_current_active_user
 
@@ -21,11 +22,22 @@ async def get_option_groups_by_location(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Retrieves all option groups for a specific location.
+    Retrieves all option groups served at a specific location, its own and its brand's.
     """
-    result = await db.execute(
-        select(OptionGroup).where(OptionGroup.location_id == location_id)
-    )
+    result = await db.execute(effective_select("option_group", location_id))
+    return result.mappings().all()
+
+
+@router.get("/by-brand/{brand_id}", response_model=List[OptionGroupResponse])
+async def get_option_groups_by_brand(
+    brand_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retrieves the brand-level option groups shared by all of a brand's locations.
+    """
+    result = await db.execute(select(OptionGroup).where(OptionGroup.brand_id == brand_id))
     return result.scalars().all()
 
 
@@ -36,15 +48,14 @@ async def create_option_group(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Creates a new option group for a given location.
+    Creates a new option group for a given location, or for every location of a brand.
     """
-    # Optional: Check if location exists
-    loc_res = await db.execute(select(Location).where(Location.location_id == payload.location_id))
-    if not loc_res.scalars().first():
-        raise HTTPException(status_code=404, detail=f"Location with id {payload.location_id} not found")
+    await check_owner(db, payload)
 
     new_group = OptionGroup(**payload.model_dump())
     db.add(new_group)
+    await db.flush()
+    await menu_changed(db, new_group, record=("option_group", new_group.group_id))
     await db.commit()
     await db.refresh(new_group)
     return new_group
@@ -69,6 +80,7 @@ async def update_option_group(
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(db_group, field, value)
 
+    await menu_changed(db, db_group, record=("option_group", group_id))
     await db.commit()
     await db.refresh(db_group)
     return db_group
@@ -89,6 +101,8 @@ async def delete_option_group(
     if not db_group:
         raise HTTPException(status_code=404, detail="Option group not found")
 
+    await menu_changed(db, db_group, record=("option_group", group_id))
+    await drop_overrides(db, "option_group", group_id)
     await db.delete(db_group)
     await db.commit()
     return None
\ No newline at end of file
@@ -10,6 +10,7 @@ from decimal import Decimal
 from database import get_db
 from models import User, RestaurantOwner
 from auth.auth_handler import get_current_active_user
+from credits.ledger import post_transactions
 from schemas import CheckoutSessionResponse, BillingPortalResponse, TopUpRequest
 
 # --- CONFIGURATION ---
@@ -134,7 +135,10 @@ async def stripe_webhook(
         elif payment_type == 'top-up':
             amount_added = session.get('metadata', {}).get('amount')
             if amount_added:
-                owner.credit_balance += Decimal(amount_added)
+                # Posted once per checkout session, however often Stripe retries the event.
+                await post_transactions(
+                    db, "top_up", "stripe", {owner.restaurant_id: Decimal(amount_added)}, external_ref=session.get('id')
+                )
         await db.commit()
 
     elif event['type'] in ['customer.subscription.updated', 'customer.subscription.deleted']:
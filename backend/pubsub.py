@@ -0,0 +1,121 @@
+# pubsub.py
+#
+# Cross-worker fan-out over Postgres LISTEN/NOTIFY. Every worker keeps one
+# dedicated asyncpg connection that LISTENs on all subscribed channels and
+# hands payloads to in-process callbacks. Writers queue notifications with
+# `notify()` inside their own transaction, so they are only delivered if
+# (and when) that transaction commits.
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_PAYLOAD_BYTES = 7900
+
+
+async def notify(db: AsyncSession, channel: str, payload: dict) -> None:
+    """Queues a notification in the current transaction; it is sent on commit."""
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": json.dumps(payload, default=str, separators=(",", ":"))},
+    )
+
+
+class PgListener:
+    """
+    Owns the worker's LISTEN connection. Callbacks are plain functions taking
+    the raw payload string; they run on the event loop and must not block.
+    Reconnects with backoff, and calls the `on_reconnect` callbacks afterwards
+    since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, dsn: str):
+        self._dsn = dsn
+        self._handlers = defaultdict(list)
+        self._reconnect_handlers = []
+        self._task = None
+        self._conn = None
+
+    def subscribe(self, channel: str, handler) -> None:
+        self._handlers[channel].append(handler)
+
+    def on_reconnect(self, handler) -> None:
+        self._reconnect_handlers.append(handler)
+
+    async def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    def _dispatch(self, connection, pid, channel, payload) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("pubsub handler for %s failed", channel)
+
+    async def _run(self) -> None:
+        backoff = 1
+        connected_before = False
+        while True:
+            closed = asyncio.Event()
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn)
+                conn.add_termination_listener(lambda _conn: closed.set())
+                for channel in self._handlers:
+                    await conn.add_listener(channel, self._dispatch)
+                backoff = 1
+                if connected_before:
+                    # We may have missed notifications while the connection was down.
+                    for handler in self._reconnect_handlers:
+                        try:
+                            handler()
+                        except Exception:
+                            logger.exception("pubsub reconnect handler failed")
+                connected_before = True
+                # Only now report connected: until the listeners are back and the
+                # reconnect handlers have run, caches may still hold stale entries.
+                self._conn = conn
+                await closed.wait()
+                logger.warning("pubsub connection lost, reconnecting")
+            except asyncio.CancelledError:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+                raise
+            except Exception:
+                logger.exception("pubsub connection failed, retrying in %ss", backoff)
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            self._conn = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+# DATABASE_URL as plain asyncpg wants it, for connections made outside the engine.
+ASYNCPG_DSN = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+listener = PgListener(ASYNCPG_DSN)
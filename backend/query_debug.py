@@ -0,0 +1,82 @@
+# query_debug.py
+#
+# Development/test checks for the async ORM, on when QUERY_DEBUG is "log" or
+# "raise". Two things get reported, with the request's method and route
+# template (from the metrics request context, see metrics.py):
+#
+# - relationship lazy loads, with the loader path that led to them, e.g.
+#   "Website.pages -> Page.sections". Under AsyncSession these are the
+#   MissingGreenlet errors waiting to happen; add a selectinload() instead.
+# - one request running the same SQL REPEATED_QUERY_THRESHOLD times, the
+#   usual sign of a query in a loop (N+1). Statements are compared by their
+#   SQL text, so the same query with different parameters counts as one.
+#
+# "log" warns and carries on; "raise" raises QueryDebugError from the
+# offending statement, so tests fail on it.
+
+import logging
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import QUERY_DEBUG, REPEATED_QUERY_THRESHOLD
+from metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+_MAX_SQL_CHARS = 300
+
+
+class QueryDebugError(RuntimeError):
+    pass
+
+
+def _where() -> str:
+    stats = current_request()
+    if stats is None:
+        return "outside a request"
+    return f"{stats.method} {stats.route}"
+
+
+def _report(message: str) -> None:
+    if QUERY_DEBUG == "raise":
+        raise QueryDebugError(message)
+    logger.warning(message)
+
+
+def describe_path(path) -> str:
+    """A loader path as "Website.pages -> Page.sections"."""
+    elements = list(path.path)
+    return " -> ".join(
+        f"{mapper.class_.__name__}.{prop.key}" for mapper, prop in zip(elements[::2], elements[1::2])
+    )
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    # Eager loaders (selectinload etc.) are relationship loads too; only lazy ones have a parent instance.
+    if not orm_execute_state.is_relationship_load or orm_execute_state.lazy_loaded_from is None:
+        return
+    path = describe_path(orm_execute_state.loader_strategy_path)
+    _report(f"{_where()}: lazy load of {path}")
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = current_request()
+    if stats is None:
+        return
+    if stats.statement_counts is None:
+        stats.statement_counts = Counter()
+    stats.statement_counts[statement] += 1
+    # Reported once per request and statement.
+    if stats.statement_counts[statement] == REPEATED_QUERY_THRESHOLD:
+        sql = " ".join(statement.split())
+        if len(sql) > _MAX_SQL_CHARS:
+            sql = sql[:_MAX_SQL_CHARS] + "..."
+        _report(f"{_where()}: the same query ran {REPEATED_QUERY_THRESHOLD} times in one request: {sql}")
+
+
+def install(engine) -> None:
+    """Turns the checks on for every ORM session and for statements on `engine`."""
+    event.listen(Session, "do_orm_execute", _on_orm_execute)
+    event.listen(getattr(engine, "sync_engine", engine), "after_cursor_execute", _after_cursor_execute)
@@ -21,11 +21,8 @@ async def has_restaurant(
     owner = result.scalars().first()
     
     if owner:
-        # Perform the consumption calculation
-        prompt_cost = (owner.total_prompt_tokens_consumed * 0.15) / 1000000
-        completion_cost = (owner.total_completion_tokens_consumed * 0.6) / 1000000
-        total_consumption = prompt_cost + completion_cost
-        remaining_balance = float(owner.credit_balance) - total_consumption
+        # Usage is debited from credit_balance by the credit ledger as it is metered.
+        remaining_balance = float(owner.credit_balance)
         return {
             "has_restaurant": True,
             "restaurant_id": str(owner.restaurant_id),
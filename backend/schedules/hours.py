@@ -0,0 +1,207 @@
+# schedules/hours.py
+#
+# Opening-hours engine. A location's schedules are compiled once into a
+# sorted list of [start, end) intervals in minutes since Monday 00:00, local
+# to the location's timezone, so "is it open?" and "when does it open next?"
+# are a binary search instead of a scan over schedule rows.
+#
+# A close_time at or before open_time runs past midnight into the next day
+# (e.g. Friday 18:00-02:00 closes early Saturday); open_time == close_time is
+# open around the clock. Sunday's overnight hours wrap to Monday morning.
+#
+# The same intervals drive menu availability windows: MenuTimeIndex holds one
+# compiled week per windowed category/item of a location.
+
+import datetime
+from bisect import bisect_right
+from typing import Iterable, Optional
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from cache import local_cache
+from models import Location, Schedule, AvailabilityWindow
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+DAY_INDEX = {day: i for i, day in enumerate(("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"))}
+
+# Compiled WeeklyHours by location id; evicted by schedule and timezone writes.
+hours_cache = local_cache("hours")
+# MenuTimeIndex by location id; evicted by window and timezone writes.
+menu_windows_cache = local_cache("menu_windows")
+
+
+def _minutes(t: datetime.time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def compile_intervals(schedules: Iterable) -> list:
+    """Sorted, merged (start, end) minute-of-week intervals for a set of schedule rows."""
+    intervals = []
+    for schedule in schedules:
+        if getattr(schedule, "is_closed", False) or schedule.open_time is None or schedule.close_time is None:
+            continue
+        day = DAY_INDEX[schedule.day_of_week]
+        start = day * MINUTES_PER_DAY + _minutes(schedule.open_time)
+        end = day * MINUTES_PER_DAY + _minutes(schedule.close_time)
+        if end <= start:
+            end += MINUTES_PER_DAY
+        if end > MINUTES_PER_WEEK:
+            intervals.append((0, end - MINUTES_PER_WEEK))
+            end = MINUTES_PER_WEEK
+        intervals.append((start, end))
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def local_minute_of_week(at: datetime.datetime, tz: ZoneInfo):
+    """(naive local time truncated to the minute, minutes since Monday 00:00) for `at` in `tz`."""
+    local = at.astimezone(tz).replace(tzinfo=None, second=0, microsecond=0)
+    return local, local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+class WeeklyHours:
+    """A location's compiled week. All answers are timezone-aware datetimes."""
+
+    def __init__(self, intervals: list, timezone: str = "UTC"):
+        self.tz = ZoneInfo(timezone)
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+
+    @property
+    def always_open(self) -> bool:
+        return self.starts == [0] and self.ends == [MINUTES_PER_WEEK]
+
+    def _at_offset(self, local: datetime.datetime, minutes: int) -> datetime.datetime:
+        # Wall-clock arithmetic, so "opens at 09:00" stays 09:00 across DST changes.
+        return (local + datetime.timedelta(minutes=minutes)).replace(tzinfo=self.tz)
+
+    def _interval_at(self, minute: int) -> int:
+        """Index of the interval containing `minute`, or -1."""
+        i = bisect_right(self.starts, minute) - 1
+        if i >= 0 and minute < self.ends[i]:
+            return i
+        return -1
+
+    def is_open(self, at: datetime.datetime) -> bool:
+        return self._interval_at(local_minute_of_week(at, self.tz)[1]) >= 0
+
+    def next_open(self, at: datetime.datetime) -> Optional[datetime.datetime]:
+        """`at` itself if open then, else the next opening time; None if never open."""
+        if not self.starts:
+            return None
+        local, minute = local_minute_of_week(at, self.tz)
+        if self._interval_at(minute) >= 0:
+            return at
+        i = bisect_right(self.starts, minute)
+        start = self.starts[i] if i < len(self.starts) else self.starts[0] + MINUTES_PER_WEEK
+        return self._at_offset(local, start - minute)
+
+    def closes_at(self, at: datetime.datetime) -> Optional[datetime.datetime]:
+        """When the current opening ends, or None if closed at `at` or open around the clock all week."""
+        if self.always_open:
+            return None
+        local, minute = local_minute_of_week(at, self.tz)
+        i = self._interval_at(minute)
+        if i < 0:
+            return None
+        end = self.ends[i]
+        # Open into the next week: continue through the wrapped Monday interval.
+        if end == MINUTES_PER_WEEK and self.starts[0] == 0:
+            end += self.ends[0]
+        return self._at_offset(local, end - minute)
+
+    def next_transition(self, at: datetime.datetime) -> Optional[datetime.datetime]:
+        """The next time the open/closed state changes after `at`; None if it never does."""
+        if not self.starts or self.always_open:
+            return None
+        return self.closes_at(at) or self.next_open(at)
+
+
+async def load_hours(db: AsyncSession, location_ids: Iterable[UUID]) -> dict:
+    """
+    WeeklyHours for each location id, from the cache where possible.
+    Everything missing is loaded with one query for the timezones and one for
+    the schedules. Unknown locations are left out.
+    """
+    hours = {}
+    missing = []
+    for location_id in dict.fromkeys(location_ids):
+        compiled = hours_cache.get(location_id)
+        if compiled is None:
+            missing.append(location_id)
+        else:
+            hours[location_id] = compiled
+    if not missing:
+        return hours
+
+    generation = hours_cache.generation
+    timezones = dict((await db.execute(
+        select(Location.location_id, Location.timezone).where(Location.location_id.in_(missing))
+    )).all())
+    schedules = {location_id: [] for location_id in timezones}
+    rows = await db.execute(select(Schedule).where(Schedule.location_id.in_(missing)))
+    for row in rows.scalars():
+        schedules[row.location_id].append(row)
+
+    for location_id, timezone in timezones.items():
+        hours[location_id] = WeeklyHours(compile_intervals(schedules[location_id]), timezone)
+        hours_cache.put(location_id, hours[location_id], generation)
+    return hours
+
+
+class MenuTimeIndex:
+    """
+    A location's availability windows, compiled per category and per menu
+    item. `bucket()` names the stretch of the week between two consecutive
+    window boundaries; everything `orderable()` answers is constant within
+    a bucket, so results can be cached under it.
+    """
+
+    def __init__(self, windows: Iterable, timezone: str = "UTC"):
+        self.tz = ZoneInfo(timezone)
+        by_category, by_item = {}, {}
+        for window in windows:
+            if window.category_id is not None:
+                by_category.setdefault(window.category_id, []).append(window)
+            else:
+                by_item.setdefault(window.menu_item_id, []).append(window)
+        self.categories = {key: WeeklyHours(compile_intervals(rows), timezone) for key, rows in by_category.items()}
+        self.items = {key: WeeklyHours(compile_intervals(rows), timezone) for key, rows in by_item.items()}
+
+        boundaries = {0}
+        for hours in (*self.categories.values(), *self.items.values()):
+            boundaries.update(minute % MINUTES_PER_WEEK for minute in (*hours.starts, *hours.ends))
+        self.boundaries = sorted(boundaries)
+
+    def bucket(self, at: datetime.datetime) -> int:
+        minute = local_minute_of_week(at, self.tz)[1]
+        return self.boundaries[bisect_right(self.boundaries, minute) - 1]
+
+    def orderable(self, category_id, menu_item_id, at: datetime.datetime) -> bool:
+        category_hours = self.categories.get(category_id)
+        if category_hours is not None and not category_hours.is_open(at):
+            return False
+        item_hours = self.items.get(menu_item_id)
+        return item_hours is None or item_hours.is_open(at)
+
+
+async def load_menu_windows(db: AsyncSession, location_id: UUID) -> Optional[MenuTimeIndex]:
+    """The location's MenuTimeIndex, compiled at most once per worker until its windows change."""
+    async def compile_index():
+        timezone = await db.scalar(select(Location.timezone).where(Location.location_id == location_id))
+        if timezone is None:
+            return None
+        windows = await db.execute(select(AvailabilityWindow).where(AvailabilityWindow.location_id == location_id))
+        return MenuTimeIndex(windows.scalars().all(), timezone)
+
+    return await menu_windows_cache.get_or_load(location_id, compile_index)
@@ -1,15 +1,24 @@
 # schedules/router.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
-from typing import List
+from sqlalchemy.orm import aliased
+from typing import List, Optional
 
 from database import get_db
+from cache import invalidate
+from locations.change_log import record_changes
 from models import Schedule, Location, User
-from schemas import ScheduleCreate, ScheduleResponse, ScheduleUpdate
+from schemas import ScheduleCreate, ScheduleResponse, ScheduleUpdate, OpenStatusResponse, WeekDaySchedule, WeekCopyRequest
 from auth.auth_handler import get_current_active_user
+from .hours import load_hours
 
 router = APIRouter(prefix="/schedules", tags=["Schedules"])
 
@@ -29,6 +38,155 @@ async def get_schedules_by_location(
     return result.scalars().all()
 
 
+def _as_aware(at: Optional[datetime.datetime]) -> datetime.datetime:
+    if at is None:
+        return datetime.datetime.now(datetime.timezone.utc)
+    return at if at.tzinfo else at.replace(tzinfo=datetime.timezone.utc)
+
+
+def _open_status(location_id: UUID, hours, at: datetime.datetime) -> OpenStatusResponse:
+    return OpenStatusResponse(
+        location_id=location_id,
+        is_open=hours.is_open(at),
+        next_open=hours.next_open(at),
+        closes_at=hours.closes_at(at),
+    )
+
+
+@router.get("/by-location/{location_id}/open-now", response_model=OpenStatusResponse)
+async def get_location_open_status(
+    location_id: UUID,
+    at: Optional[datetime.datetime] = Query(None, description="Defaults to now; naive times are taken as UTC"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Whether a location is open at a given time, and when it next opens or closes.
+    """
+    at = _as_aware(at)
+    hours = (await load_hours(db, [location_id])).get(location_id)
+    if hours is None:
+        raise HTTPException(status_code=404, detail="Location not found")
+    return _open_status(location_id, hours, at)
+
+
+@router.get("/by-restaurant/{restaurant_id}/open-now", response_model=List[OpenStatusResponse])
+async def get_restaurant_open_status(
+    restaurant_id: UUID,
+    at: Optional[datetime.datetime] = Query(None, description="Defaults to now; naive times are taken as UTC"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Open status of every location of a restaurant, in one call.
+    """
+    at = _as_aware(at)
+    result = await db.execute(select(Location.location_id).where(Location.restaurant_id == restaurant_id))
+    location_ids = result.scalars().all()
+    hours = await load_hours(db, location_ids)
+    return [_open_status(location_id, hours[location_id], at) for location_id in location_ids if location_id in hours]
+
+
+WEEK_FIELDS = ("open_time", "close_time", "is_closed", "notes")
+
+def _upsert_on_day(stmt):
+    """Turns an INSERT into schedules into an upsert on (location_id, day_of_week)."""
+    return stmt.on_conflict_do_update(
+        constraint="uq_schedules_location_id_day_of_week",
+        set_={**{field: stmt.excluded[field] for field in WEEK_FIELDS}, "updated_at": func.now()},
+    )
+
+
+@router.put("/by-location/{location_id}/week", response_model=List[ScheduleResponse])
+async def replace_week(
+    location_id: UUID,
+    payload: List[WeekDaySchedule],
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Replaces a location's whole week in one transaction: the given days are
+    upserted with a single INSERT ... ON CONFLICT, and days left out are removed.
+    """
+    days = [day.day_of_week.value for day in payload]
+    if len(set(days)) != len(days):
+        raise HTTPException(status_code=400, detail="Each day may only appear once")
+    if not await db.scalar(select(Location.location_id).where(Location.location_id == location_id)):
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    result = await db.execute(
+        delete(Schedule)
+        .where(Schedule.location_id == location_id, Schedule.day_of_week.notin_(days))
+        .returning(Schedule.schedule_id)
+    )
+    changed = result.scalars().all()
+    schedules = []
+    if payload:
+        stmt = insert(Schedule).values([{**day.model_dump(), "location_id": location_id} for day in payload])
+        result = await db.execute(_upsert_on_day(stmt).returning(Schedule))
+        schedules = result.scalars().all()
+
+    await invalidate(db, "hours", location_id)
+    changed += [schedule.schedule_id for schedule in schedules]
+    await record_changes(db, [(location_id, "schedule", schedule_id) for schedule_id in changed])
+    await db.commit()
+    return schedules
+
+
+@router.post("/by-location/{location_id}/week/copy", status_code=status.HTTP_204_NO_CONTENT)
+async def copy_week(
+    location_id: UUID,
+    payload: WeekCopyRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Copies a location's week onto other locations of the same restaurant with
+    one set-based DELETE and one INSERT ... SELECT ... ON CONFLICT, however
+    many locations are targeted.
+    """
+    restaurant_id = await db.scalar(select(Location.restaurant_id).where(Location.location_id == location_id))
+    if not restaurant_id:
+        raise HTTPException(status_code=404, detail="Location not found")
+    result = await db.execute(
+        select(Location.location_id).where(
+            Location.location_id.in_(payload.location_ids),
+            Location.location_id != location_id,
+            Location.restaurant_id == restaurant_id,
+        )
+    )
+    target_ids = result.scalars().all()
+    missing = set(payload.location_ids) - set(target_ids) - {location_id}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Locations not found for this restaurant: {', '.join(sorted(map(str, missing)))}")
+    if not target_ids:
+        return None
+
+    source = aliased(Schedule)
+    deleted = await db.execute(
+        delete(Schedule).where(
+            Schedule.location_id.in_(target_ids),
+            Schedule.day_of_week.notin_(select(source.day_of_week).where(source.location_id == location_id)),
+        )
+        .returning(Schedule.location_id, Schedule.schedule_id)
+    )
+    changed = deleted.all()
+    copied = (
+        select(Location.location_id, source.day_of_week, *(getattr(source, field) for field in WEEK_FIELDS))
+        .select_from(source)
+        .join(Location, Location.location_id.in_(target_ids))
+        .where(source.location_id == location_id)
+    )
+    upserted = await db.execute(
+        _upsert_on_day(insert(Schedule).from_select(["location_id", "day_of_week", *WEEK_FIELDS], copied))
+        .returning(Schedule.location_id, Schedule.schedule_id)
+    )
+    changed += upserted.all()
+
+    await invalidate(db, "hours", *target_ids)
+    await record_changes(db, [(target_id, "schedule", schedule_id) for target_id, schedule_id in changed])
+    await db.commit()
+    return None
+
+
 @router.post("/", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
 async def create_schedule(
     payload: ScheduleCreate,
@@ -40,6 +198,12 @@ async def create_schedule(
     """
     new_schedule = Schedule(**payload.model_dump())
     db.add(new_schedule)
+    try:
+        await db.flush()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"{payload.day_of_week.value} already has a schedule for this location")
+    await invalidate(db, "hours", new_schedule.location_id)
+    await record_changes(db, [(new_schedule.location_id, "schedule", new_schedule.schedule_id)])
     await db.commit()
     await db.refresh(new_schedule)
     return new_schedule
@@ -64,6 +228,14 @@ async def update_schedule(
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(db_schedule, field, value)
 
+    day_of_week = db_schedule.day_of_week
+    try:
+        # Flush first: invalidate() autoflushes, and a day clash must surface here as a 409.
+        await db.flush()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"{day_of_week} already has a schedule for this location")
+    await invalidate(db, "hours", db_schedule.location_id)
+    await record_changes(db, [(db_schedule.location_id, "schedule", schedule_id)])
     await db.commit()
     await db.refresh(db_schedule)
     return db_schedule
@@ -84,6 +256,8 @@ async def delete_schedule(
     if not db_schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
 
+    await invalidate(db, "hours", db_schedule.location_id)
+    await record_changes(db, [(db_schedule.location_id, "schedule", schedule_id)])
     await db.delete(db_schedule)
     await db.commit()
     return None
\ No newline at end of file
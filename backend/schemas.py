@@ -1,8 +1,9 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr,Field
-from typing import Optional
+from pydantic import BaseModel, EmailStr,Field, field_validator
+from typing import Optional, List, Dict, Any
 from uuid import UUID
 import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from enum import Enum
 
 
@@ -47,6 +48,13 @@ class RestaurantBrandResponse(BaseModel):
     class Config:
         orm_mode = True
         
+def _check_timezone(value: str) -> str:
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {value}")
+    return value
+
 class LocationCreate(BaseModel):
     brand_id: UUID
     location_name: str
@@ -59,6 +67,12 @@ class LocationCreate(BaseModel):
     end_date: Optional[datetime.datetime] = None
     delivery_available: bool = False
     dine_in: bool = False
+    timezone: str = "UTC"
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value):
+        return _check_timezone(value)
 
 class LocationResponse(BaseModel):
     location_id: UUID
@@ -75,6 +89,7 @@ class LocationResponse(BaseModel):
     end_date: Optional[datetime.datetime]
     delivery_available: bool
     dine_in: bool
+    timezone: str = "UTC"
 
     class Config:
         from_attributes = True
@@ -87,7 +102,28 @@ class LocationUpdate(BaseModel):
     location_owner_email: Optional[str] = None
     delivery_available: Optional[bool] = None
     dine_in: Optional[bool] = None
+    timezone: Optional[str] = None
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value):
+        return _check_timezone(value) if value is not None else value
         
+class AvailabilityIds(BaseModel):
+    menu_items: List[UUID] = []
+    extras: List[UUID] = []
+    option_choices: List[UUID] = []
+
+class BulkAvailabilityUpdate(BaseModel):
+    available: AvailabilityIds = AvailabilityIds()
+    unavailable: AvailabilityIds = AvailabilityIds()
+
+class BulkAvailabilityResponse(BaseModel):
+    # New availability of every id that was updated.
+    menu_items: Dict[UUID, bool] = {}
+    extras: Dict[UUID, bool] = {}
+    option_choices: Dict[UUID, bool] = {}
+
 class CategoryCreate(BaseModel):
     name: str
     restaurant_id: UUID
@@ -115,7 +151,9 @@ class MenuItemBase(BaseModel):
     is_available: bool = True
     image_url: Optional[str] = None
     category_id: int
-    location_id: UUID
+    # Exactly one: a location's own entity, or the brand's for all its locations.
+    location_id: Optional[UUID] = None
+    brand_id: Optional[UUID] = None
 
 class MenuItemCreate(MenuItemBase):
     pass
@@ -130,6 +168,7 @@ class MenuItemUpdate(BaseModel):
 
 class MenuItemResponse(MenuItemBase):
     item_id: UUID
+    tags: List[str] = []
     created_at: datetime.datetime
     updated_at: Optional[datetime.datetime] = None
 
@@ -142,7 +181,9 @@ class ExtraBase(BaseModel):
     price: float
     description: Optional[str] = None
     is_active: bool = True
-    location_id: UUID
+    # Exactly one: a location's own entity, or the brand's for all its locations.
+    location_id: Optional[UUID] = None
+    brand_id: Optional[UUID] = None
 
 class ExtraCreate(ExtraBase):
     pass
@@ -179,7 +220,9 @@ class OptionGroupBase(BaseModel):
     min_choices: Optional[int] = 0
     max_choices: Optional[int] = 1
     is_required: bool = False
-    location_id: UUID
+    # Exactly one: a location's own entity, or the brand's for all its locations.
+    location_id: Optional[UUID] = None
+    brand_id: Optional[UUID] = None
 
 class OptionGroupCreate(OptionGroupBase):
     pass
@@ -203,7 +246,9 @@ class OptionChoiceBase(BaseModel):
     price_adjustment: Optional[float] = 0.00
     is_active: bool = True
     group_id: UUID
-    location_id: UUID
+    # Exactly one: a location's own entity, or the brand's for all its locations.
+    location_id: Optional[UUID] = None
+    brand_id: Optional[UUID] = None
 
 class OptionChoiceCreate(OptionChoiceBase):
     pass
@@ -236,6 +281,29 @@ class MenuItemOptionResponse(BaseModel):
         from_attributes = True
         
         
+class MenuEntityKind(str, Enum):
+    menu_item = "menu_item"
+    extra = "extra"
+    option_group = "option_group"
+    option_choice = "option_choice"
+
+class MenuOverrideUpsert(BaseModel):
+    # Leave a field null to serve the brand's value; a row with nothing set is removed.
+    entity_kind: MenuEntityKind
+    entity_id: UUID
+    price: Optional[float] = None
+    is_available: Optional[bool] = None
+    is_hidden: bool = False
+
+class MenuOverrideResponse(MenuOverrideUpsert):
+    override_id: UUID
+    location_id: UUID
+    created_at: datetime.datetime
+    updated_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class DayOfWeekEnum(str, Enum):
     Monday = "Monday"
     Tuesday = "Tuesday"
@@ -272,6 +340,199 @@ class ScheduleResponse(ScheduleBase):
         from_attributes = True
         
         
+class WeekDaySchedule(BaseModel):
+    day_of_week: DayOfWeekEnum
+    open_time: Optional[datetime.time] = None
+    close_time: Optional[datetime.time] = None
+    is_closed: bool = False
+    notes: Optional[str] = None
+
+class AvailabilityWindowBase(BaseModel):
+    day_of_week: DayOfWeekEnum
+    open_time: datetime.time
+    close_time: datetime.time
+    location_id: UUID
+    # Exactly one of these.
+    category_id: Optional[int] = None
+    menu_item_id: Optional[UUID] = None
+
+class AvailabilityWindowCreate(AvailabilityWindowBase):
+    pass
+
+class AvailabilityWindowUpdate(BaseModel):
+    day_of_week: Optional[DayOfWeekEnum] = None
+    open_time: Optional[datetime.time] = None
+    close_time: Optional[datetime.time] = None
+
+class AvailabilityWindowResponse(AvailabilityWindowBase):
+    window_id: UUID
+    created_at: datetime.datetime
+
+    class Config:
+        from_attributes = True
+
+class WeekCopyRequest(BaseModel):
+    location_ids: List[UUID]
+
+class MenuCloneRequest(BaseModel):
+    location_ids: List[UUID] = Field(..., min_length=1)
+
+class MenuCloneResponse(BaseModel):
+    # Rows created across all target locations.
+    menu_items: int
+    extras: int
+    option_groups: int
+    option_choices: int
+    menu_item_extras: int
+    menu_item_options: int
+    tags: int
+
+class MenuChangeEntry(BaseModel):
+    seq: int
+    kind: str
+    id: UUID
+    op: str  # "upsert", "delete" or "resync"
+    data: Optional[Dict[str, Any]] = None
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[MenuChangeEntry]
+    cursor: int  # pass as `since` for the next page
+    has_more: bool
+    head: int  # the location's latest sequence number
+
+class WebhookEndpointCreate(BaseModel):
+    restaurant_id: UUID
+    url: str = Field(..., pattern=r"^https?://")
+    max_concurrency: int = Field(4, ge=1, le=32)
+
+class WebhookEndpointUpdate(BaseModel):
+    url: Optional[str] = Field(None, pattern=r"^https?://")
+    is_active: Optional[bool] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, le=32)
+
+class WebhookEndpointResponse(BaseModel):
+    endpoint_id: UUID
+    restaurant_id: UUID
+    url: str
+    is_active: bool
+    max_concurrency: int
+    created_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class WebhookEndpointCreated(WebhookEndpointResponse):
+    # Only ever shown here; receivers use it to check X-Webhook-Signature.
+    secret: str
+
+class WebhookDeadLetterResponse(BaseModel):
+    dead_letter_id: UUID
+    endpoint_id: UUID
+    location_id: UUID
+    payload: Dict[str, Any]
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class CartLine(BaseModel):
+    menu_item_id: UUID
+    quantity: int = Field(1, ge=1, le=999)
+    extra_ids: List[UUID] = []
+    choice_ids: List[UUID] = []
+
+class CartPriceRequest(BaseModel):
+    items: List[CartLine] = Field(..., max_length=500)
+
+class CartLinePrice(BaseModel):
+    menu_item_id: UUID
+    quantity: int
+    unit_cents: int
+    line_cents: int
+    errors: List[str] = []
+
+class CartPriceResponse(BaseModel):
+    # All amounts are integer cents; `valid` is false if any line has errors.
+    valid: bool
+    total_cents: int
+    lines: List[CartLinePrice]
+
+class TagCreate(BaseModel):
+    slug: str
+    name: str
+    kind: str = "dietary"
+
+class TagResponse(TagCreate):
+    tag_id: int
+
+    class Config:
+        from_attributes = True
+
+class TagAssignment(BaseModel):
+    # Replaces the full set of tags.
+    tag_ids: List[int]
+
+class MenuFacetsResponse(BaseModel):
+    # Items matching the filter, and how many of them carry each tag (by slug).
+    total: int
+    tags: Dict[str, int]
+
+class SearchResult(BaseModel):
+    kind: str  # "menu_item", "extra" or "category"
+    id: str
+    name: str
+    description: Optional[str] = None
+    location_id: Optional[UUID] = None
+    category_id: Optional[int] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    next_offset: Optional[int] = None
+
+class OpenStatusResponse(BaseModel):
+    location_id: UUID
+    is_open: bool
+    # `at` itself while open; None if the location has no opening hours.
+    next_open: Optional[datetime.datetime] = None
+    closes_at: Optional[datetime.datetime] = None
+
+
+class UsageEvent(BaseModel):
+    meter: str  # e.g. "prompt_tokens", "completion_tokens"
+    quantity: int = Field(..., ge=0)
+    occurred_at: Optional[datetime.datetime] = None  # defaults to now
+
+class UsageEventBatch(BaseModel):
+    events: List[UsageEvent] = Field(..., min_length=1, max_length=1000)
+
+class UsageRollupResponse(BaseModel):
+    meter: str
+    usage_date: datetime.date
+    quantity: int
+    amount: float  # dollars
+    event_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class CreditBalanceResponse(BaseModel):
+    restaurant_id: UUID
+    balance: float  # dollars, committed
+    available: float  # what this server can still reserve: minus open holds and usage not yet debited
+
+class CreditLedgerEntryResponse(BaseModel):
+    entry_id: int
+    transaction_id: UUID
+    kind: str  # "top_up", "usage" or "opening"
+    amount: float  # dollars, positive for credit added
+    balance_after: float
+    created_at: datetime.datetime
+
+
 class CheckoutSessionResponse(BaseModel):
     sessionId: str
 
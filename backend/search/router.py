@@ -0,0 +1,112 @@
+# search/router.py
+#
+# Ranked search over menu items, extras and categories in one UNION ALL
+# query. Each branch matches on the generated search_vector (prefix-matched
+# words, so it works while typing) or on trigram similarity of the name (for
+# typos); both are served by GIN indexes. Full-text matches outrank fuzzy ones.
+
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from uuid import UUID
+from sqlalchemy import String, case, cast, exists, func, literal, literal_column, or_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Optional
+
+from database import get_db
+from models import Category, Extra, Location, MenuItem, MenuOverride
+from schemas import SearchResponse
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+MAX_LIMIT = 100
+
+
+def prefix_tsquery(q: str):
+    """'chick burg' -> to_tsquery('chick:* & burg:*'); None if the text has no words."""
+    words = re.findall(r"[^\W_]+", q.lower())
+    if not words:
+        return None
+    return func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{word}:*" for word in words))
+
+
+def _branch(kind: str, id_column, name_column, description_column, location_column, category_column, vector_column, tsquery, q: str):
+    full_text = vector_column.op("@@")(tsquery)
+    rank = case((full_text, 1.0), else_=0.0) + func.ts_rank_cd(vector_column, tsquery) + func.similarity(name_column, q)
+    return select(
+        literal(kind).label("kind"),
+        cast(id_column, String).label("id"),
+        name_column.label("name"),
+        description_column.label("description"),
+        location_column.label("location_id"),
+        category_column.label("category_id"),
+        rank.label("score"),
+    ).where(or_(full_text, name_column.op("%")(q)))
+
+
+def _hidden(kind: str, id_column, location_id):
+    """The location hides this brand-level entity."""
+    return exists().where(
+        MenuOverride.location_id == location_id,
+        MenuOverride.entity_kind == kind,
+        MenuOverride.entity_id == id_column,
+        MenuOverride.is_hidden.is_(True),
+    )
+
+
+@router.get("/", response_model=SearchResponse)
+async def search_menu(
+    q: str = Query(..., min_length=1),
+    restaurant_id: Optional[UUID] = Query(None),
+    location_id: Optional[UUID] = Query(None),
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Searches menu items, extras and categories of one restaurant or location,
+    best matches first. Page through results with `offset`/`next_offset`.
+    """
+    if (restaurant_id is None) == (location_id is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of restaurant_id or location_id")
+    tsquery = prefix_tsquery(q)
+    if tsquery is None:
+        return {"results": [], "next_offset": None}
+
+    if location_id is not None:
+        location_ids = select(literal(location_id))
+        restaurant_ids = select(Location.restaurant_id).where(Location.location_id == location_id)
+    else:
+        location_ids = select(Location.location_id).where(Location.restaurant_id == restaurant_id)
+        restaurant_ids = select(literal(restaurant_id))
+    # Brand-level entities are served by every location of the brand.
+    brand_ids = select(Location.brand_id).where(Location.location_id.in_(location_ids))
+
+    items = _branch(
+        "menu_item", MenuItem.item_id, MenuItem.item_name, MenuItem.description,
+        MenuItem.location_id, MenuItem.category_id, MenuItem.search_vector, tsquery, q,
+    ).where(or_(MenuItem.location_id.in_(location_ids), MenuItem.brand_id.in_(brand_ids)))
+    extras = _branch(
+        "extra", Extra.extra_id, Extra.name, Extra.description,
+        Extra.location_id, literal(None, Category.id.type), Extra.search_vector, tsquery, q,
+    ).where(or_(Extra.location_id.in_(location_ids), Extra.brand_id.in_(brand_ids)))
+    if location_id is not None:
+        items = items.where(~_hidden("menu_item", MenuItem.item_id, location_id))
+        extras = extras.where(~_hidden("extra", Extra.extra_id, location_id))
+    categories = _branch(
+        "category", Category.id, Category.name, literal(None, String),
+        literal(None, Location.location_id.type), Category.id, Category.search_vector, tsquery, q,
+    ).where(Category.restaurant_id.in_(restaurant_ids))
+
+    matches = union_all(items, extras, categories).subquery()
+    # Fetch one extra row to know whether there's another page without counting.
+    result = await db.execute(
+        select(matches)
+        .order_by(matches.c.score.desc(), matches.c.kind, matches.c.id)
+        .limit(limit + 1)
+        .offset(offset)
+    )
+    rows = [dict(row._mapping) for row in result]
+    has_more = len(rows) > limit
+    return {"results": rows[:limit], "next_offset": offset + limit if has_more else None}
@@ -0,0 +1,121 @@
+# tags/router.py
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import UUID
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+
+from database import get_db
+from locations.effective_menu import menu_changed
+from models import Tag, MenuItemTag, ExtraTag, MenuItem, Extra, User
+from schemas import TagCreate, TagResponse, TagAssignment
+from auth.auth_handler import get_current_active_user
+
+router = APIRouter(prefix="/tags", tags=["Tags"])
+
+
+@router.get("/", response_model=List[TagResponse])
+async def get_all_tags(db: AsyncSession = Depends(get_db)):
+    """
+    Lists every dietary and allergen tag.
+    """
+    result = await db.execute(select(Tag).order_by(Tag.kind, Tag.name))
+    return result.scalars().all()
+
+
+@router.post("/", response_model=TagResponse, status_code=status.HTTP_201_CREATED)
+async def create_tag(
+    payload: TagCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Creates a new tag; slugs are unique.
+    """
+    new_tag = Tag(**payload.model_dump())
+    db.add(new_tag)
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"Tag '{payload.slug}' already exists")
+    await db.refresh(new_tag)
+    return new_tag
+
+
+async def _replace_tags(db: AsyncSession, link_model, owner_column, owner_id, tag_ids: List[int]):
+    """Replaces an item's or extra's tag links with one DELETE and one INSERT, and returns the tags."""
+    tag_ids = sorted(set(tag_ids))
+    tags = (await db.execute(select(Tag).where(Tag.tag_id.in_(tag_ids)))).scalars().all()
+    missing = set(tag_ids) - {tag.tag_id for tag in tags}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tags not found: {', '.join(map(str, sorted(missing)))}")
+
+    await db.execute(delete(link_model).where(owner_column == owner_id))
+    if tag_ids:
+        await db.execute(insert(link_model), [{owner_column.key: owner_id, "tag_id": tag_id} for tag_id in tag_ids])
+    return tags
+
+
+@router.get("/menu-items/{item_id}", response_model=List[TagResponse])
+async def get_menu_item_tags(item_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Gets the tags of a menu item.
+    """
+    result = await db.execute(
+        select(Tag).join(MenuItemTag, MenuItemTag.tag_id == Tag.tag_id).where(MenuItemTag.menu_item_id == item_id)
+    )
+    return result.scalars().all()
+
+
+@router.put("/menu-items/{item_id}", response_model=List[TagResponse])
+async def set_menu_item_tags(
+    item_id: UUID,
+    payload: TagAssignment,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Replaces the tags of a menu item.
+    """
+    owner = (await db.execute(select(MenuItem.location_id, MenuItem.brand_id).where(MenuItem.item_id == item_id))).first()
+    if not owner:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+
+    tags = await _replace_tags(db, MenuItemTag, MenuItemTag.menu_item_id, item_id, payload.tag_ids)
+    await menu_changed(db, owner, item_id, record=("menu_item", item_id))
+    await db.commit()
+    return tags
+
+
+@router.get("/extras/{extra_id}", response_model=List[TagResponse])
+async def get_extra_tags(extra_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Gets the tags of an extra.
+    """
+    result = await db.execute(
+        select(Tag).join(ExtraTag, ExtraTag.tag_id == Tag.tag_id).where(ExtraTag.extra_id == extra_id)
+    )
+    return result.scalars().all()
+
+
+@router.put("/extras/{extra_id}", response_model=List[TagResponse])
+async def set_extra_tags(
+    extra_id: UUID,
+    payload: TagAssignment,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Replaces the tags of an extra.
+    """
+    owner = (await db.execute(select(Extra.location_id, Extra.brand_id).where(Extra.extra_id == extra_id))).first()
+    if not owner:
+        raise HTTPException(status_code=404, detail="Extra not found")
+
+    tags = await _replace_tags(db, ExtraTag, ExtraTag.extra_id, extra_id, payload.tag_ids)
+    await menu_changed(db, owner, record=("extra", extra_id))
+    await db.commit()
+    return tags
@@ -0,0 +1,202 @@
+# Outbound webhook delivery (webhooks/dispatcher.py) against a local HTTP
+# receiver. The database side of _deliver is replaced by a recording session.
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from models import WebhookDeadLetter
+from webhooks import dispatcher as dispatcher_module
+from webhooks.dispatcher import MAX_ATTEMPTS, WebhookDispatcher, sign
+
+SECRET = "s3cret"
+
+
+class Receiver:
+    """Answers each POST with the next scripted status (200 once they run out) after `delay` seconds."""
+
+    def __init__(self):
+        self.statuses = []
+        self.delay = 0
+        self.requests = []  # (headers, body)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> int:
+        body = handler.rfile.read(int(handler.headers["Content-Length"]))
+        with self._lock:
+            self.requests.append((handler.headers, body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return status
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "WEBHOOK_ALLOW_PRIVATE_HOSTS", True)
+    monkeypatch.setattr(dispatcher_module, "RETRY_BASE_SECONDS", 0)
+    state = Receiver()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            status = state.handle(self)
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def run(coroutine_function):
+    async def main():
+        webhooks = WebhookDispatcher()
+        # Only the HTTP client; start() would also try to take the leader lock.
+        webhooks._client = httpx.AsyncClient(timeout=5)
+        try:
+            return await coroutine_function(webhooks)
+        finally:
+            await webhooks._client.aclose()
+    return asyncio.run(main())
+
+
+class FakeSession:
+    def __init__(self, added):
+        self.added = added
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def scalar(self, statement):
+        return None  # no cursor yet
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def execute(self, statement):
+        pass
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Each location has one change to send; returns the objects _deliver adds (dead letters)."""
+    added, sent = [], set()
+
+    async def load_changes(db, location_id, since, limit):
+        if location_id in sent:
+            return {"changes": [], "cursor": 1, "has_more": False}
+        sent.add(location_id)
+        return {"changes": [{"kind": "menu_item", "id": 1}], "cursor": 1, "has_more": False}
+
+    monkeypatch.setattr(dispatcher_module, "AsyncSessionLocal", lambda: FakeSession(added))
+    monkeypatch.setattr(dispatcher_module, "load_changes", load_changes)
+    return added
+
+
+def test_send_signs_the_body(receiver):
+    body = b'{"changes":[]}'
+    result = run(lambda webhooks: webhooks.send(receiver.url, SECRET, "delivery-1", body))
+
+    assert result == (None, False)
+    [(headers, received)] = receiver.requests
+    assert received == body
+    assert headers["X-Webhook-Id"] == "delivery-1"
+    assert headers["Host"] == receiver.url.split("/")[2]
+    timestamp, signature = (part.split("=", 1)[1] for part in headers["X-Webhook-Signature"].split(","))
+    expected = hmac.new(SECRET.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(signature, expected)
+    assert headers["X-Webhook-Signature"] == sign(SECRET, int(timestamp), body)
+
+
+def test_retries_server_errors_and_429(receiver):
+    receiver.statuses = [500, 429, 503, 200]
+    result = run(lambda webhooks: webhooks._send_with_retries(receiver.url, SECRET, "delivery-1", b"{}"))
+
+    assert result == (None, 4)
+    assert len(receiver.requests) == 4
+    assert len({headers["X-Webhook-Id"] for headers, _ in receiver.requests}) == 1
+
+
+def test_gives_up_after_max_attempts(receiver):
+    receiver.statuses = [502] * MAX_ATTEMPTS
+    result = run(lambda webhooks: webhooks._send_with_retries(receiver.url, SECRET, "delivery-1", b"{}"))
+
+    assert result == ("HTTP 502", MAX_ATTEMPTS)
+    assert len(receiver.requests) == MAX_ATTEMPTS
+
+
+def test_client_error_is_dead_lettered_without_retry(receiver, fake_db):
+    receiver.statuses = [410]
+    endpoint_id, location_id = uuid.uuid4(), uuid.uuid4()
+    run(lambda webhooks: webhooks._deliver(endpoint_id, receiver.url, SECRET, 4, location_id))
+
+    assert len(receiver.requests) == 1
+    [dead_letter] = fake_db
+    assert isinstance(dead_letter, WebhookDeadLetter)
+    assert dead_letter.endpoint_id == endpoint_id and dead_letter.location_id == location_id
+    assert dead_letter.attempts == 1
+    assert dead_letter.last_error == "HTTP 410"
+    assert dead_letter.payload == json.loads(receiver.requests[0][1])
+
+
+def test_endpoint_concurrency_is_limited(receiver, fake_db):
+    receiver.delay = 0.2
+    endpoint_id, other_endpoint_id = uuid.uuid4(), uuid.uuid4()
+
+    async def deliver_all(webhooks):
+        await asyncio.gather(*(
+            webhooks._deliver(endpoint_id, receiver.url, SECRET, 2, uuid.uuid4()) for _ in range(6)
+        ))
+        limited = receiver.max_in_flight
+        receiver.max_in_flight = 0
+        # Another endpoint has its own limit.
+        await asyncio.gather(
+            webhooks._deliver(endpoint_id, receiver.url, SECRET, 2, uuid.uuid4()),
+            webhooks._deliver(other_endpoint_id, receiver.url, SECRET, 2, uuid.uuid4()),
+            webhooks._deliver(other_endpoint_id, receiver.url, SECRET, 2, uuid.uuid4()),
+        )
+        return limited, receiver.max_in_flight
+
+    limited, separate = run(deliver_all)
+
+    assert len(receiver.requests) == 9
+    assert limited == 2
+    assert separate == 3
+    assert fake_db == []
+
+
+def test_non_public_hosts_are_refused(receiver, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "WEBHOOK_ALLOW_PRIVATE_HOSTS", False)
+    error, retryable = run(lambda webhooks: webhooks.send(receiver.url, SECRET, "delivery-1", b"{}"))
+
+    assert "non-public address" in error
+    assert retryable is False
+    assert receiver.requests == []
@@ -0,0 +1,309 @@
+# webhooks/dispatcher.py
+#
+# Outbound webhooks, fed by the menu change log (locations/change_log.py).
+# Every write to a location's menu, schedules or settings bumps its
+# change_seq and NOTIFYs CHANNEL on commit. One worker, the one holding the
+# advisory lock, does the sending: it waits COALESCE_SECONDS after the first
+# notification for a location so a burst of edits goes out together, then
+# posts each of the restaurant's endpoints one signed batch of everything
+# after that endpoint's cursor, read from the change feed, so an entity
+# edited ten times in the window is sent once with its current state.
+#
+# Delivery is at least once: the cursor only moves after the endpoint
+# accepted the batch (or it was dead-lettered), and receivers can dedupe on
+# X-Webhook-Id. Batches for one (endpoint, location) are sent in order, one at
+# a time; an endpoint gets at most its max_concurrency requests at once. A
+# periodic sweep picks up anything whose notification was missed.
+#
+# Endpoint URLs are owner-supplied, so their hosts must resolve to public
+# addresses only: checked when an endpoint is registered and again on every
+# send, which then connects to the address it checked.
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from uuid import UUID, uuid4
+
+import asyncpg
+import httpx
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from config import WEBHOOK_ALLOW_PRIVATE_HOSTS
+from database import AsyncSessionLocal
+from locations.change_log import CHANNEL
+from locations.changes import load_changes
+from models import Location, WebhookCursor, WebhookDeadLetter, WebhookEndpoint
+from pubsub import ASYNCPG_DSN, listener
+
+logger = logging.getLogger(__name__)
+
+COALESCE_SECONDS = 2
+SWEEP_SECONDS = 60
+LEADER_RETRY_SECONDS = 15
+LEADER_LOCK_KEY = 0x77656268  # pg_try_advisory_lock key, "webh"
+MAX_BATCH = 500
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 1
+REQUEST_TIMEOUT_SECONDS = 10
+USER_AGENT = "restaurant-webhooks/1.0"
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """X-Webhook-Signature value: HMAC-SHA256 of "<timestamp>.<body>" keyed by the endpoint secret."""
+    digest = hmac.new(secret.encode(), str(timestamp).encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class UnsafeURLError(ValueError):
+    pass
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def resolve_public(url: str) -> list:
+    """
+    The addresses the URL's host resolves to. Raises UnsafeURLError if any
+    of them is private, loopback, link-local or otherwise not public, and
+    OSError if the host doesn't resolve.
+    """
+    host = httpx.URL(url).host
+    if not host:
+        raise UnsafeURLError("Webhook URL has no host")
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not WEBHOOK_ALLOW_PRIVATE_HOSTS:
+        for address in addresses:
+            if not _is_public(address):
+                raise UnsafeURLError(f"Webhook host {host} resolves to a non-public address ({address})")
+    return addresses
+
+
+def _is_retryable(status_code: int) -> bool:
+    # Other 4xx mean the receiver will never take this batch as it is.
+    return status_code >= 500 or status_code in (408, 409, 425, 429)
+
+
+class WebhookDispatcher:
+    def __init__(self):
+        self._client = None
+        self._task = None
+        self._is_leader = False
+        self._pending = set()       # locations waiting out their coalescing window
+        self._running = {}          # (endpoint_id, location_id) -> delivery task
+        self._again = set()         # pairs that changed again while being delivered
+        self._limits = {}           # endpoint_id -> (max_concurrency, Semaphore)
+        self._background = set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        tasks = [self._task, *self._running.values(), *self._background]
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+        self._pending.clear()
+        await self._client.aclose()
+        self._client = None
+
+    # --- Triggers ---
+
+    def handle_notification(self, payload: str) -> None:
+        if not self._is_leader:
+            return
+        loop = asyncio.get_running_loop()
+        for location_id in map(UUID, json.loads(payload)["location_ids"]):
+            if location_id not in self._pending:
+                self._pending.add(location_id)
+                loop.call_later(COALESCE_SECONDS, self._window_closed, location_id)
+
+    def _window_closed(self, location_id) -> None:
+        self._pending.discard(location_id)
+        self._spawn(self.dispatch([location_id]))
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _run(self) -> None:
+        """Waits to become the sending worker, then sweeps until the lock's connection drops."""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(ASYNCPG_DSN)
+                while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_KEY):
+                    await asyncio.sleep(LEADER_RETRY_SECONDS)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                self._is_leader = True
+                logger.info("webhook dispatcher is sending for this worker")
+                while not lost.is_set():
+                    await self.dispatch()
+                    try:
+                        await asyncio.wait_for(lost.wait(), SWEEP_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                logger.warning("webhook dispatcher lost its lock connection")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("webhook dispatcher failed, retrying in %ss", LEADER_RETRY_SECONDS)
+            finally:
+                self._is_leader = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(LEADER_RETRY_SECONDS)
+
+    # --- Delivery ---
+
+    async def dispatch(self, location_ids=None) -> None:
+        """Starts a delivery for every active (endpoint, location) pair behind its location's head."""
+        sent_seq = func.coalesce(WebhookCursor.seq, 0)
+        query = (
+            select(WebhookEndpoint.endpoint_id, WebhookEndpoint.url, WebhookEndpoint.secret,
+                   WebhookEndpoint.max_concurrency, Location.location_id)
+            .join(Location, Location.restaurant_id == WebhookEndpoint.restaurant_id)
+            .outerjoin(WebhookCursor, and_(
+                WebhookCursor.endpoint_id == WebhookEndpoint.endpoint_id,
+                WebhookCursor.location_id == Location.location_id,
+            ))
+            .where(WebhookEndpoint.is_active.is_(True), Location.change_seq > sent_seq)
+        )
+        if location_ids is not None:
+            query = query.where(Location.location_id.in_(location_ids))
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+
+        for endpoint_id, url, secret, max_concurrency, location_id in rows:
+            key = (endpoint_id, location_id)
+            if key in self._running:
+                self._again.add(key)
+                continue
+            task = asyncio.create_task(self._deliver(endpoint_id, url, secret, max_concurrency, location_id))
+            self._running[key] = task
+            task.add_done_callback(lambda _task, key=key: self._delivery_done(key))
+
+    def _delivery_done(self, key) -> None:
+        self._running.pop(key, None)
+        if key in self._again and self._task is not None:
+            self._again.discard(key)
+            self._spawn(self.dispatch([key[1]]))
+
+    def _limit(self, endpoint_id, max_concurrency: int) -> asyncio.Semaphore:
+        limit = self._limits.get(endpoint_id)
+        if limit is None or limit[0] != max_concurrency:
+            limit = self._limits[endpoint_id] = (max_concurrency, asyncio.Semaphore(max_concurrency))
+        return limit[1]
+
+    async def _deliver(self, endpoint_id, url: str, secret: str, max_concurrency: int, location_id) -> None:
+        """Sends the location's unsent changes to one endpoint, MAX_BATCH at a time."""
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    since = await db.scalar(
+                        select(WebhookCursor.seq).where(
+                            WebhookCursor.endpoint_id == endpoint_id, WebhookCursor.location_id == location_id,
+                        )
+                    )
+                    feed = await load_changes(db, location_id, since or 0, MAX_BATCH)
+                if feed is None or not feed["changes"]:
+                    return
+
+                delivery_id = str(uuid4())
+                body = json.dumps({
+                    "delivery_id": delivery_id,
+                    "location_id": location_id,
+                    "changes": feed["changes"],
+                    "cursor": feed["cursor"],
+                    "has_more": feed["has_more"],
+                }, default=str, separators=(",", ":")).encode()
+
+                async with self._limit(endpoint_id, max_concurrency):
+                    error, attempts = await self._send_with_retries(url, secret, delivery_id, body)
+
+                async with AsyncSessionLocal() as db:
+                    if error is not None:
+                        logger.warning("webhook %s to %s dead-lettered after %s attempts: %s", delivery_id, url, attempts, error)
+                        db.add(WebhookDeadLetter(
+                            endpoint_id=endpoint_id, location_id=location_id, payload=json.loads(body),
+                            attempts=attempts, last_error=error,
+                        ))
+                    stmt = insert(WebhookCursor).values(endpoint_id=endpoint_id, location_id=location_id, seq=feed["cursor"])
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=[WebhookCursor.endpoint_id, WebhookCursor.location_id],
+                        set_={"seq": stmt.excluded.seq, "updated_at": func.now()},
+                    ))
+                    await db.commit()
+                if not feed["has_more"]:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("webhook delivery to %s for location %s failed", url, location_id)
+
+    async def _send_with_retries(self, url: str, secret: str, delivery_id: str, body: bytes):
+        """(None, attempts) once delivered, else (last error, attempts); backs off exponentially."""
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            error, retryable = await self.send(url, secret, delivery_id, body)
+            if error is None:
+                return None, attempt
+            if not retryable:
+                return error, attempt
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+        return error, MAX_ATTEMPTS
+
+    async def send(self, url: str, secret: str, delivery_id: str, body: bytes):
+        """One signed POST over the shared client; (error or None, whether it's worth retrying)."""
+        try:
+            addresses = await resolve_public(url)
+        except UnsafeURLError as exc:
+            return str(exc), False
+        except OSError as exc:
+            return f"{type(exc).__name__}: {exc}", True
+
+        # Connect to the address just checked, so DNS can't swap it before the request.
+        target = httpx.URL(url)
+        headers = {
+            "Host": target.netloc.decode("ascii"),
+            "Content-Type": "application/json",
+            "X-Webhook-Id": delivery_id,
+            "X-Webhook-Signature": sign(secret, int(time.time()), body),
+        }
+        extensions = {"sni_hostname": target.host} if target.scheme == "https" else {}
+        try:
+            response = await self._client.post(
+                target.copy_with(host=addresses[0]), content=body, headers=headers, extensions=extensions,
+            )
+        except httpx.HTTPError as exc:
+            return f"{type(exc).__name__}: {exc}", True
+        if response.is_success:
+            return None, False
+        return f"HTTP {response.status_code}", _is_retryable(response.status_code)
+
+
+dispatcher = WebhookDispatcher()
+listener.subscribe(CHANNEL, dispatcher.handle_notification)
@@ -0,0 +1,183 @@
+# webhooks/router.py
+
+import json
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import UUID
+from sqlalchemy import insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+
+from database import get_db
+from models import Location, RestaurantOwner, User, WebhookCursor, WebhookDeadLetter, WebhookEndpoint
+from schemas import (
+    WebhookDeadLetterResponse, WebhookEndpointCreate, WebhookEndpointCreated, WebhookEndpointResponse,
+    WebhookEndpointUpdate,
+)
+from auth.auth_handler import get_current_active_user
+from .dispatcher import UnsafeURLError, dispatcher, resolve_public
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+
+def _my_restaurant_ids(current_user: User):
+    return select(RestaurantOwner.restaurant_id).where(RestaurantOwner.user_id == current_user.id)
+
+
+async def _check_url(url: str) -> None:
+    try:
+        await resolve_public(url)
+    except UnsafeURLError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except OSError:
+        raise HTTPException(status_code=400, detail="Webhook URL host could not be resolved")
+
+
+async def _get_my_endpoint(db: AsyncSession, endpoint_id: UUID, current_user: User) -> WebhookEndpoint:
+    endpoint = await db.scalar(
+        select(WebhookEndpoint).where(
+            WebhookEndpoint.endpoint_id == endpoint_id,
+            WebhookEndpoint.restaurant_id.in_(_my_restaurant_ids(current_user)),
+        )
+    )
+    if endpoint is None:
+        raise HTTPException(status_code=404, detail="Webhook endpoint not found")
+    return endpoint
+
+
+@router.get("/", response_model=List[WebhookEndpointResponse])
+async def list_endpoints(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Lists the webhook endpoints of the current user's restaurants.
+    """
+    result = await db.execute(
+        select(WebhookEndpoint)
+        .where(WebhookEndpoint.restaurant_id.in_(_my_restaurant_ids(current_user)))
+        .order_by(WebhookEndpoint.created_at)
+    )
+    return result.scalars().all()
+
+
+@router.post("/", response_model=WebhookEndpointCreated, status_code=status.HTTP_201_CREATED)
+async def create_endpoint(
+    payload: WebhookEndpointCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Registers a URL to receive the restaurant's menu, schedule and location
+    changes. The URL's host must resolve to public addresses. Only changes
+    made from now on are sent; the response carries the signing secret,
+    which is not shown again.
+    """
+    owned = await db.scalar(
+        select(RestaurantOwner.restaurant_id).where(
+            RestaurantOwner.restaurant_id == payload.restaurant_id, RestaurantOwner.user_id == current_user.id,
+        )
+    )
+    if not owned:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    await _check_url(payload.url)
+
+    endpoint = WebhookEndpoint(**payload.model_dump(), secret=secrets.token_hex(32))
+    db.add(endpoint)
+    await db.flush()
+    # Start every location's cursor at its current head.
+    await db.execute(
+        insert(WebhookCursor).from_select(
+            ["endpoint_id", "location_id", "seq"],
+            select(literal(endpoint.endpoint_id, WebhookCursor.endpoint_id.type), Location.location_id, Location.change_seq)
+            .where(Location.restaurant_id == payload.restaurant_id),
+        )
+    )
+    await db.commit()
+    await db.refresh(endpoint)
+    return endpoint
+
+
+@router.put("/{endpoint_id}", response_model=WebhookEndpointResponse)
+async def update_endpoint(
+    endpoint_id: UUID,
+    payload: WebhookEndpointUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Updates a webhook endpoint. A paused endpoint keeps its place and gets
+    everything it missed once it is active again.
+    """
+    endpoint = await _get_my_endpoint(db, endpoint_id, current_user)
+    if payload.url is not None:
+        await _check_url(payload.url)
+    for key, value in payload.model_dump(exclude_unset=True).items():
+        setattr(endpoint, key, value)
+    await db.commit()
+    await db.refresh(endpoint)
+    return endpoint
+
+
+@router.delete("/{endpoint_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_endpoint(
+    endpoint_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Deletes a webhook endpoint, its cursors and its dead letters.
+    """
+    endpoint = await _get_my_endpoint(db, endpoint_id, current_user)
+    await db.delete(endpoint)
+    await db.commit()
+    return None
+
+
+@router.get("/{endpoint_id}/dead-letters", response_model=List[WebhookDeadLetterResponse])
+async def list_dead_letters(
+    endpoint_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Lists the batches an endpoint refused after every retry, newest first.
+    """
+    await _get_my_endpoint(db, endpoint_id, current_user)
+    result = await db.execute(
+        select(WebhookDeadLetter)
+        .where(WebhookDeadLetter.endpoint_id == endpoint_id)
+        .order_by(WebhookDeadLetter.created_at.desc())
+    )
+    return result.scalars().all()
+
+
+@router.post("/dead-letters/{dead_letter_id}/replay", status_code=status.HTTP_204_NO_CONTENT)
+async def replay_dead_letter(
+    dead_letter_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Sends a dead-lettered batch again, once, exactly as it was; it is removed
+    if the endpoint accepts it. Its changes may be older than ones the
+    endpoint has received since.
+    """
+    dead_letter = await db.scalar(select(WebhookDeadLetter).where(WebhookDeadLetter.dead_letter_id == dead_letter_id))
+    if dead_letter is None:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    endpoint = await _get_my_endpoint(db, dead_letter.endpoint_id, current_user)
+
+    body = json.dumps(dead_letter.payload, separators=(",", ":")).encode()
+    error, _ = await dispatcher.send(endpoint.url, endpoint.secret, dead_letter.payload["delivery_id"], body)
+    if error is not None:
+        dead_letter.attempts += 1
+        dead_letter.last_error = error
+        await db.commit()
+        raise HTTPException(status_code=502, detail=f"Endpoint did not accept the batch: {error}")
+
+    await db.delete(dead_letter)
+    await db.commit()
+    return None
@@ -0,0 +1,103 @@
+# website_builder/benchmark.py
+#
+# Compares the old selectinload chain with the UNION ALL tree loader on a
+# synthetic 50-page / 5,000-element site. Everything runs inside a transaction
+# that is rolled back, so it is safe to point at a development database:
+#
+#     python -m website_builder.benchmark
+
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from database import engine
+from models import User, RestaurantOwner
+from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem
+from .tree import load_website_tree
+from .ordering import evenly_spaced_keys
+
+PAGES = 50
+SECTIONS_PER_PAGE = 2
+SUBSECTIONS_PER_SECTION = 5
+ELEMENTS_PER_SUBSECTION = 10  # 50 * 2 * 5 * 10 = 5,000 elements
+RUNS = 20
+
+
+async def seed_site(db: AsyncSession):
+    user = User(username=f"bench-{uuid.uuid4()}", email=f"{uuid.uuid4()}@bench.local", hashed_password="-")
+    db.add(user)
+    await db.flush()
+    owner = RestaurantOwner(user_id=user.id)
+    db.add(owner)
+    await db.flush()
+
+    website_id, navbar_id = uuid.uuid4(), uuid.uuid4()
+    await db.execute(insert(Website), [{"website_id": website_id, "restaurant_id": owner.restaurant_id, "subdomain": f"bench-{website_id}"}])
+    await db.execute(insert(Navbar), [{"navbar_id": navbar_id, "website_id": website_id, "properties": {}}])
+
+    pages, sections, subsections, elements, items = [], [], [], [], []
+    keys = evenly_spaced_keys(PAGES)
+    for p in range(PAGES):
+        page_id = uuid.uuid4()
+        pages.append({"page_id": page_id, "website_id": website_id, "title": f"Page {p}", "slug": f"/page-{p}"})
+        items.append({"navbar_id": navbar_id, "text": f"Page {p}", "link_url": f"/page-{p}", "position": p + 1, "order_key": keys[p]})
+        for s in range(SECTIONS_PER_PAGE):
+            section_id = uuid.uuid4()
+            sections.append({"section_id": section_id, "page_id": page_id, "section_type": "content", "position": s + 1, "order_key": keys[s], "properties": {}})
+            for ss in range(SUBSECTIONS_PER_SECTION):
+                subsection_id = uuid.uuid4()
+                subsections.append({"subsection_id": subsection_id, "section_id": section_id, "position": ss + 1, "order_key": keys[ss], "properties": {"flexDirection": "row"}})
+                for e in range(ELEMENTS_PER_SUBSECTION):
+                    elements.append({"subsection_id": subsection_id, "element_type": "text", "position": e + 1, "order_key": keys[e],
+                                     "properties": {"text": f"Element {e}", "fontSize": 16}})
+
+    for model, rows in ((Page, pages), (Section, sections), (Subsection, subsections), (Element, elements), (NavbarItem, items)):
+        await db.execute(insert(model), rows)
+    return website_id
+
+
+async def selectinload_chain(db: AsyncSession, website_id):
+    result = await db.execute(
+        select(Website).options(
+            selectinload(Website.pages).selectinload(Page.sections).selectinload(Section.subsections).selectinload(Subsection.elements),
+            selectinload(Website.navbar).selectinload(Navbar.items)
+        ).where(Website.website_id == website_id)
+    )
+    website = result.scalars().first()
+    db.expunge_all()
+    return website
+
+
+async def time_it(label, fn):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<22} median {statistics.median(timings):8.2f} ms   min {min(timings):8.2f} ms")
+
+
+async def main():
+    engine.sync_engine.echo = False  # statement logging would dominate the timings
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            db = AsyncSession(bind=conn, expire_on_commit=False)
+            website_id = await seed_site(db)
+            await db.flush()
+            print(f"{PAGES} pages, {PAGES * SECTIONS_PER_PAGE * SUBSECTIONS_PER_SECTION * ELEMENTS_PER_SUBSECTION} elements, {RUNS} runs each")
+            await time_it("selectinload chain", lambda: selectinload_chain(db, website_id))
+            await time_it("tree loader", lambda: load_website_tree(db, Website.website_id == website_id))
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 # website_builder/models.py
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, JSON, Boolean, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
@@ -10,6 +10,15 @@ from database import Base
 # You would add `website = relationship("Website", back_populates="owner", uselist=False)`
 # to your existing RestaurantOwner class.
 
+# Sibling order is a fractional key (see ordering.py). Keys compare byte-wise, and the
+# (parent, order_key) constraint is deferred so a sibling list can be respaced in one
+# transaction. Its index also serves ordered reads of a sibling list.
+def OrderKey():
+    return Column(String(collation="C"), nullable=False)
+
+def order_key_constraint(parent_column, name):
+    return UniqueConstraint(parent_column, "order_key", name=name, deferrable=True, initially="DEFERRED")
+
 class Website(Base):
     __tablename__ = "websites"
 
@@ -18,60 +27,76 @@ class Website(Base):
     subdomain = Column(String, unique=True, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped by every builder mutation; versions the deltas sent to live editors.
+    revision = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
+    # Points at the snapshot served publicly; rolling back just moves this pointer.
+    published_snapshot_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("website_snapshots.snapshot_id", use_alter=True, ondelete="SET NULL"),
+        nullable=True,
+    )
 
     # Relationships
     # owner = relationship("RestaurantOwner", back_populates="website") # This link is defined on the RestaurantOwner model
-    pages = relationship("Page", back_populates="website", cascade="all, delete-orphan")
-    navbar = relationship("Navbar", back_populates="website", uselist=False, cascade="all, delete-orphan")
+    pages = relationship("Page", back_populates="website", cascade="all, delete-orphan", passive_deletes=True)
+    navbar = relationship("Navbar", back_populates="website", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
     restaurant = relationship("RestaurantOwner", back_populates="website")
 
 class Page(Base):
     __tablename__ = "pages"
+    # Public page routes resolve a page by (website, slug).
+    __table_args__ = (Index("ix_pages_website_id_slug", "website_id", "slug"),)
 
     page_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    website_id = Column(UUID(as_uuid=True), ForeignKey("websites.website_id"), nullable=False)
+    website_id = Column(UUID(as_uuid=True), ForeignKey("websites.website_id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
     slug = Column(String, nullable=False)
 
     # Relationships
     website = relationship("Website", back_populates="pages")
-    sections = relationship("Section", back_populates="page", cascade="all, delete-orphan", order_by="Section.position")
+    sections = relationship("Section", back_populates="page", cascade="all, delete-orphan", passive_deletes=True, order_by="Section.order_key")
 
 
 class Section(Base):
     __tablename__ = "sections"
+    __table_args__ = (order_key_constraint("page_id", "uq_sections_page_id_order_key"),)
     section_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    page_id = Column(UUID(as_uuid=True), ForeignKey("pages.page_id"), nullable=False)
+    page_id = Column(UUID(as_uuid=True), ForeignKey("pages.page_id", ondelete="CASCADE"), nullable=False)
     section_type = Column(String, nullable=False)
     position = Column(Integer, nullable=False)
+    order_key = OrderKey()
     # THE FIX: The properties column was missing. It has been added here.
     properties = Column(JSON, nullable=False, default={})
     page = relationship("Page", back_populates="sections")
-    subsections = relationship("Subsection", back_populates="section", cascade="all, delete-orphan", order_by="Subsection.position")
+    subsections = relationship("Subsection", back_populates="section", cascade="all, delete-orphan", passive_deletes=True, order_by="Subsection.order_key")
 
 
 # NEW: Subsection Model
 class Subsection(Base):
     __tablename__ = "subsections"
+    __table_args__ = (order_key_constraint("section_id", "uq_subsections_section_id_order_key"),)
 
     subsection_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    section_id = Column(UUID(as_uuid=True), ForeignKey("sections.section_id"), nullable=False)
+    section_id = Column(UUID(as_uuid=True), ForeignKey("sections.section_id", ondelete="CASCADE"), nullable=False)
     position = Column(Integer, nullable=False)
+    order_key = OrderKey()
     properties = Column(JSON, nullable=False)  # For layout styles like flex direction
 
     # Relationships
     section = relationship("Section", back_populates="subsections")
-    elements = relationship("Element", back_populates="subsection", cascade="all, delete-orphan", order_by="Element.position")
+    elements = relationship("Element", back_populates="subsection", cascade="all, delete-orphan", passive_deletes=True, order_by="Element.order_key")
 
 
 # UPDATED: Element Model now links to a Subsection
 class Element(Base):
     __tablename__ = "elements"
+    __table_args__ = (order_key_constraint("subsection_id", "uq_elements_subsection_id_order_key"),)
 
     element_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    subsection_id = Column(UUID(as_uuid=True), ForeignKey("subsections.subsection_id"), nullable=False)
+    subsection_id = Column(UUID(as_uuid=True), ForeignKey("subsections.subsection_id", ondelete="CASCADE"), nullable=False)
     element_type = Column(String, nullable=False)
     position = Column(Integer, nullable=False)
+    order_key = OrderKey()
     properties = Column(JSON, nullable=False)
 
     # Relationships
@@ -82,22 +107,52 @@ class Navbar(Base):
     __tablename__ = "navbars"
 
     navbar_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    website_id = Column(UUID(as_uuid=True), ForeignKey("websites.website_id"), nullable=False, unique=True)
+    website_id = Column(UUID(as_uuid=True), ForeignKey("websites.website_id", ondelete="CASCADE"), nullable=False, unique=True)
     properties = Column(JSON, nullable=False, server_default=text("'{}'::jsonb")) # <-- ADDED THIS LINE
 
     # Relationships
     website = relationship("Website", back_populates="navbar")
-    items = relationship("NavbarItem", back_populates="navbar", cascade="all, delete-orphan", order_by="NavbarItem.position")
+    items = relationship("NavbarItem", back_populates="navbar", cascade="all, delete-orphan", passive_deletes=True, order_by="NavbarItem.order_key")
 
 
 class NavbarItem(Base):
     __tablename__ = "navbar_items"
+    __table_args__ = (order_key_constraint("navbar_id", "uq_navbar_items_navbar_id_order_key"),)
 
     item_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    navbar_id = Column(UUID(as_uuid=True), ForeignKey("navbars.navbar_id"), nullable=False)
+    navbar_id = Column(UUID(as_uuid=True), ForeignKey("navbars.navbar_id", ondelete="CASCADE"), nullable=False)
     text = Column(String, nullable=False)
     link_url = Column(String, nullable=False)
     position = Column(Integer, nullable=False)
+    order_key = OrderKey()
 
     # Relationships
     navbar = relationship("Navbar", back_populates="items")
+
+
+class WebsiteSnapshot(Base):
+    """An immutable, versioned copy of the whole public website, compiled at publish time."""
+    __tablename__ = "website_snapshots"
+    __table_args__ = (UniqueConstraint("website_id", "version"),)
+
+    snapshot_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    website_id = Column(UUID(as_uuid=True), ForeignKey("websites.website_id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    # The serialized PublicWebsiteResponse, gzip-compressed when `compressed` is set.
+    document = Column(LargeBinary, nullable=False)
+    compressed = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class SiteTemplate(Base):
+    """A starting website, stored compiled as flat per-table rows (see templates.py)."""
+    __tablename__ = "site_templates"
+
+    template_id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    # NULL for templates offered to everyone; otherwise private to that restaurant.
+    restaurant_id = Column(UUID(as_uuid=True), ForeignKey("restaurant_owners.restaurant_id", ondelete="CASCADE"), nullable=True, index=True)
+    document = Column(JSON, nullable=False)
+    node_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,169 @@
+# website_builder/ordering.py
+#
+# Fractional order keys for builder nodes. Keys are base-62 strings compared
+# byte-wise (the columns use the "C" collation), and a new key can always be
+# generated between any two existing ones, so inserting or moving a node only
+# writes that node's row.
+#
+# Choosing a key reads the neighbours' keys, so it first locks the parent row
+# (see lock_siblings): concurrent inserts into one sibling list, and a
+# rebalance of it, take turns instead of picking the same key.
+
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+# Keys grow when the same gap is split over and over; past this length the
+# siblings get respaced in the background.
+MAX_KEY_LENGTH = 24
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Key strictly between a and b (b=None means "no upper bound"). Neither may end in "0"."""
+    if b is not None:
+        # Skip the common prefix, treating a as padded with "0".
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # The first digits are adjacent, so descend a level.
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _after(a: str) -> str:
+    """Smallest-step key after a, so that repeated appends only grow keys slowly."""
+    if not a:
+        return _midpoint("", None)
+    if a[0] != DIGITS[-1]:
+        return DIGITS[DIGITS.index(a[0]) + 1]
+    return a[0] + _after(a[1:])
+
+
+def _before(b: str) -> str:
+    """Smallest-step key before b, the mirror image of `_after`."""
+    digit = DIGITS.index(b[0])
+    if digit > 1:
+        return DIGITS[digit - 1]
+    if digit == 1:
+        return b[0] if len(b) > 1 else DIGITS[0] + _midpoint("", None)
+    return b[0] + _before(b[1:])
+
+
+def validate_key(key: str) -> None:
+    if not key or key[-1] == "0" or any(c not in DIGITS for c in key):
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Returns a key that sorts after `a` and before `b`; either bound may be None."""
+    if a is not None:
+        validate_key(a)
+    if b is not None:
+        validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Order keys out of order: {a!r} >= {b!r}")
+    if b is None and a is not None:
+        return _after(a)
+    if a is None and b is not None:
+        return _before(b)
+    return _midpoint(a or "", b)
+
+
+def evenly_spaced_keys(count: int) -> list:
+    """`count` short, evenly spaced keys in ascending order, used for rebalancing."""
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
+
+
+async def lock_siblings(db: AsyncSession, parent_column, parent_id) -> None:
+    """Locks the siblings' parent row until commit. FOR NO KEY UPDATE, so other tables' foreign keys to it aren't blocked."""
+    parent_key = next(iter(parent_column.property.columns[0].foreign_keys)).column
+    await db.execute(select(parent_key).where(parent_key == parent_id).with_for_update(key_share=True))
+
+
+async def neighbour_keys(db: AsyncSession, model, parent_column, parent_id, index: Optional[int] = None, exclude_id=None):
+    """
+    The keys a node placed at `index` among its siblings would sit between, as
+    (before, after); appends when `index` is None or past the end. Reads at
+    most two rows, straight off the (parent, order_key) index.
+    """
+    query = select(model.order_key).where(parent_column == parent_id)
+    if exclude_id is not None:
+        primary_key = model.__mapper__.primary_key[0]
+        query = query.where(primary_key != exclude_id)
+
+    if index is None:
+        return await db.scalar(query.order_by(model.order_key.desc()).limit(1)), None
+    index = max(index, 0)
+    if index == 0:
+        return None, await db.scalar(query.order_by(model.order_key).limit(1))
+
+    keys = (await db.execute(query.order_by(model.order_key).offset(index - 1).limit(2))).scalars().all()
+    if not keys:
+        return await neighbour_keys(db, model, parent_column, parent_id, None, exclude_id)
+    return keys[0], keys[1] if len(keys) > 1 else None
+
+
+async def key_for_index(db: AsyncSession, model, parent_column, parent_id, index: Optional[int] = None) -> str:
+    """Key for a new node inserted at `index` (or appended)."""
+    await lock_siblings(db, parent_column, parent_id)
+    return key_between(*await neighbour_keys(db, model, parent_column, parent_id, index))
+
+
+async def move_to_index(db: AsyncSession, node, parent_column, parent_id, index: int) -> bool:
+    """
+    Gives `node` a key that places it at `index` among its siblings. Only the
+    node's own row changes, and not even that if it is already in place.
+    Returns True when the key changed.
+    """
+    model = type(node)
+    node_id = getattr(node, model.__mapper__.primary_key[0].key)
+    await lock_siblings(db, parent_column, parent_id)
+    before, after = await neighbour_keys(db, model, parent_column, parent_id, index, exclude_id=node_id)
+    if (before is None or before < node.order_key) and (after is None or node.order_key < after):
+        return False
+    node.order_key = key_between(before, after)
+    return True
+
+
+async def rebalance(db: AsyncSession, model, parent_column, parent_id) -> None:
+    """Rewrites the order keys of one sibling list to short, evenly spaced values. Does not commit."""
+    primary_key = model.__mapper__.primary_key[0]
+    await lock_siblings(db, parent_column, parent_id)
+    ids = (await db.execute(
+        select(primary_key).where(parent_column == parent_id).order_by(model.order_key)
+    )).scalars().all()
+    if not ids:
+        return
+    # The (parent, order_key) constraint is deferred, so intermediate duplicates are fine.
+    await db.execute(
+        update(model),
+        [{primary_key.key: node_id, "order_key": key} for node_id, key in zip(ids, evenly_spaced_keys(len(ids)))],
+    )
+
+
+def needs_rebalance(key: str) -> bool:
+    return len(key) > MAX_KEY_LENGTH
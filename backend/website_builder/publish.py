@@ -0,0 +1,105 @@
+# website_builder/publish.py
+#
+# Compiles the editable builder tables into an immutable snapshot document.
+# The public site is served from the published snapshot, so edits stay
+# private until the owner publishes again.
+
+import gzip
+import json
+from collections import OrderedDict
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from cache import invalidate
+from models import Location
+from .models import Website, WebsiteSnapshot
+from .tree import load_website_tree
+from . import schemas
+
+# Documents smaller than this are stored as-is; gzip would barely help.
+COMPRESS_MIN_BYTES = 1024
+
+# Snapshots never change once written, so decoded documents can be kept per
+# worker without any invalidation. Keyed by snapshot_id.
+SNAPSHOT_CACHE_SIZE = 128
+_decoded_snapshots = OrderedDict()
+
+
+async def compile_document(db: AsyncSession, website_id) -> bytes:
+    """Serializes the website exactly as the public endpoint returns it."""
+    website = await load_website_tree(db, Website.website_id == website_id)
+    loc_q = await db.execute(
+        select(Location.location_id, Location.location_name)
+        .where(Location.restaurant_id == website["restaurant_id"])
+    )
+    locations = [{"location_id": location_id, "location_name": name} for location_id, name in loc_q]
+    return schemas.PublicWebsiteResponse(**website, locations=locations).model_dump_json().encode()
+
+
+async def publish_website(db: AsyncSession, website_id) -> WebsiteSnapshot:
+    """Stores a new snapshot version and points the website at it. Does not commit."""
+    # Concurrent publishes of the site queue here, so each reads the version the last one committed.
+    await db.execute(select(Website.website_id).where(Website.website_id == website_id).with_for_update())
+    document = await compile_document(db, website_id)
+    compressed = len(document) >= COMPRESS_MIN_BYTES
+    if compressed:
+        document = gzip.compress(document)
+
+    last_version = await db.scalar(
+        select(func.max(WebsiteSnapshot.version)).where(WebsiteSnapshot.website_id == website_id)
+    )
+    snapshot = WebsiteSnapshot(
+        website_id=website_id,
+        version=(last_version or 0) + 1,
+        document=document,
+        compressed=compressed,
+    )
+    db.add(snapshot)
+    await db.flush()
+
+    await set_published_snapshot(db, website_id, snapshot.snapshot_id)
+    return snapshot
+
+
+async def set_published_snapshot(db: AsyncSession, website_id, snapshot_id) -> None:
+    """Points the public site at a snapshot and evicts the cached site row on every worker. Does not commit."""
+    subdomain = await db.scalar(
+        update(Website).where(Website.website_id == website_id)
+        .values(published_snapshot_id=snapshot_id)
+        .returning(Website.subdomain)
+    )
+    await invalidate(db, "public_site", subdomain)
+
+
+async def get_published_document(db: AsyncSession, subdomain: str):
+    """
+    Returns (document, compressed) for the website's published snapshot,
+    or None when the website doesn't exist or has never been published.
+    """
+    row = (await db.execute(
+        select(WebsiteSnapshot.document, WebsiteSnapshot.compressed)
+        .join(Website, Website.published_snapshot_id == WebsiteSnapshot.snapshot_id)
+        .where(Website.subdomain == subdomain)
+    )).first()
+    return tuple(row) if row else None
+
+
+async def load_snapshot(db: AsyncSession, snapshot_id) -> dict:
+    """Returns the decoded snapshot document, reading it from the database at most once per worker."""
+    document = _decoded_snapshots.get(snapshot_id)
+    if document is not None:
+        _decoded_snapshots.move_to_end(snapshot_id)
+        return document
+
+    row = (await db.execute(
+        select(WebsiteSnapshot.document, WebsiteSnapshot.compressed).where(WebsiteSnapshot.snapshot_id == snapshot_id)
+    )).first()
+    raw, compressed = row
+    document = json.loads(gzip.decompress(raw) if compressed else raw)
+
+    _decoded_snapshots[snapshot_id] = document
+    if len(_decoded_snapshots) > SNAPSHOT_CACHE_SIZE:
+        _decoded_snapshots.popitem(last=False)
+    return document
@@ -0,0 +1,143 @@
+# website_builder/realtime.py
+#
+# Live collaboration: every builder mutation bumps the website's revision and
+# publishes a compact delta on the "builder_deltas" channel. Each worker fans
+# the deltas it hears out to the editor WebSockets it holds for that website,
+# so open editors patch their tree instead of re-downloading it.
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from fastapi import WebSocket
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from pubsub import listener, notify, MAX_PAYLOAD_BYTES
+from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "builder_deltas"
+# A client that falls this far behind is told to resync instead of being sent more deltas.
+CLIENT_QUEUE_SIZE = 256
+
+
+async def website_id_for(db: AsyncSession, model, node_id):
+    """Resolves the website a builder node belongs to with one joined query."""
+    if model is Website:
+        return node_id
+    if model is Page:
+        query = select(Page.website_id).where(Page.page_id == node_id)
+    elif model is Section:
+        query = select(Page.website_id).join(Section, Section.page_id == Page.page_id).where(Section.section_id == node_id)
+    elif model is Subsection:
+        query = select(Page.website_id).join(Section, Section.page_id == Page.page_id) \
+            .join(Subsection, Subsection.section_id == Section.section_id).where(Subsection.subsection_id == node_id)
+    elif model is Element:
+        query = select(Page.website_id).join(Section, Section.page_id == Page.page_id) \
+            .join(Subsection, Subsection.section_id == Section.section_id) \
+            .join(Element, Element.subsection_id == Subsection.subsection_id).where(Element.element_id == node_id)
+    elif model is Navbar:
+        query = select(Navbar.website_id).where(Navbar.navbar_id == node_id)
+    elif model is NavbarItem:
+        query = select(Navbar.website_id).join(NavbarItem, NavbarItem.navbar_id == Navbar.navbar_id).where(NavbarItem.item_id == node_id)
+    else:
+        raise ValueError(f"Not a builder model: {model!r}")
+    return await db.scalar(query)
+
+
+async def publish_delta(db: AsyncSession, website_id, delta: dict) -> int:
+    """
+    Bumps the website's revision and queues the delta for every editor of the
+    site. Runs inside the caller's transaction, so the delta only goes out if
+    the mutation commits, and revisions arrive in commit order per website.
+    Returns the new revision.
+    """
+    if website_id is None:
+        return 0
+    revision = await db.scalar(
+        update(Website).where(Website.website_id == website_id)
+        .values(revision=Website.revision + 1)
+        .returning(Website.revision)
+    )
+    message = {"website_id": str(website_id), "version": revision, **delta}
+    if len(json.dumps(message, default=str)) > MAX_PAYLOAD_BYTES:
+        # Too big for NOTIFY: tell editors to refetch instead.
+        message = {"website_id": str(website_id), "version": revision, "op": "resync"}
+    await notify(db, CHANNEL, message)
+    return revision
+
+
+class _Client:
+    def __init__(self, websocket: WebSocket, hold: bool = False):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._held = [] if hold else None
+        self.writer = asyncio.create_task(self._write())
+
+    def release(self, first: str, version: int) -> None:
+        """Sends `first`, then the deltas held since connecting that are newer than `version`."""
+        held, self._held = self._held or [], None
+        self.push(first)
+        for raw in held:
+            if json.loads(raw).get("version", version + 1) > version:
+                self.push(raw)
+
+    def push(self, raw: str) -> None:
+        if self._held is not None:
+            self._held.append(raw)
+            return
+        try:
+            self.queue.put_nowait(raw)
+        except asyncio.QueueFull:
+            # Drop the backlog; the client reloads the tree on "resync".
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(json.dumps({"op": "resync"}))
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                await self.websocket.send_text(await self.queue.get())
+        except Exception:
+            pass  # The receive loop notices the disconnect and unregisters us.
+
+
+class SiteHub:
+    """Per-worker registry of editor sockets, keyed by website id."""
+
+    def __init__(self):
+        self._clients = defaultdict(set)
+
+    def connect(self, website_id, websocket: WebSocket, hold: bool = False) -> _Client:
+        """Registers an editor; with `hold`, its deltas wait for `client.release()`."""
+        client = _Client(websocket, hold)
+        self._clients[str(website_id)].add(client)
+        return client
+
+    def disconnect(self, website_id, client: _Client) -> None:
+        client.writer.cancel()
+        clients = self._clients.get(str(website_id))
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self._clients[str(website_id)]
+
+    def handle_notification(self, payload: str) -> None:
+        website_id = json.loads(payload)["website_id"]
+        for client in self._clients.get(website_id, ()):
+            client.push(payload)
+
+    def resync_all(self) -> None:
+        # Deltas may have been missed while the listener was reconnecting.
+        for clients in self._clients.values():
+            for client in clients:
+                client.push(json.dumps({"op": "resync"}))
+
+
+hub = SiteHub()
+listener.subscribe(CHANNEL, hub.handle_notification)
+listener.on_reconnect(hub.resync_all)
@@ -1,19 +1,35 @@
 # website_builder/router.py
-from fastapi import APIRouter, Depends, HTTPException, status
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.attributes import flag_modified
 from typing import List
+from pydantic import TypeAdapter
 
-from database import get_db
+from database import get_db, AsyncSessionLocal
+from cache import local_cache
 from auth.auth_handler import get_current_active_user
 from models import User, RestaurantOwner,Location
-from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem
+from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem, WebsiteSnapshot, SiteTemplate
 from . import schemas
+from .tree import load_website_tree, load_page_tree
+from .publish import publish_website, set_published_snapshot, get_published_document, load_snapshot
+from .ordering import key_between, key_for_index, lock_siblings, move_to_index, needs_rebalance, rebalance
+from .realtime import hub, publish_delta, website_id_for
+from .templates import DEFAULT_SITE, compile_website, instantiate_site, node_count
 
 router = APIRouter(prefix="/builder", tags=["Website Builder v2"])
+logger = logging.getLogger(__name__)
 
 # --- Helper function for ownership check ---
 async def get_website_and_check_ownership(website_id: UUID, current_user: User, db: AsyncSession) -> Website:
@@ -31,77 +47,248 @@ async def get_website_and_check_ownership(website_id: UUID, current_user: User,
 @router.get("/website", response_model=schemas.WebsiteResponse)
 async def get_my_website(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     """Gets the current user's website with all nested data."""
-    result = await db.execute(
-        select(Website).options(
-            selectinload(Website.pages).selectinload(Page.sections).selectinload(Section.subsections).selectinload(Subsection.elements),
-            selectinload(Website.navbar).selectinload(Navbar.items)
-        ).join(RestaurantOwner).where(RestaurantOwner.user_id == current_user.id)
+    website = await load_website_tree(
+        db,
+        Website.restaurant_id == select(RestaurantOwner.restaurant_id).where(RestaurantOwner.user_id == current_user.id).scalar_subquery(),
     )
-    website = result.scalars().first()
     if not website:
         raise HTTPException(status_code=404, detail="No website found for this user.")
     return website
 
-# --- THIS IS THE CORRECTED ENDPOINT ---
-@router.post("/website", response_model=schemas.WebsiteResponse, status_code=status.HTTP_201_CREATED)
-async def create_website(website_data: schemas.WebsiteCreate, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
-    """Creates a new website with default page, section, subsection, and navbar."""
+@router.get("/website/skeleton", response_model=schemas.WebsiteSkeletonResponse)
+async def get_my_website_skeleton(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Gets the current user's website with page titles/slugs and the navbar, but no page content."""
+    website = await load_website_tree(
+        db,
+        Website.restaurant_id == select(RestaurantOwner.restaurant_id).where(RestaurantOwner.user_id == current_user.id).scalar_subquery(),
+        skeleton=True,
+    )
+    if not website:
+        raise HTTPException(status_code=404, detail="No website found for this user.")
+    return website
+
+# --- Ordering helpers ---
+# Each orderable node type and the column holding its parent's id.
+ORDERED_NODES = {
+    "sections": (Section, Section.page_id),
+    "subsections": (Subsection, Subsection.section_id),
+    "elements": (Element, Element.subsection_id),
+    "navbar-items": (NavbarItem, NavbarItem.navbar_id),
+}
+
+async def rebalance_siblings(model, parent_column, parent_id):
+    async with AsyncSessionLocal() as db:
+        await rebalance(db, model, parent_column, parent_id)
+        await db.commit()
+
+def schedule_rebalance(background_tasks: BackgroundTasks, node, parent_column):
+    """Respaces a sibling list after the response is sent, once its keys get long."""
+    if needs_rebalance(node.order_key):
+        background_tasks.add_task(rebalance_siblings, type(node), parent_column, getattr(node, parent_column.key))
+
+# --- Live editor deltas ---
+async def broadcast(db: AsyncSession, model, node_id, op: str, node=None, website_id=None):
+    """
+    Queues a delta for the live editors of the node's website (see realtime.py).
+    `node` is sent column-only, without children. Call before commit, and for
+    deletes before the row is gone (or pass `website_id`).
+    """
+    if website_id is None:
+        website_id = await website_id_for(db, model, node_id)
+    delta = {"op": op, "kind": model.__tablename__, "id": str(node_id)}
+    if node is not None:
+        delta["node"] = {attr.key: getattr(node, attr.key) for attr in model.__mapper__.column_attrs}
+    await publish_delta(db, website_id, delta)
+
+async def get_my_website_id(current_user: User, db: AsyncSession) -> UUID:
+    website_id = await db.scalar(
+        select(Website.website_id).join(RestaurantOwner).where(RestaurantOwner.user_id == current_user.id)
+    )
+    if not website_id:
+        raise HTTPException(status_code=404, detail="No website found for this user.")
+    return website_id
+
+def _my_restaurant_ids(current_user: User):
+    return select(RestaurantOwner.restaurant_id).where(RestaurantOwner.user_id == current_user.id)
+
+async def _create_website_from(db: AsyncSession, current_user: User, subdomain, document: dict):
+    """Creates the owner's website and writes `document` (see templates.py) into it."""
     owner = await db.scalar(select(RestaurantOwner).where(RestaurantOwner.user_id == current_user.id))
     if not owner: raise HTTPException(status_code=404, detail="Restaurant owner profile not found.")
-    
+
     existing_website = await db.scalar(select(Website).where(Website.restaurant_id == owner.restaurant_id))
     if existing_website: raise HTTPException(status_code=400, detail="A website already exists for this user.")
 
-    # Create all the objects
-    new_website = Website(restaurant_id=owner.restaurant_id, subdomain=website_data.subdomain)
-    new_navbar = Navbar(website=new_website)
-    home_page = Page(website=new_website, title="Home", slug="/")
-    section = Section(page=home_page, section_type="hero", position=1, properties={})
-    subsection = Subsection(section=section, position=1, properties={"flexDirection": "column", "alignItems": "center"})
-    home_nav_item = NavbarItem(navbar=new_navbar, text="Home", link_url="/", position=1)
-    
-    db.add_all([new_website, new_navbar, home_page, section, subsection, home_nav_item])
+    new_website = Website(restaurant_id=owner.restaurant_id, subdomain=subdomain)
+    db.add(new_website)
+    await db.flush()
+    await instantiate_site(db, new_website.website_id, document)
     await db.commit()
-    
+
     # THE FIX: After committing, re-fetch the website using the comprehensive query.
     # This ensures the returned object is fully loaded and matches the response model perfectly.
-    created_website = await get_my_website(current_user, db)
-    
-    return created_website
+    return await get_my_website(current_user, db)
+
+# --- THIS IS THE CORRECTED ENDPOINT ---
+@router.post("/website", response_model=schemas.WebsiteResponse, status_code=status.HTTP_201_CREATED)
+async def create_website(website_data: schemas.WebsiteCreate, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Creates a new website with default page, section, subsection, and navbar."""
+    return await _create_website_from(db, current_user, website_data.subdomain, DEFAULT_SITE)
+
+@router.post("/website/clone", response_model=schemas.WebsiteResponse, status_code=status.HTTP_201_CREATED)
+async def clone_website(clone_data: schemas.WebsiteCloneRequest, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Creates the website from a shared template or one of your own, in one transaction."""
+    document = await db.scalar(
+        select(SiteTemplate.document).where(
+            SiteTemplate.template_id == clone_data.template_id,
+            or_(SiteTemplate.restaurant_id.is_(None), SiteTemplate.restaurant_id.in_(_my_restaurant_ids(current_user))),
+        )
+    )
+    if document is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return await _create_website_from(db, current_user, clone_data.subdomain, document)
+
+# --- Template Endpoints ---
+@router.get("/templates", response_model=List[schemas.SiteTemplateResponse])
+async def list_templates(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Lists the shared templates and your own. Template documents are not loaded."""
+    result = await db.execute(
+        select(SiteTemplate.template_id, SiteTemplate.name, SiteTemplate.description, SiteTemplate.restaurant_id,
+               SiteTemplate.node_count, SiteTemplate.created_at)
+        .where(or_(SiteTemplate.restaurant_id.is_(None), SiteTemplate.restaurant_id.in_(_my_restaurant_ids(current_user))))
+        .order_by(SiteTemplate.name)
+    )
+    return [schemas.SiteTemplateResponse(**row._mapping) for row in result]
+
+@router.post("/templates", response_model=schemas.SiteTemplateResponse, status_code=status.HTTP_201_CREATED)
+async def create_template(template_data: schemas.SiteTemplateCreate, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Saves the current draft of your website as a private template."""
+    website_id = await get_my_website_id(current_user, db)
+    website = await db.get(Website, website_id)
+    document = await compile_website(db, website_id)
+    template = SiteTemplate(**template_data.model_dump(), restaurant_id=website.restaurant_id, document=document, node_count=node_count(document))
+    db.add(template)
+    await db.commit()
+    await db.refresh(template)
+    return template
+
+@router.delete("/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_template(template_id: UUID, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Deletes one of your own templates; shared templates can't be deleted here."""
+    result = await db.execute(
+        delete(SiteTemplate)
+        .where(SiteTemplate.template_id == template_id, SiteTemplate.restaurant_id.in_(_my_restaurant_ids(current_user)))
+        .returning(SiteTemplate.template_id)
+    )
+    if result.first() is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    await db.commit()
+
+# --- Publishing Endpoints ---
+@router.post("/website/publish", response_model=schemas.WebsiteVersionResponse, status_code=status.HTTP_201_CREATED)
+async def publish_my_website(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Compiles the current draft into a new immutable version and makes it public."""
+    website_id = await get_my_website_id(current_user, db)
+    snapshot = await publish_website(db, website_id)
+    await db.commit()
+    await db.refresh(snapshot, ["created_at"])
+    return schemas.WebsiteVersionResponse(
+        snapshot_id=snapshot.snapshot_id, version=snapshot.version, created_at=snapshot.created_at, is_published=True
+    )
+
+@router.get("/website/versions", response_model=List[schemas.WebsiteVersionResponse])
+async def list_website_versions(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Lists published versions, newest first. The document itself is never loaded here."""
+    website_id = await get_my_website_id(current_user, db)
+    result = await db.execute(
+        select(WebsiteSnapshot.snapshot_id, WebsiteSnapshot.version, WebsiteSnapshot.created_at,
+               (Website.published_snapshot_id == WebsiteSnapshot.snapshot_id).label("is_published"))
+        .join(Website, Website.website_id == WebsiteSnapshot.website_id)
+        .where(WebsiteSnapshot.website_id == website_id)
+        .order_by(WebsiteSnapshot.version.desc())
+    )
+    return [schemas.WebsiteVersionResponse(**row._mapping) for row in result]
+
+@router.post("/website/versions/{version}/rollback", response_model=schemas.WebsiteVersionResponse)
+async def rollback_website_version(version: int, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    """Makes an earlier version public again by moving the published pointer."""
+    website_id = await get_my_website_id(current_user, db)
+    result = await db.execute(
+        select(WebsiteSnapshot.snapshot_id, WebsiteSnapshot.version, WebsiteSnapshot.created_at)
+        .where(WebsiteSnapshot.website_id == website_id, WebsiteSnapshot.version == version)
+    )
+    snapshot = result.first()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    await set_published_snapshot(db, website_id, snapshot.snapshot_id)
+    await db.commit()
+    return schemas.WebsiteVersionResponse(**snapshot._mapping, is_published=True)
 
 # --- Page Endpoints ---
 @router.post("/pages", response_model=schemas.PageResponse, status_code=status.HTTP_201_CREATED)
 async def create_page(page_data: schemas.PageCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    # THE FIX: Eagerly load the navbar and its items to prevent the async error
-    result = await db.execute(
-        select(Website)
-        .options(selectinload(Website.navbar).selectinload(Navbar.items))
-        .join(RestaurantOwner)
-        .where(Website.website_id == page_data.website_id, RestaurantOwner.user_id == current_user.id)
-    )
-    website = result.scalars().first()
-    if not website:
-        raise HTTPException(status_code=404, detail="Website not found or you do not have permission.")
+    await get_website_and_check_ownership(page_data.website_id, current_user, db)
 
-    if not website.navbar: 
+    navbar_id = await db.scalar(select(Navbar.navbar_id).where(Navbar.website_id == page_data.website_id))
+    if not navbar_id:
         raise HTTPException(status_code=404, detail="Navbar not found.")
-    
+
     new_page = Page(title=page_data.title, slug=page_data.slug, website_id=page_data.website_id)
     db.add(new_page)
-    
-    # This line is now safe because website.navbar.items is pre-loaded
-    new_navbar_item = NavbarItem(navbar_id=website.navbar.navbar_id, text=new_page.title, link_url=new_page.slug, position=len(website.navbar.items) + 1)
+
+    # Append the page's navbar item after the last one; the other items are untouched.
+    await lock_siblings(db, NavbarItem.navbar_id, navbar_id)
+    item_count, last_key = (await db.execute(
+        select(func.count(), func.max(NavbarItem.order_key)).where(NavbarItem.navbar_id == navbar_id)
+    )).one()
+    new_navbar_item = NavbarItem(navbar_id=navbar_id, text=new_page.title, link_url=new_page.slug,
+                                 position=item_count + 1, order_key=key_between(last_key, None))
     db.add(new_navbar_item)
+    await db.flush()
+    await broadcast(db, Page, new_page.page_id, "upsert", new_page, website_id=page_data.website_id)
+    await broadcast(db, NavbarItem, new_navbar_item.item_id, "upsert", new_navbar_item, website_id=page_data.website_id)
     
     await db.commit()
     # await db.refresh(new_page)
     return new_page
 
+@router.get("/pages/{page_id}/tree", response_model=schemas.FullPageResponse)
+async def get_page_tree(page_id: UUID, response: Response, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    """
+    Gets one page with its sections, subsections and elements.
+    The pages before and after it in the navbar are advertised as prefetch links.
+    """
+    website_id = await get_my_website_id(current_user, db)
+    page = await load_page_tree(db, Page.page_id == page_id, Page.website_id == website_id)
+    if not page:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    result = await db.execute(
+        select(Page.page_id)
+        .join(Navbar, Navbar.website_id == Page.website_id)
+        .join(NavbarItem, (NavbarItem.navbar_id == Navbar.navbar_id) & (NavbarItem.link_url == Page.slug))
+        .where(Page.website_id == website_id)
+        .order_by(NavbarItem.order_key)
+    )
+    ordered = result.scalars().all()
+    if page_id in ordered:
+        index = ordered.index(page_id)
+        adjacent = ordered[max(index - 1, 0):index] + ordered[index + 1:index + 2]
+        if adjacent:
+            response.headers["Link"] = ", ".join(f"</builder/pages/{pid}/tree>; rel=prefetch" for pid in adjacent)
+    return page
+
 # --- Section Endpoints ---
 @router.post("/sections", response_model=schemas.SectionResponse, status_code=status.HTTP_201_CREATED)
-async def create_section(section_data: schemas.SectionCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_section(section_data: schemas.SectionCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    # `position` is the index to insert at among the page's sections.
     new_section = Section(**section_data.model_dump())
+    new_section.order_key = await key_for_index(db, Section, Section.page_id, section_data.page_id, section_data.position)
     db.add(new_section)
+    schedule_rebalance(background_tasks, new_section, Section.page_id)
+    await db.flush()
+    await broadcast(db, Section, new_section.section_id, "upsert", new_section)
     await db.commit()
     
     # UPDATED: Re-fetch the created section with its relationships
@@ -111,7 +298,7 @@ async def create_section(section_data: schemas.SectionCreate, db: AsyncSession =
     return result.scalars().first()
 
 @router.put("/sections/{section_id}", response_model=schemas.SectionResponse)
-async def update_section(section_id: UUID, section_data: schemas.SectionUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def update_section(section_id: UUID, section_data: schemas.SectionUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # THE FIX: Eagerly load the 'subsections' and their 'elements' to prevent the async error
     result = await db.execute(
         select(Section).options(
@@ -126,24 +313,32 @@ async def update_section(section_id: UUID, section_data: schemas.SectionUpdate,
         setattr(db_section, key, value)
         if key == "properties":
             flag_modified(db_section, "properties")
+        if key == "position" and value is not None:
+            await move_to_index(db, db_section, Section.page_id, db_section.page_id, value)
+            schedule_rebalance(background_tasks, db_section, Section.page_id)
 
+    await broadcast(db, Section, section_id, "upsert", db_section)
     await db.commit()
     # await db.refresh(db_section)
     return db_section
 
 @router.delete("/sections/{section_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_section(section_id: UUID, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_section = await db.get(Section, section_id)
-    if db_section:
-        await db.delete(db_section)
-        await db.commit()
+    await broadcast(db, Section, section_id, "delete")
+    # Subsections and elements go with it via ON DELETE CASCADE, in one statement.
+    await db.execute(delete(Section).where(Section.section_id == section_id))
+    await db.commit()
     return
 
 # --- Subsection Endpoint ---
 @router.post("/subsections", response_model=schemas.SubsectionResponse, status_code=201)
-async def create_subsection(subsection_data: schemas.SubsectionCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_subsection(subsection_data: schemas.SubsectionCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     new_subsection = Subsection(**subsection_data.model_dump())
+    new_subsection.order_key = await key_for_index(db, Subsection, Subsection.section_id, subsection_data.section_id, subsection_data.position)
     db.add(new_subsection)
+    schedule_rebalance(background_tasks, new_subsection, Subsection.section_id)
+    await db.flush()
+    await broadcast(db, Subsection, new_subsection.subsection_id, "upsert", new_subsection)
     await db.commit()
     
     # UPDATED: Re-fetch the created subsection with its relationships to fix the Greenlet error
@@ -153,7 +348,7 @@ async def create_subsection(subsection_data: schemas.SubsectionCreate, db: Async
     return result.scalars().first()
 
 @router.put("/subsections/{subsection_id}", response_model=schemas.SubsectionResponse)
-async def update_subsection(subsection_id: UUID, subsection_data: schemas.SubsectionUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def update_subsection(subsection_id: UUID, subsection_data: schemas.SubsectionUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # THE FIX: Eagerly load the 'elements' relationship
     result = await db.execute(
         select(Subsection).options(selectinload(Subsection.elements)).where(Subsection.subsection_id == subsection_id)
@@ -166,31 +361,38 @@ async def update_subsection(subsection_id: UUID, subsection_data: schemas.Subsec
         setattr(db_subsection, key, value)
         if key == "properties":
             flag_modified(db_subsection, "properties")
+        if key == "position" and value is not None:
+            await move_to_index(db, db_subsection, Subsection.section_id, db_subsection.section_id, value)
+            schedule_rebalance(background_tasks, db_subsection, Subsection.section_id)
 
+    await broadcast(db, Subsection, subsection_id, "upsert", db_subsection)
     await db.commit()
     # await db.refresh(db_subsection)
     return db_subsection
 
 @router.delete("/subsections/{subsection_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_subsection(subsection_id: UUID, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_subsection = await db.get(Subsection, subsection_id)
-    if db_subsection:
-        await db.delete(db_subsection)
-        await db.commit()
+    await broadcast(db, Subsection, subsection_id, "delete")
+    await db.execute(delete(Subsection).where(Subsection.subsection_id == subsection_id))
+    await db.commit()
     return
 
 
 # --- Element Endpoints ---
 @router.post("/elements", response_model=schemas.ElementResponse, status_code=201)
-async def create_element(element_data: schemas.ElementCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_element(element_data: schemas.ElementCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     new_element = Element(**element_data.model_dump())
+    new_element.order_key = await key_for_index(db, Element, Element.subsection_id, element_data.subsection_id, element_data.position)
     db.add(new_element)
+    schedule_rebalance(background_tasks, new_element, Element.subsection_id)
+    await db.flush()
+    await broadcast(db, Element, new_element.element_id, "upsert", new_element)
     await db.commit()
     # await db.refresh(new_element)
     return new_element
 
 @router.put("/elements/{element_id}", response_model=schemas.ElementResponse)
-async def update_element(element_id: UUID, element_data: schemas.ElementUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def update_element(element_id: UUID, element_data: schemas.ElementUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     db_element = await db.get(Element, element_id)
     if not db_element: raise HTTPException(status_code=404, detail="Element not found")
 
@@ -200,7 +402,10 @@ async def update_element(element_id: UUID, element_data: schemas.ElementUpdate,
 
     if element_data.position is not None:
         db_element.position = element_data.position
+        await move_to_index(db, db_element, Element.subsection_id, db_element.subsection_id, element_data.position)
+        schedule_rebalance(background_tasks, db_element, Element.subsection_id)
     
+    await broadcast(db, Element, element_id, "upsert", db_element)
     await db.commit()
     # await db.refresh(db_element)
     return db_element
@@ -209,6 +414,7 @@ async def update_element(element_id: UUID, element_data: schemas.ElementUpdate,
 async def delete_element(element_id: UUID, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     db_element = await db.get(Element, element_id)
     if db_element:
+        await broadcast(db, Element, element_id, "delete")
         await db.delete(db_element)
         await db.commit()
     return
@@ -229,22 +435,27 @@ async def update_navbar(navbar_id: UUID, navbar_data: schemas.NavbarUpdate, db:
         if key == "properties":
             flag_modified(db_navbar, "properties")
 
+    await broadcast(db, Navbar, navbar_id, "upsert", db_navbar, website_id=db_navbar.website_id)
     await db.commit()
     # await db.refresh(db_navbar)
     return db_navbar
 
 # --- NEW: Navbar Item Endpoints ---
 @router.post("/navbar-items", response_model=schemas.NavbarItemResponse, status_code=status.HTTP_201_CREATED)
-async def create_navbar_item(item_data: schemas.NavbarItemCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_navbar_item(item_data: schemas.NavbarItemCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # A proper check would ensure the user owns the navbar's parent website
     new_item = NavbarItem(**item_data.model_dump())
+    new_item.order_key = await key_for_index(db, NavbarItem, NavbarItem.navbar_id, item_data.navbar_id, item_data.position)
     db.add(new_item)
+    schedule_rebalance(background_tasks, new_item, NavbarItem.navbar_id)
+    await db.flush()
+    await broadcast(db, NavbarItem, new_item.item_id, "upsert", new_item)
     await db.commit()
     # await db.refresh(new_item)
     return new_item
 
 @router.put("/navbar-items/{item_id}", response_model=schemas.NavbarItemResponse)
-async def update_navbar_item(item_id: UUID, item_data: schemas.NavbarItemUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def update_navbar_item(item_id: UUID, item_data: schemas.NavbarItemUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     """
     Updates a navbar item and also finds and updates the corresponding page.
     """
@@ -252,6 +463,7 @@ async def update_navbar_item(item_id: UUID, item_data: schemas.NavbarItemUpdate,
     if not db_item:
         raise HTTPException(status_code=404, detail="Navbar item not found")
 
+    website_id = await website_id_for(db, NavbarItem, item_id)
     # Store the old link_url to find the associated page
     old_link_url = db_item.link_url
 
@@ -259,17 +471,22 @@ async def update_navbar_item(item_id: UUID, item_data: schemas.NavbarItemUpdate,
     update_data = item_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_item, key, value)
+        if key == "position" and value is not None:
+            await move_to_index(db, db_item, NavbarItem.navbar_id, db_item.navbar_id, value)
+            schedule_rebalance(background_tasks, db_item, NavbarItem.navbar_id)
 
-    # Find the page that corresponds to the OLD navbar link
+    # Find the page on the same website that corresponds to the OLD navbar link
     if old_link_url:
-        result = await db.execute(select(Page).where(Page.slug == old_link_url))
+        result = await db.execute(select(Page).where(Page.slug == old_link_url, Page.website_id == website_id))
         page_to_update = result.scalars().first()
         
         # If a page is found, update its title and slug to match the new navbar item
         if page_to_update:
             page_to_update.title = db_item.text
             page_to_update.slug = db_item.link_url
+            await broadcast(db, Page, page_to_update.page_id, "upsert", page_to_update, website_id=website_id)
 
+    await broadcast(db, NavbarItem, item_id, "upsert", db_item, website_id=website_id)
     await db.commit()
     await db.refresh(db_item)
     return db_item
@@ -284,53 +501,271 @@ async def delete_navbar_item(item_id: UUID, db: AsyncSession = Depends(get_db),
         # If it's already deleted, just return success
         return
 
-    # Find the page that corresponds to the navbar link
+    website_id = await website_id_for(db, NavbarItem, item_id)
+
+    # Delete the page that corresponds to the navbar link on the same website.
+    # Its sections, subsections and elements are removed by the database cascade.
     if db_item.link_url:
-        result = await db.execute(select(Page).where(Page.slug == db_item.link_url))
-        page_to_delete = result.scalars().first()
-        
-        # If a page is found, delete it
-        if page_to_delete:
-            await db.delete(page_to_delete)
+        deleted_pages = await db.execute(
+            delete(Page).where(
+                Page.slug == db_item.link_url,
+                Page.website_id == website_id,
+            ).returning(Page.page_id)
+        )
+        for page_id in deleted_pages.scalars().all():
+            await broadcast(db, Page, page_id, "delete", website_id=website_id)
 
     # Delete the navbar item itself
-    await db.delete(db_item)
+    await broadcast(db, NavbarItem, item_id, "delete", website_id=website_id)
+    await db.execute(delete(NavbarItem).where(NavbarItem.item_id == item_id))
     await db.commit()
     return
 
 
+# --- Move Endpoint ---
+@router.put("/{kind}/{node_id}/move", response_model=schemas.MoveResponse)
+async def move_node(kind: str, node_id: UUID, move: schemas.MoveRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    """
+    Moves a section, subsection, element or navbar item between two siblings.
+    Only the moved row is written.
+    """
+    if kind not in ORDERED_NODES:
+        raise HTTPException(status_code=404, detail="Unknown node type")
+    model, parent_column = ORDERED_NODES[kind]
+
+    node = await db.get(model, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    try:
+        node.order_key = key_between(move.after_key, move.before_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await broadcast(db, model, node_id, "upsert", node)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # after_key/before_key weren't adjacent and the new key is already taken.
+        raise HTTPException(status_code=409, detail="Order keys are not adjacent siblings")
+    schedule_rebalance(background_tasks, node, parent_column)
+    return {"order_key": node.order_key}
+
+
 @router.get("/public/{subdomain}", response_model=schemas.PublicWebsiteResponse)
 async def get_public_website_by_subdomain(
     subdomain: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ):
-    # 1) fetch the site + all its pages, sections, subsections, etc.
-    result = await db.execute(
-        select(Website)
-        .options(
-            selectinload(Website.pages)
-                .selectinload(Page.sections)
-                .selectinload(Section.subsections)
-                .selectinload(Subsection.elements),
-            selectinload(Website.navbar)
-                .selectinload(Navbar.items),
-            # we’ll fetch locations separately
-        )
-        .where(Website.subdomain == subdomain)
-    )
-    website: Website = result.scalars().first()
+    # Published sites are served straight from their snapshot row, already serialized.
+    published = await get_published_document(db, subdomain)
+    if published:
+        document, compressed = published
+        headers = {"Vary": "Accept-Encoding"}
+        if compressed:
+            if "gzip" in request.headers.get("accept-encoding", ""):
+                headers["Content-Encoding"] = "gzip"
+            else:
+                document = gzip.decompress(document)
+        return Response(content=document, media_type="application/json", headers=headers)
+
+    # Never published: fall back to rendering the live draft.
+    # 1) fetch the site + all its pages, sections, subsections, etc. in one tree query
+    website = await load_website_tree(db, Website.subdomain == subdomain)
     if not website:
         raise HTTPException(status_code=404, detail="Website not found.")
 
     # 2) now fetch all locations for that restaurant
     loc_q = await db.execute(
-        select(Location)
-        .where(Location.restaurant_id == website.restaurant_id)
+        select(Location.location_id, Location.location_name)
+        .where(Location.restaurant_id == website["restaurant_id"])
     )
-    location_list = loc_q.scalars().all()
+    location_list = [{"location_id": location_id, "location_name": name} for location_id, name in loc_q]
 
     # 3) return a PublicWebsiteResponse, pydantic will pick up all fields + our new locations
     return schemas.PublicWebsiteResponse(
-        **website.__dict__,      # all the fields from WebsiteResponse
+        **website,               # all the fields from WebsiteResponse
         locations=location_list  # our new list of LocationResponse
     )
+
+
+# --- Public per-part Endpoints ---
+# A storefront only needs the page it landed on plus the shared navbar and
+# locations. Each part is served separately with its own ETag so browsers and
+# CDNs can revalidate them independently.
+
+_locations_adapter = TypeAdapter(List[schemas.LocationResponse])
+# (website_id, restaurant_id, published_snapshot_id) by subdomain.
+public_site_cache = local_cache("public_site")
+
+def _cacheable_json(request: Request, body: bytes) -> Response:
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _get_public_website_row(subdomain: str, db: AsyncSession):
+    async def load_row():
+        return (await db.execute(
+            select(Website.website_id, Website.restaurant_id, Website.published_snapshot_id)
+            .where(Website.subdomain == subdomain)
+        )).first()
+
+    # Evicted by set_published_snapshot whenever the published version changes.
+    row = await public_site_cache.get_or_load(subdomain, load_row)
+    if not row:
+        raise HTTPException(status_code=404, detail="Website not found.")
+    return row
+
+@router.get("/public/{subdomain}/pages/{slug:path}", response_model=schemas.FullPageResponse)
+async def get_public_page(subdomain: str, slug: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Gets a single public page by slug; an empty slug is the home page."""
+    website = await _get_public_website_row(subdomain, db)
+    bare_slug = slug.strip("/")
+    candidates = {"/" + bare_slug, bare_slug}
+
+    if website.published_snapshot_id:
+        document = await load_snapshot(db, website.published_snapshot_id)
+        page = next((p for p in document["pages"] if p["slug"] in candidates), None)
+    else:
+        page = await load_page_tree(db, Page.website_id == website.website_id, Page.slug.in_(candidates))
+    if not page:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    return _cacheable_json(request, schemas.FullPageResponse.model_validate(page).model_dump_json().encode())
+
+@router.get("/public/{subdomain}/navbar", response_model=schemas.NavbarResponse)
+async def get_public_navbar(subdomain: str, request: Request, db: AsyncSession = Depends(get_db)):
+    website = await _get_public_website_row(subdomain, db)
+
+    if website.published_snapshot_id:
+        navbar = (await load_snapshot(db, website.published_snapshot_id))["navbar"]
+    else:
+        navbar = (await load_website_tree(db, Website.website_id == website.website_id, skeleton=True))["navbar"]
+    if not navbar:
+        raise HTTPException(status_code=404, detail="Navbar not found.")
+
+    return _cacheable_json(request, schemas.NavbarResponse.model_validate(navbar).model_dump_json().encode())
+
+@router.get("/public/{subdomain}/locations", response_model=List[schemas.LocationResponse])
+async def get_public_locations(subdomain: str, request: Request, db: AsyncSession = Depends(get_db)):
+    website = await _get_public_website_row(subdomain, db)
+
+    if website.published_snapshot_id:
+        locations = (await load_snapshot(db, website.published_snapshot_id))["locations"]
+    else:
+        loc_q = await db.execute(
+            select(Location.location_id, Location.location_name)
+            .where(Location.restaurant_id == website.restaurant_id)
+        )
+        locations = [{"location_id": location_id, "location_name": name} for location_id, name in loc_q]
+
+    return _cacheable_json(request, _locations_adapter.dump_json(_locations_adapter.validate_python(locations)))
+
+
+# --- Live Collaboration ---
+# Editors open one socket per website. They receive {"op": "hello", "version": n}
+# and then every delta for the site, and may send mutations over the same socket:
+#     {"request_id": "...", "op": "create" | "update" | "delete" | "move",
+#      "kind": "sections" | "subsections" | "elements" | "navbar-items" | "navbars",
+#      "id": "<node id, except for create>", "data": {...}}
+# Each mutation runs through the matching HTTP handler and is answered with
+# {"request_id": ..., "ok": true, "id": ...} or {"request_id": ..., "ok": false, "error": ...}.
+
+SOCKET_CREATE = {
+    "sections": (create_section, schemas.SectionCreate, Page, "page_id"),
+    "subsections": (create_subsection, schemas.SubsectionCreate, Section, "section_id"),
+    "elements": (create_element, schemas.ElementCreate, Subsection, "subsection_id"),
+    "navbar-items": (create_navbar_item, schemas.NavbarItemCreate, Navbar, "navbar_id"),
+}
+SOCKET_UPDATE = {
+    "sections": (update_section, schemas.SectionUpdate, Section),
+    "subsections": (update_subsection, schemas.SubsectionUpdate, Subsection),
+    "elements": (update_element, schemas.ElementUpdate, Element),
+    "navbar-items": (update_navbar_item, schemas.NavbarItemUpdate, NavbarItem),
+    "navbars": (update_navbar, schemas.NavbarUpdate, Navbar),
+}
+SOCKET_DELETE = {
+    "sections": (delete_section, Section),
+    "subsections": (delete_subsection, Subsection),
+    "elements": (delete_element, Element),
+    "navbar-items": (delete_navbar_item, NavbarItem),
+}
+
+def _handler_kwargs(handler, db, current_user, background_tasks):
+    kwargs = {"db": db, "current_user": current_user}
+    if "background_tasks" in inspect.signature(handler).parameters:
+        kwargs["background_tasks"] = background_tasks
+    return kwargs
+
+async def _ensure_same_website(db: AsyncSession, model, node_id, website_id):
+    if await website_id_for(db, model, node_id) != website_id:
+        raise HTTPException(status_code=404, detail="Not found on this website")
+
+async def apply_socket_mutation(message: dict, website_id: UUID, current_user: User):
+    op, kind, data = message.get("op"), message.get("kind"), message.get("data") or {}
+    background_tasks = BackgroundTasks()
+    async with AsyncSessionLocal() as db:
+        try:
+            if op == "create" and kind in SOCKET_CREATE:
+                handler, schema, parent_model, parent_field = SOCKET_CREATE[kind]
+                payload = schema(**data)
+                await _ensure_same_website(db, parent_model, getattr(payload, parent_field), website_id)
+                result = await handler(payload, **_handler_kwargs(handler, db, current_user, background_tasks))
+            elif op == "update" and kind in SOCKET_UPDATE:
+                handler, schema, model = SOCKET_UPDATE[kind]
+                node_id = UUID(message["id"])
+                await _ensure_same_website(db, model, node_id, website_id)
+                result = await handler(node_id, schema(**data), **_handler_kwargs(handler, db, current_user, background_tasks))
+            elif op == "delete" and kind in SOCKET_DELETE:
+                handler, model = SOCKET_DELETE[kind]
+                node_id = UUID(message["id"])
+                await _ensure_same_website(db, model, node_id, website_id)
+                result = await handler(node_id, **_handler_kwargs(handler, db, current_user, background_tasks))
+            elif op == "move" and kind in ORDERED_NODES:
+                node_id = UUID(message["id"])
+                await _ensure_same_website(db, ORDERED_NODES[kind][0], node_id, website_id)
+                result = await move_node(kind, node_id, schemas.MoveRequest(**data), background_tasks, db=db, current_user=current_user)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unsupported operation {op!r} on {kind!r}")
+        except SQLAlchemyError:
+            await db.rollback()
+            raise
+    await background_tasks()
+
+    result_id = None
+    if hasattr(result, "__mapper__"):
+        result_id = str(getattr(result, result.__mapper__.primary_key[0].key))
+    return result_id
+
+@router.websocket("/ws")
+async def builder_socket(websocket: WebSocket, current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    website_id = await get_my_website_id(current_user, db)
+    await websocket.accept()
+    # Listen before reading the revision, so a delta committed in between is either
+    # counted in it or held and sent after the hello.
+    client = hub.connect(website_id, websocket, hold=True)
+    try:
+        revision = await db.scalar(select(Website.revision).where(Website.website_id == website_id))
+        # Don't hold a pooled connection for the socket's lifetime; each mutation opens its own session.
+        await db.close()
+        client.release(json.dumps({"op": "hello", "version": revision}), revision)
+        while True:
+            message = await websocket.receive_json()
+            reply = {"request_id": message.get("request_id")}
+            try:
+                reply.update(ok=True, id=await apply_socket_mutation(message, website_id, current_user))
+            except HTTPException as e:
+                reply.update(ok=False, error=e.detail)
+            except (ValueError, KeyError, TypeError) as e:
+                reply.update(ok=False, error=str(e))
+            except SQLAlchemyError:
+                # The mutation's session was rolled back; the socket stays usable.
+                logger.exception("builder socket %s %s failed", message.get("op"), message.get("kind"))
+                reply.update(ok=False, error="The change could not be saved")
+            client.push(json.dumps(reply))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(website_id, client)
@@ -20,6 +20,7 @@ class ElementUpdate(BaseModel):
 
 class ElementResponse(ElementBase):
     element_id: UUID
+    order_key: Optional[str] = None
     class Config:
         from_attributes = True
 
@@ -37,6 +38,7 @@ class SubsectionUpdate(BaseModel):
 
 class SubsectionResponse(SubsectionBase):
     subsection_id: UUID
+    order_key: Optional[str] = None
     elements: List[ElementResponse] = []
     class Config:
         from_attributes = True
@@ -57,6 +59,7 @@ class SectionUpdate(BaseModel):
 
 class SectionResponse(SectionBase):
     section_id: UUID
+    order_key: Optional[str] = None
     subsections: List[SubsectionResponse] = []
     class Config:
         from_attributes = True
@@ -97,6 +100,7 @@ class NavbarItemUpdate(BaseModel):
 
 class NavbarItemResponse(NavbarItemBase):
     item_id: UUID
+    order_key: Optional[str] = None
     class Config:
         from_attributes = True
 
@@ -111,6 +115,16 @@ class NavbarResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# --- Ordering Schemas ---
+# Moves a node between two siblings, identified by their order keys.
+# Leave after_key empty to move to the start, before_key empty to move to the end.
+class MoveRequest(BaseModel):
+    after_key: Optional[str] = None
+    before_key: Optional[str] = None
+
+class MoveResponse(BaseModel):
+    order_key: str
+
 # --- Website Schemas ---
 class WebsiteBase(BaseModel):
     subdomain: Optional[str] = None
@@ -118,6 +132,10 @@ class WebsiteBase(BaseModel):
 class WebsiteCreate(WebsiteBase):
     pass
 
+# Creates the website from a shared template or one of the owner's private templates.
+class WebsiteCloneRequest(WebsiteBase):
+    template_id: UUID
+
 class WebsiteResponse(WebsiteBase):
     website_id: UUID
     restaurant_id: UUID
@@ -126,6 +144,14 @@ class WebsiteResponse(WebsiteBase):
     class Config:
         from_attributes = True
 
+class WebsiteSkeletonResponse(WebsiteBase):
+    website_id: UUID
+    restaurant_id: UUID
+    pages: List[PageResponse] = [] # Titles and slugs only, no sections
+    navbar: Optional[NavbarResponse] = None
+    class Config:
+        from_attributes = True
+
 class LocationResponse(BaseModel):
     location_id: UUID
     location_name: str
@@ -137,4 +163,28 @@ class PublicWebsiteResponse(WebsiteResponse):
     locations: List[LocationResponse] = []
 
     class Config(WebsiteResponse.Config):
-        pass
\ No newline at end of file
+        pass
+
+
+# --- Publishing Schemas ---
+class WebsiteVersionResponse(BaseModel):
+    snapshot_id: UUID
+    version: int
+    created_at: datetime.datetime
+    is_published: bool = False
+    class Config:
+        from_attributes = True
+
+
+# --- Template Schemas ---
+class SiteTemplateCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+class SiteTemplateResponse(SiteTemplateCreate):
+    template_id: UUID
+    restaurant_id: Optional[UUID] = None
+    node_count: int
+    created_at: datetime.datetime
+    class Config:
+        from_attributes = True
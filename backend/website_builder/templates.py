@@ -0,0 +1,114 @@
+# website_builder/templates.py
+#
+# Site templates and website copies. A website is compiled into a flat
+# document of per-table row lists, where each child row names its parent by
+# index into the parent list instead of by id:
+#
+#   {"navbar": {"properties": {...}}, "navbar_items": [...], "pages": [...],
+#    "sections": [{"page": 0, ...}], "subsections": [{"section": 0, ...}],
+#    "elements": [{"subsection": 0, ...}]}
+#
+# Instantiating one gives every row a fresh uuid4 and writes each table with
+# a single multi-row INSERT, so creating a site is a fixed handful of
+# statements in one transaction however big the template is.
+
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem
+from .ordering import key_between
+from .tree import load_website_tree
+
+_FIRST_KEY = key_between(None, None)
+
+# What `create_website` starts every site with.
+DEFAULT_SITE = {
+    "navbar": {"properties": {}},
+    "navbar_items": [{"text": "Home", "link_url": "/", "position": 1, "order_key": _FIRST_KEY}],
+    "pages": [{"title": "Home", "slug": "/"}],
+    "sections": [{"page": 0, "section_type": "hero", "position": 1, "order_key": _FIRST_KEY, "properties": {}}],
+    "subsections": [{"section": 0, "position": 1, "order_key": _FIRST_KEY,
+                     "properties": {"flexDirection": "column", "alignItems": "center"}}],
+    "elements": [],
+}
+
+
+def compile_site(website: dict) -> dict:
+    """Flattens a website tree (as returned by `load_website_tree`) into a template document."""
+    document = {"navbar": {"properties": {}}, "navbar_items": [], "pages": [], "sections": [], "subsections": [], "elements": []}
+    navbar = website.get("navbar")
+    if navbar is not None:
+        document["navbar"]["properties"] = navbar["properties"]
+        document["navbar_items"] = [
+            {"text": item["text"], "link_url": item["link_url"], "position": item["position"], "order_key": item["order_key"]}
+            for item in navbar["items"]
+        ]
+
+    for page in website["pages"]:
+        document["pages"].append({"title": page["title"], "slug": page["slug"]})
+        page_index = len(document["pages"]) - 1
+        for section in page["sections"]:
+            document["sections"].append({
+                "page": page_index, "section_type": section["section_type"], "position": section["position"],
+                "order_key": section["order_key"], "properties": section["properties"],
+            })
+            section_index = len(document["sections"]) - 1
+            for subsection in section["subsections"]:
+                document["subsections"].append({
+                    "section": section_index, "position": subsection["position"],
+                    "order_key": subsection["order_key"], "properties": subsection["properties"],
+                })
+                subsection_index = len(document["subsections"]) - 1
+                for element in subsection["elements"]:
+                    document["elements"].append({
+                        "subsection": subsection_index, "element_type": element["element_type"],
+                        "position": element["position"], "order_key": element["order_key"],
+                        "properties": element["properties"],
+                    })
+    return document
+
+
+def node_count(document: dict) -> int:
+    return sum(len(document[table]) for table in ("navbar_items", "pages", "sections", "subsections", "elements"))
+
+
+async def compile_website(db: AsyncSession, website_id) -> dict:
+    """Compiles a stored website into a template document; two queries."""
+    website = await load_website_tree(db, Website.website_id == website_id)
+    return compile_site(website)
+
+
+async def _insert(db: AsyncSession, model, rows: list) -> None:
+    if rows:
+        await db.execute(insert(model), rows)
+
+
+def _with_parent_ids(rows: list, parent_field: str, parent_column: str, parent_ids: list, id_column: str):
+    """Assigns each row a new id and swaps its parent index for the parent's new id."""
+    ids, resolved = [], []
+    for row in rows:
+        row = dict(row)
+        ids.append(uuid4())
+        row[id_column] = ids[-1]
+        row[parent_column] = parent_ids[row.pop(parent_field)]
+        resolved.append(row)
+    return ids, resolved
+
+
+async def instantiate_site(db: AsyncSession, website_id, document: dict) -> None:
+    """Writes a template document's nodes into an existing (flushed) website, one INSERT per table."""
+    navbar_id = uuid4()
+    await _insert(db, Navbar, [{"navbar_id": navbar_id, "website_id": website_id, "properties": document["navbar"]["properties"]}])
+    await _insert(db, NavbarItem, [{**item, "item_id": uuid4(), "navbar_id": navbar_id} for item in document["navbar_items"]])
+
+    page_ids = [uuid4() for _ in document["pages"]]
+    await _insert(db, Page, [{**page, "page_id": page_id, "website_id": website_id} for page_id, page in zip(page_ids, document["pages"])])
+
+    section_ids, sections = _with_parent_ids(document["sections"], "page", "page_id", page_ids, "section_id")
+    await _insert(db, Section, sections)
+    subsection_ids, subsections = _with_parent_ids(document["subsections"], "section", "section_id", section_ids, "subsection_id")
+    await _insert(db, Subsection, subsections)
+    _, elements = _with_parent_ids(document["elements"], "subsection", "subsection_id", subsection_ids, "element_id")
+    await _insert(db, Element, elements)
@@ -0,0 +1,156 @@
+# website_builder/tree.py
+#
+# Loads a whole builder tree (pages -> sections -> subsections -> elements,
+# plus the navbar items) with a single UNION ALL query and assembles it into
+# plain dicts in one pass, instead of hydrating ORM objects level by level.
+
+from sqlalchemy import JSON, Integer, String, cast, literal, null, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import Website, Page, Section, Subsection, Element, Navbar, NavbarItem
+
+# Row "kinds", also used as the sort key so parents always come before children.
+PAGE, SECTION, SUBSECTION, ELEMENT, NAVBAR_ITEM = range(5)
+
+
+def _node(kind, node_id, parent_id, order_key, node_type, title, slug, properties):
+    return select(
+        literal(kind, Integer).label("kind"),
+        node_id.label("node_id"),
+        parent_id.label("parent_id"),
+        order_key.label("order_key"),
+        node_type.label("node_type"),
+        title.label("title"),
+        slug.label("slug"),
+        properties.label("properties"),
+    )
+
+
+def tree_query(*page_criteria, navbar_website_id=None):
+    """
+    Builds one UNION ALL statement returning every node under the pages that
+    match `page_criteria`, ordered so that a single pass can assemble the tree.
+    When `navbar_website_id` is given, that website's navbar items are included too.
+    """
+    no_str = cast(null(), String)
+    no_json = cast(null(), JSON)
+
+    pages = _node(PAGE, Page.page_id, Page.website_id, no_str, no_str, Page.title, Page.slug, no_json) \
+        .where(*page_criteria)
+    sections = _node(SECTION, Section.section_id, Section.page_id, Section.order_key, Section.section_type, no_str, no_str, Section.properties) \
+        .join(Page, Page.page_id == Section.page_id) \
+        .where(*page_criteria)
+    subsections = _node(SUBSECTION, Subsection.subsection_id, Subsection.section_id, Subsection.order_key, no_str, no_str, no_str, Subsection.properties) \
+        .join(Section, Section.section_id == Subsection.section_id) \
+        .join(Page, Page.page_id == Section.page_id) \
+        .where(*page_criteria)
+    elements = _node(ELEMENT, Element.element_id, Element.subsection_id, Element.order_key, Element.element_type, no_str, no_str, Element.properties) \
+        .join(Subsection, Subsection.subsection_id == Element.subsection_id) \
+        .join(Section, Section.section_id == Subsection.section_id) \
+        .join(Page, Page.page_id == Section.page_id) \
+        .where(*page_criteria)
+    parts = [pages, sections, subsections, elements]
+
+    if navbar_website_id is not None:
+        navbar_items = _node(NAVBAR_ITEM, NavbarItem.item_id, NavbarItem.navbar_id, NavbarItem.order_key, no_str, NavbarItem.text, NavbarItem.link_url, no_json) \
+            .join(Navbar, Navbar.navbar_id == NavbarItem.navbar_id) \
+            .where(Navbar.website_id == navbar_website_id)
+        parts.append(navbar_items)
+
+    return _ordered(union_all(*parts))
+
+
+def _ordered(nodes):
+    combined = nodes.subquery()
+    return select(combined).order_by(combined.c.kind, combined.c.order_key.collate("C"))
+
+
+def skeleton_query(website_id):
+    """Like `tree_query`, but only the website's page rows and navbar items."""
+    no_str = cast(null(), String)
+    no_json = cast(null(), JSON)
+    pages = _node(PAGE, Page.page_id, Page.website_id, no_str, no_str, Page.title, Page.slug, no_json) \
+        .where(Page.website_id == website_id)
+    navbar_items = _node(NAVBAR_ITEM, NavbarItem.item_id, NavbarItem.navbar_id, NavbarItem.order_key, no_str, NavbarItem.text, NavbarItem.link_url, no_json) \
+        .join(Navbar, Navbar.navbar_id == NavbarItem.navbar_id) \
+        .where(Navbar.website_id == website_id)
+    return _ordered(union_all(pages, navbar_items))
+
+
+def assemble_pages(rows):
+    """
+    Turns the ordered rows of `tree_query` into nested dicts in one linear pass.
+    A node's `position` is its index among its siblings. Returns (pages, navbar_items).
+    """
+    pages = []
+    navbar_items = []
+    children = {}  # node_id -> list its children get appended to
+
+    for kind, node_id, parent_id, order_key, node_type, title, slug, properties in rows:
+        if kind == PAGE:
+            node = {"page_id": node_id, "title": title, "slug": slug, "sections": []}
+            pages.append(node)
+            children[node_id] = node["sections"]
+        elif kind == SECTION:
+            siblings = children[parent_id]
+            node = {"section_id": node_id, "section_type": node_type, "position": len(siblings),
+                    "order_key": order_key, "properties": properties or {}, "subsections": []}
+            siblings.append(node)
+            children[node_id] = node["subsections"]
+        elif kind == SUBSECTION:
+            siblings = children[parent_id]
+            node = {"subsection_id": node_id, "position": len(siblings), "order_key": order_key,
+                    "properties": properties or {}, "elements": []}
+            siblings.append(node)
+            children[node_id] = node["elements"]
+        elif kind == ELEMENT:
+            siblings = children[parent_id]
+            siblings.append({"element_id": node_id, "element_type": node_type, "position": len(siblings),
+                             "order_key": order_key, "properties": properties or {}})
+        else:
+            navbar_items.append({"item_id": node_id, "text": title, "link_url": slug,
+                                 "position": len(navbar_items), "order_key": order_key})
+
+    return pages, navbar_items
+
+
+async def load_website_tree(db: AsyncSession, *website_criteria, skeleton: bool = False):
+    """
+    Loads the website matching `website_criteria` with all nested data as plain
+    dicts shaped like `schemas.WebsiteResponse`. Two queries regardless of size.
+    With `skeleton=True` pages come back without their sections.
+    Returns None when no website matches.
+    """
+    header = (await db.execute(
+        select(Website.website_id, Website.restaurant_id, Website.subdomain, Navbar.navbar_id, Navbar.properties)
+        .outerjoin(Navbar, Navbar.website_id == Website.website_id)
+        .where(*website_criteria)
+    )).first()
+    if header is None:
+        return None
+    website_id, restaurant_id, subdomain, navbar_id, navbar_properties = header
+
+    if skeleton:
+        rows = await db.execute(skeleton_query(website_id))
+    else:
+        rows = await db.execute(tree_query(Page.website_id == website_id, navbar_website_id=website_id))
+    pages, navbar_items = assemble_pages(rows)
+
+    navbar = None
+    if navbar_id is not None:
+        navbar = {"navbar_id": navbar_id, "properties": navbar_properties or {}, "items": navbar_items}
+
+    return {
+        "website_id": website_id,
+        "restaurant_id": restaurant_id,
+        "subdomain": subdomain,
+        "pages": pages,
+        "navbar": navbar,
+    }
+
+
+async def load_page_tree(db: AsyncSession, *page_criteria):
+    """Loads a single page and its descendants as a dict, or None. One query."""
+    pages, _ = assemble_pages(await db.execute(tree_query(*page_criteria)))
+    return pages[0] if pages else None
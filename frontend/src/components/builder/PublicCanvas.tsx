@@ -75,7 +75,7 @@ export const CategoryMenuInCanvas = ({
     if (!locationId) return;
     api
       .get<MenuItem[]>(
-        `/locations/${locationId}/menu?category_id=${categoryId}`
+        `/locations/${locationId}/menu?category_id=${categoryId}&at=${encodeURIComponent(new Date().toISOString())}`
       )
       .then((r) => setItems(r.data))
       .catch(() => setItems([]));